@@ -1,5 +1,6 @@
 # tracker.py
 
+import argparse
 import time
 import sqlite3
 import win32gui
@@ -9,11 +10,34 @@ from datetime import datetime
 import os
 import re
 
+from metrics import METRICS_FILE, REGISTRY, file_size
+from session_coalescer import DEFAULT_GRACE_SECONDS, SessionCoalescer
+from uploader import UPLOAD_INTERVAL, Uploader
+
 DB_NAME = "activity_log.db"
+POLL_INTERVAL = 1
+METRICS_INTERVAL = 15
+# A poll that comes this much later than POLL_INTERVAL counts as late
+LATE_FACTOR = 1.5
+
+POLL_INTERVAL_SECONDS = REGISTRY.histogram(
+    "tracker_poll_interval_seconds", "Time between consecutive window polls",
+    buckets=(1.0, 1.05, 1.1, 1.25, 1.5, 2.0, 5.0, 10.0, 60.0))
+POLL_WORK_SECONDS = REGISTRY.histogram("tracker_poll_work_seconds", "Time spent per poll outside of sleep")
+ACTIVE_WINDOW_SECONDS = REGISTRY.histogram("tracker_get_active_window_seconds", "Time spent in get_active_window")
+SAVE_SESSION_SECONDS = REGISTRY.histogram("tracker_save_session_seconds", "Time per save_session write and commit")
+POLLS = REGISTRY.counter("tracker_polls_total", "Window polls")
+DROPPED_SAMPLES = REGISTRY.counter("tracker_dropped_samples_total", "Polls where the active window could not be read")
+LATE_SAMPLES = REGISTRY.counter("tracker_late_samples_total", "Polls that came more than LATE_FACTOR x the interval late")
+SESSIONS_SAVED = REGISTRY.counter("tracker_sessions_saved_total", "Sessions written to activity_log")
+DB_SIZE = REGISTRY.gauge("tracker_db_size_bytes", "Size of activity_log.db including its WAL")
+STARTED_AT = REGISTRY.gauge("tracker_start_time_seconds", "Unix time the tracker started")
 
 
 def create_db():
     conn = sqlite3.connect(DB_NAME)
+    # WAL lets maintenance.py and the reports read/compact while we keep writing
+    conn.execute("PRAGMA journal_mode=WAL")
     c = conn.cursor()
     c.execute('''
         CREATE TABLE IF NOT EXISTS activity_log (
@@ -40,6 +64,7 @@ def get_active_window():
         title = win32gui.GetWindowText(hwnd)
         return app_name, title
     except Exception:
+        DROPPED_SAMPLES.inc()
         return None, None
 
 
@@ -51,41 +76,128 @@ def extract_site(title):
     return match.group(2) if match else ""
 
 
-def save_session(app_name, title, start_time, end_time):
+def session_site(app_name, title):
+    return extract_site(title) if "chrome" in app_name.lower() else None
+
+
+def save_session(app_name, title, start_time, end_time, row_id=None):
+    """Insert a session, or extend the row stored for it earlier (row_id).
+
+    Returns the row id, or None if row_id no longer exists.
+    """
     duration = int((end_time - start_time).total_seconds())
     date = start_time.strftime("%Y-%m-%d")
-    site = extract_site(title) if "chrome" in app_name.lower() else None
-
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    # print(f"Saving session: {app_name}, {title}, {duration} sec")
-    c.execute('''
-        INSERT INTO activity_log (app_name, window_title, site, start_time, end_time, duration, date)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    ''', (app_name, title, site, start_time.isoformat(), end_time.isoformat(), duration, date))
-    conn.commit()
-    conn.close()
+    site = session_site(app_name, title)
+
+    with SAVE_SESSION_SECONDS.time():
+        conn = sqlite3.connect(DB_NAME)
+        c = conn.cursor()
+        # print(f"Saving session: {app_name}, {title}, {duration} sec")
+        inserted = False
+        if row_id is not None:
+            # Same update compact_db makes to the first row of a merged group
+            c.execute("UPDATE activity_log SET end_time = ?, duration = ? WHERE id = ?",
+                      (end_time.isoformat(), duration, row_id))
+            if c.rowcount == 0:
+                row_id = None
+        else:
+            c.execute('''
+                INSERT INTO activity_log (app_name, window_title, site, start_time, end_time, duration, date)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (app_name, title, site, start_time.isoformat(), end_time.isoformat(), duration, date))
+            row_id = c.lastrowid
+            inserted = True
+        conn.commit()
+        conn.close()
+    if inserted:
+        SESSIONS_SAVED.inc()
+    return row_id
+
+
+def store_session(session):
+    """Coalescer emit and checkpoint: the first write inserts the session's row, later ones extend it.
+
+    A merged run can last as long as the user stays in one app; stored as it
+    grows, a kill or power loss costs only the current fragment, and the
+    reports see the run while it lasts.
+    """
+    if session.saved_end == session.end:
+        return
+    if session.saved_id is not None:
+        if save_session(session.app_name, session.title, session.saved_start, session.end,
+                        session.saved_id) is None:
+            # Removed meanwhile (merged or archived): its time up to saved_end is counted there, store only the rest
+            session.saved_id, session.saved_start = None, session.saved_end
+    if session.saved_id is None:
+        session.saved_start = session.saved_start or session.start
+        session.saved_id = save_session(session.app_name, session.title, session.saved_start, session.end)
+    session.saved_end = session.end
+
+
+def write_metrics(path=METRICS_FILE):
+    DB_SIZE.set(file_size(DB_NAME))
+    try:
+        REGISTRY.write_snapshot(path)
+    except OSError as e:
+        print(f"Could not write metrics to {path}: {e}")
 
 
-def activity_monitor():
+def activity_monitor(grace_seconds=DEFAULT_GRACE_SECONDS):
     last_app, last_title = None, None
     start_time = datetime.now()
+    # Ticking titles and quick flips are merged here instead of becoming separate rows
+    coalescer = SessionCoalescer(store_session, grace_seconds=grace_seconds, site_func=session_site,
+                                 checkpoint=store_session)
 
-    while True:
-        time.sleep(1)
-        app_name, title = get_active_window()
-        # print(f"Detected: {app_name}, Title: {title}")
-        if (app_name, title) != (last_app, last_title):
-            end_time = datetime.now()
-            if last_app:
-                save_session(last_app, last_title, start_time, end_time)
-            start_time = end_time
-            last_app, last_title = app_name, title
+    STARTED_AT.set(int(time.time()))
+    last_poll = time.perf_counter()
+    next_metrics = last_poll + METRICS_INTERVAL
+
+    try:
+        while True:
+            time.sleep(POLL_INTERVAL)
+            polled = time.perf_counter()
+            interval = polled - last_poll
+            last_poll = polled
+            POLLS.inc()
+            POLL_INTERVAL_SECONDS.observe(interval)
+            if interval > POLL_INTERVAL * LATE_FACTOR:
+                LATE_SAMPLES.inc()
+
+            with ACTIVE_WINDOW_SECONDS.time():
+                app_name, title = get_active_window()
+            # print(f"Detected: {app_name}, Title: {title}")
+            if (app_name, title) != (last_app, last_title):
+                end_time = datetime.now()
+                if last_app:
+                    coalescer.add(last_app, last_title, start_time, end_time)
+                start_time = end_time
+                last_app, last_title = app_name, title
+
+            if polled >= next_metrics:
+                write_metrics()
+                next_metrics = polled + METRICS_INTERVAL
+            POLL_WORK_SECONDS.observe(time.perf_counter() - polled)
+    finally:
+        if last_app:
+            coalescer.add(last_app, last_title, start_time, datetime.now())
+        coalescer.flush()
+        write_metrics()
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Track active window usage.")
+    parser.add_argument("--upload-url", help="Central remote_server /ingest URL to ship sessions to")
+    parser.add_argument("--host-id", help="Name this machine reports as (default: hostname)")
+    parser.add_argument("--upload-interval", type=int, default=UPLOAD_INTERVAL, help="Seconds between uploads")
+    parser.add_argument("--upload-token", help="Ingest token the server expects (default: $ACTIVITY_INGEST_TOKEN)")
+    args = parser.parse_args()
+
     print("Starting background tracker. Running... (Press Ctrl+C to stop)")
     create_db()
+    if args.upload_url:
+        Uploader(args.upload_url, args.host_id, DB_NAME, args.upload_interval, token=args.upload_token).start()
+        print(f"Uploading sessions to {args.upload_url}")
     try:
         activity_monitor()
     except KeyboardInterrupt:
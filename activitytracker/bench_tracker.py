@@ -0,0 +1,210 @@
+"""Benchmark suite for the activity tracker on synthetic data.
+
+Generates (and caches) one database per size with synthetic_data.py, then times
+the write path and the report paths against each:
+
+    save_session                 inserts per second (needs the Windows modules)
+    report_day/week/month        report.query_by_period for the last day/week/month
+    gen_report                   gen_report.py end to end over the whole range
+    html_report_full             generate_html_report from scratch (totals + heatmap + render)
+    html_report_incremental      the same with an up-to-date checkpoint
+
+Results are appended as one JSON line per run to --output and compared with the
+previous run in that file.
+
+    python bench_tracker.py --sizes 10k,1m,10m --output bench_results.jsonl
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import gen_report
+import generate_html_report
+import queries
+import report
+import synthetic_data
+
+DATA_DIR = "bench_data"
+DAYS = 365
+
+
+def parse_size(text):
+    text = text.strip().lower()
+    for suffix, factor in (("k", 1000), ("m", 1000000)):
+        if text.endswith(suffix):
+            return int(float(text[:-1]) * factor)
+    return int(text)
+
+
+def bench_db(rows, data_dir=DATA_DIR):
+    """Path of the cached synthetic DB with `rows` sessions, generating it if needed."""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"activity_{rows}.db")
+    if not os.path.exists(path):
+        print(f"Generating {rows:,} rows into {path} ...")
+        started = time.perf_counter()
+        synthetic_data.generate(path, rows, DAYS, end_date=last_day())
+        print(f"  done in {time.perf_counter() - started:.1f} s")
+    return path
+
+
+def last_day():
+    return date.today() - timedelta(days=1)
+
+
+def timed(func, repeat):
+    """Run func once to warm up, then `repeat` times; returns the timings in ms."""
+    func()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def result(name, rows, timings, **extra):
+    return dict({"name": name, "rows": rows, "min_ms": round(min(timings), 3),
+                 "median_ms": round(statistics.median(timings), 3), "runs": len(timings)}, **extra)
+
+
+def bench_save_session(count=2000):
+    try:
+        import activity_tracker
+    except ImportError as e:  # win32gui / win32process / psutil only exist on the tracker machine
+        return {"name": "save_session", "skipped": f"activity_tracker not importable: {e}"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        activity_tracker.DB_NAME = os.path.join(tmp, "activity_log.db")
+        activity_tracker.create_db()
+        start = datetime.now()
+        started = time.perf_counter()
+        for i in range(count):
+            session_start = start + timedelta(seconds=i)
+            activity_tracker.save_session("chrome.exe", f"Page {i} - github.com - Google Chrome",
+                                          session_start, session_start + timedelta(seconds=1))
+        elapsed = time.perf_counter() - started
+    return {"name": "save_session", "rows": count, "per_call_ms": round(elapsed / count * 1000, 4),
+            "rows_per_s": round(count / elapsed)}
+
+
+def bench_reports(db_path, rows, repeat):
+    day = last_day()
+    periods = {
+        "day": day.isoformat(),
+        # query_by_period weeks are %W weeks (Monday based); go via the Monday of this week
+        "week": (day - timedelta(days=day.weekday())).strftime("%Y-W%W"),
+        "month": day.strftime("%Y-%m"),
+    }
+    results = []
+    for period, value in periods.items():
+        def run():
+            with contextlib.redirect_stdout(io.StringIO()):
+                report.query_by_period(period, value, db_path)
+        results.append(result(f"report_{period}", rows, timed(run, repeat), value=value))
+    return results
+
+
+def bench_gen_report(db_path, rows, repeat, out_dir):
+    start, end = last_day() - timedelta(days=DAYS - 1), last_day() + timedelta(days=1)
+    output = os.path.join(out_dir, "gen_report.html")
+
+    def run():
+        data = gen_report.load_data_from_db(start, end, db_path)
+        app_data, site_data = gen_report.summarize(data)
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(gen_report.generate_html(app_data, site_data))
+    return [result("gen_report", rows, timed(run, repeat))]
+
+
+def bench_html_report(db_path, rows, repeat):
+    day = last_day()
+    state = {}
+
+    def full():
+        state["current"] = generate_html_report.refresh_state(None, day, db_path)
+        generate_html_report.generate_html(state["current"]["totals"], day.isoformat(), state["current"]["heatmap"])
+
+    def incremental():
+        current = generate_html_report.refresh_state(state["current"], day, db_path)
+        generate_html_report.generate_html(current["totals"], day.isoformat(), current["heatmap"])
+
+    return [result("html_report_full", rows, timed(full, repeat)),
+            result("html_report_incremental", rows, timed(incremental, repeat))]
+
+
+def compare(previous, current):
+    before = {(r["name"], r.get("rows")): r for r in previous["results"] if "median_ms" in r}
+    for r in current["results"]:
+        old = before.get((r["name"], r.get("rows")))
+        if old and "median_ms" in r and old["median_ms"]:
+            change = (r["median_ms"] / old["median_ms"] - 1) * 100
+            print(f"  {r['name']:<26} {r['rows']:>10,}  {old['median_ms']:>10.2f} -> {r['median_ms']:>10.2f} ms"
+                  f"  ({change:+.1f}%)")
+
+
+def load_previous(path):
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the activity tracker on synthetic data.")
+    parser.add_argument("--sizes", default="10k,1m,10m", help="Comma separated row counts, e.g. 10k,1m,10m")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per benchmark (after one warm-up)")
+    parser.add_argument("--data-dir", default=DATA_DIR, help="Where the generated databases are cached")
+    parser.add_argument("--output", default="bench_results.jsonl", help="Append results as a JSON line here")
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    run = {
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "results": [bench_save_session()],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            db_path = bench_db(rows, args.data_dir)
+            print(f"Benchmarking {rows:,} rows ...")
+            run["results"] += bench_reports(db_path, rows, args.repeat)
+            run["results"] += bench_gen_report(db_path, rows, args.repeat, tmp)
+            run["results"] += bench_html_report(db_path, rows, args.repeat)
+            queries.close_connections()
+
+    print(f"\n{'benchmark':<26} {'rows':>10}  {'median ms':>10}  {'min ms':>10}")
+    for r in run["results"]:
+        if "skipped" in r:
+            print(f"{r['name']:<26} skipped: {r['skipped']}")
+        elif "median_ms" in r:
+            print(f"{r['name']:<26} {r['rows']:>10,}  {r['median_ms']:>10.2f}  {r['min_ms']:>10.2f}")
+        else:
+            print(f"{r['name']:<26} {r['rows']:>10,}  {r['per_call_ms']:>10.3f} ms/call  {r['rows_per_s']:,} rows/s")
+
+    previous = load_previous(args.output)
+    if previous:
+        print(f"\nCompared with the run from {previous['timestamp']}:")
+        compare(previous, run)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(run) + "\n")
+        print(f"\nResults appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
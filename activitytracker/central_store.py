@@ -0,0 +1,126 @@
+# central_store.py – combined activity store fed by many trackers through remote_server /ingest
+
+import sqlite3
+from datetime import datetime
+
+CENTRAL_DB = "central_activity.db"
+
+
+def connect(db_path=CENTRAL_DB):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS activity_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        host_id TEXT NOT NULL,
+        source_db TEXT NOT NULL DEFAULT '',
+        source_id INTEGER NOT NULL,
+        app_name TEXT,
+        window_title TEXT,
+        site TEXT,
+        start_time TEXT,
+        end_time TEXT,
+        duration INTEGER,
+        date TEXT,
+        UNIQUE (host_id, source_db, source_id)
+    );
+    CREATE INDEX IF NOT EXISTS idx_activity_log_date ON activity_log(date);
+    CREATE INDEX IF NOT EXISTS idx_activity_log_host_date ON activity_log(host_id, date);
+    CREATE TABLE IF NOT EXISTS ingest_batches (
+        host_id TEXT NOT NULL,
+        source_db TEXT NOT NULL DEFAULT '',
+        seq INTEGER NOT NULL,
+        received_at TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        PRIMARY KEY (host_id, source_db, seq)
+    );
+'''
+
+
+def migrate(conn):
+    """Rebuild tables from before source_db was part of the keys; their rows get the legacy empty source_db."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(activity_log)")}
+    if not columns or "source_db" in columns:
+        return
+    conn.executescript('''
+        BEGIN;
+        ALTER TABLE activity_log RENAME TO activity_log_old;
+        ALTER TABLE ingest_batches RENAME TO ingest_batches_old;
+        DROP INDEX IF EXISTS idx_activity_log_date;
+        DROP INDEX IF EXISTS idx_activity_log_host_date;
+    ''' + SCHEMA + '''
+        INSERT INTO activity_log (id, host_id, source_id, app_name, window_title, site,
+                                  start_time, end_time, duration, date)
+        SELECT id, host_id, source_id, app_name, window_title, site, start_time, end_time, duration, date
+        FROM activity_log_old;
+        INSERT INTO ingest_batches (host_id, seq, received_at, row_count)
+        SELECT host_id, seq, received_at, row_count FROM ingest_batches_old;
+        DROP TABLE activity_log_old;
+        DROP TABLE ingest_batches_old;
+        COMMIT;
+    ''')
+
+
+def create_central_db(db_path=CENTRAL_DB):
+    # activity_log keeps the tracker's column names so the report scripts can run on it unchanged
+    conn = connect(db_path)
+    migrate(conn)
+    conn.executescript(SCHEMA)
+    conn.commit()
+    conn.close()
+
+
+def ingest_batch(conn, host_id, seq, rows, source_db="", deleted=()):
+    """Store one uploaded batch. Safe to call again with the same batch.
+
+    Rows are keyed by (host_id, source database id, source row id), so a
+    retried or overlapping batch updates rows in place instead of duplicating
+    them, and a host that starts over with a new activity_log.db (ids from 1
+    again) cannot overwrite its older rows. deleted lists source row ids the
+    host merged away. Returns True if this (host_id, source_db, seq) had not
+    been seen before.
+    """
+    values = [(host_id, source_db, row["id"], row.get("app_name"), row.get("window_title"), row.get("site"),
+               row.get("start_time"), row.get("end_time"), row.get("duration"), row.get("date"))
+              for row in rows]
+    with conn:
+        c = conn.cursor()
+        c.execute('''
+            INSERT OR IGNORE INTO ingest_batches (host_id, source_db, seq, received_at, row_count)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (host_id, source_db, seq, datetime.now().isoformat(), len(values)))
+        is_new = c.rowcount == 1
+        c.executemany('''
+            INSERT INTO activity_log (host_id, source_db, source_id, app_name, window_title, site,
+                                      start_time, end_time, duration, date)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (host_id, source_db, source_id) DO UPDATE SET
+                app_name = excluded.app_name,
+                window_title = excluded.window_title,
+                site = excluded.site,
+                start_time = excluded.start_time,
+                end_time = excluded.end_time,
+                duration = excluded.duration,
+                date = excluded.date
+        ''', values)
+        c.executemany("DELETE FROM activity_log WHERE host_id = ? AND source_db = ? AND source_id = ?",
+                      [(host_id, source_db, source_id) for source_id in deleted])
+    return is_new
+
+
+def host_status(conn):
+    """Last batch and row count per host."""
+    c = conn.cursor()
+    c.execute('''
+        SELECT b.host_id, MAX(b.seq), MAX(b.received_at),
+               (SELECT COUNT(*) FROM activity_log a WHERE a.host_id = b.host_id)
+        FROM ingest_batches b
+        GROUP BY b.host_id
+        ORDER BY b.host_id
+    ''')
+    return [{"host_id": host_id, "last_seq": seq, "last_received": received, "rows": count}
+            for host_id, seq, received, count in c.fetchall()]
@@ -0,0 +1,163 @@
+# export_columnar.py – incremental, date-partitioned Parquet / Arrow export plus a vectorized summary
+#
+#   python export_columnar.py export --out activity_export
+#   python export_columnar.py summary week 2025-W14 --out activity_export
+#
+# Each finished day becomes one partition (date=YYYY-MM-DD/part-0.parquet).
+# Partitions already on disk are never rewritten, so repeated exports only add
+# the days that were completed since the last run.
+
+import argparse
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+
+import queries
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # Optional dependency, only needed for this script
+    pa = None
+
+DB_NAME = "activity_log.db"
+EXPORT_DIR = "activity_export"
+FORMATS = {"parquet": "parquet", "arrow": "arrow"}
+
+
+def require_pyarrow():
+    if pa is None:
+        raise SystemExit("pyarrow is required for columnar export: pip install pyarrow")
+
+
+def schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("app_name", pa.dictionary(pa.int32(), pa.string())),
+        ("site", pa.dictionary(pa.int32(), pa.string())),
+        ("window_title", pa.string()),
+        ("start_time", pa.timestamp("us")),
+        ("end_time", pa.timestamp("us")),
+        ("duration", pa.int64()),
+    ])
+
+
+def exported_dates(out_dir, fmt="parquet"):
+    """Dates whose partition file is complete (an interrupted write leaves only the hidden temp file)."""
+    if not os.path.isdir(out_dir):
+        return set()
+    return {name[len("date="):] for name in os.listdir(out_dir)
+            if name.startswith("date=") and os.path.exists(os.path.join(out_dir, name, f"part-0.{FORMATS[fmt]}"))}
+
+
+def write_partition(out_dir, day, rows, fmt):
+    ids, apps, sites, titles, starts, ends, durations = zip(*rows)
+    table = pa.Table.from_arrays([
+        pa.array(ids, pa.int64()),
+        pa.array(apps, pa.string()).dictionary_encode(),
+        pa.array(sites, pa.string()).dictionary_encode(),
+        pa.array(titles, pa.string()),
+        pa.array([datetime.fromisoformat(s) for s in starts], pa.timestamp("us")),
+        pa.array([datetime.fromisoformat(e) for e in ends], pa.timestamp("us")),
+        pa.array(durations, pa.int64()),
+    ], schema=schema())
+
+    partition_dir = os.path.join(out_dir, f"date={day}")
+    os.makedirs(partition_dir, exist_ok=True)
+    path = os.path.join(partition_dir, f"part-0.{FORMATS[fmt]}")
+    # The dataset reader skips files starting with '.', so a leftover temp file is never read
+    tmp_path = os.path.join(partition_dir, f".part-0.{FORMATS[fmt]}.tmp")
+    if fmt == "parquet":
+        pq.write_table(table, tmp_path, compression="zstd")
+    else:
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+def export(db_path=DB_NAME, out_dir=EXPORT_DIR, fmt="parquet"):
+    """Export every finished day that has no partition yet. Returns (days, rows) written."""
+    require_pyarrow()
+    done = exported_dates(out_dir, fmt)
+    last_done = max(done) if done else ""
+    today = date.today().isoformat()
+
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute('''
+        SELECT date, id, app_name, site, window_title, start_time, end_time, duration
+        FROM activity_log
+        WHERE date > ? AND date < ?
+        ORDER BY date, id
+    ''', (last_done, today))
+
+    days = rows_written = 0
+    current_day, batch = None, []
+    for row in c:
+        if row[0] != current_day:
+            if batch:
+                rows_written += write_partition(out_dir, current_day, batch, fmt)
+                days += 1
+            current_day, batch = row[0], []
+        batch.append(row[1:])
+    if batch:
+        rows_written += write_partition(out_dir, current_day, batch, fmt)
+        days += 1
+    conn.close()
+    return days, rows_written
+
+
+def summarize(out_dir, start, end, fmt="parquet"):
+    """Total duration per (app_name, site) for dates in [start, end), computed in Arrow."""
+    require_pyarrow()
+    partitioning = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+    dataset = ds.dataset(out_dir, format="ipc" if fmt == "arrow" else fmt, partitioning=partitioning)
+    # The date filter prunes whole partitions before any file is opened
+    table = dataset.to_table(columns=["app_name", "site", "duration"],
+                             filter=(ds.field("date") >= start) & (ds.field("date") < end))
+    # Each partition carries its own dictionary; merge them so grouping works on the integer codes
+    table = table.unify_dictionaries()
+    totals = table.group_by(["app_name", "site"]).aggregate([("duration", "sum")])
+    return sorted(zip(totals["app_name"].to_pylist(), totals["site"].to_pylist(),
+                      totals["duration_sum"].to_pylist()), key=lambda row: -row[2])
+
+
+def main():
+    # Shared by the subcommands, so the options go after the command name
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--db", default=DB_NAME)
+    common.add_argument("--out", default=EXPORT_DIR, help="Export directory")
+    common.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+
+    parser = argparse.ArgumentParser(description="Columnar export and fast summaries of activity data.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", parents=[common], help="Write partitions for days not exported yet")
+    summary = sub.add_parser("summary", parents=[common], help="Day/week/month/year totals from the exported files")
+    summary.add_argument("period", choices=["day", "week", "month", "year"])
+    summary.add_argument("value", help="Date (YYYY-MM-DD), week (YYYY-W##), month (YYYY-MM) or year (YYYY)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        days, rows = export(args.db, args.out, args.format)
+        print(f"Exported {rows} rows in {days} new partition(s) to {os.path.abspath(args.out)}")
+        return
+
+    started = time.perf_counter()
+    start, end = queries.period_range(args.period, args.value)
+    rows = summarize(args.out, start.isoformat(), end.isoformat(), args.format)
+    elapsed = time.perf_counter() - started
+
+    print(f"\n=== Usage Report for {args.period.upper()} {args.value} ===\n")
+    if not rows:
+        print("No usage data available.")
+    for app, site, duration in rows:
+        label = site if site else app
+        print(f"{label:40} - {duration // 60} min {duration % 60} sec")
+    print(f"\n({elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,23 @@
 
 import argparse
 from datetime import datetime, timedelta
-import sqlite3
 from collections import defaultdict
 import os
 
+import queries
+
 DB_NAME = "activity_log.db"
 HTML_REPORT = "activity_report.html"
 
-def load_data_from_db(start_time, end_time):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''
-        SELECT app_name, site, duration, start_time FROM activity_log 
-        WHERE start_time BETWEEN ? AND ?
-    ''', (start_time.isoformat(), end_time.isoformat()))
-    rows = c.fetchall()
-    conn.close()
-    return rows
+def load_data_from_db(start_date, end_date, db_path=DB_NAME, tz=None):
+    """(app_name, site, seconds) totals for [start_date, end_date)."""
+    return queries.totals(start_date, end_date, db_path, tz)
 
 def summarize(rows, scope='both'):
     app_data = defaultdict(int)
     site_data = defaultdict(int)
 
-    for app, site, duration, _ in rows:
+    for app, site, duration in rows:
         if scope in ('apps', 'both'):
             app_data[app] += duration
         if scope in ('sites', 'both') and site:
@@ -92,14 +86,16 @@ def main():
     parser.add_argument('--end', type=str, help="End datetime (YYYY-MM-DD)", default=None)
     parser.add_argument('--scope', choices=['apps', 'sites', 'both'], default='both')
     parser.add_argument('--output', type=str, default=HTML_REPORT)
+    parser.add_argument('--db', type=str, default=DB_NAME)
+    parser.add_argument('--tz', type=str, default=None, help="Time zone for day boundaries (default: local)")
     args = parser.parse_args()
 
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    today = datetime.now().date()
 
-    start_time = datetime.strptime(args.start, "%Y-%m-%d") if args.start else today
-    end_time = datetime.strptime(args.end, "%Y-%m-%d") + timedelta(days=1) if args.end else today + timedelta(days=1)
+    start_date = datetime.strptime(args.start, "%Y-%m-%d").date() if args.start else today
+    end_date = datetime.strptime(args.end, "%Y-%m-%d").date() + timedelta(days=1) if args.end else today + timedelta(days=1)
 
-    rows = load_data_from_db(start_time, end_time)
+    rows = load_data_from_db(start_date, end_date, args.db, args.tz)
     app_data, site_data = summarize(rows, scope=args.scope)
 
     html = generate_html(app_data, site_data)
@@ -1,24 +1,138 @@
-import sqlite3
+import argparse
 import datetime
 import json
+import os
+
+import queries
+import time_buckets
 
 DB_NAME = "activity_log.db"
 REPORT_FILE = "activity_report.html"
+STATE_FILE = "report_state.json"
+HEATMAP_DAYS = 28
+TOP_N = 15
+CHART_JS_CDN = "https://cdn.jsdelivr.net/npm/chart.js"
+# Drop chart.umd.min.js from a Chart.js release here to build reports that open offline
+CHART_JS_VENDOR = os.path.join("vendor", "chart.umd.min.js")
+
+def fetch_data_for_day(date_str, db_path=DB_NAME):
+    return queries.totals_for_period("day", date_str, db_path)
+
+def load_state(path=STATE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_state(state, path=STATE_FILE):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+def refresh_state(state, today, db_path=DB_NAME):
+    """Bring the checkpointed aggregates up to date with activity_log.
+
+    Only rows with an id above the checkpoint are read. The newest row stays
+    open: the tracker keeps extending it while the session lasts (see
+    store_session), so its share is taken out and read again on every refresh.
+    A new day, a different database, or a compaction/retention run that
+    rewrote old rows, triggers a full rebuild.
+    """
+    db = os.path.abspath(db_path)
+    max_id = queries.max_row_id(db_path)
+    closed_id = max(max_id - 1, 0)
+    generation = queries.data_generation(db_path)
+    date_str = today.strftime("%Y-%m-%d")
+    tomorrow = today + datetime.timedelta(days=1)
+
+    if (state is None or state.get("db") != db or state.get("date") != date_str
+            or state.get("generation") != generation or state.get("last_id", 0) > closed_id):
+        heatmap = time_buckets.heatmap_for_days(HEATMAP_DAYS, today, db_path=db_path, max_id=closed_id)
+        state = {
+            "db": db,
+            "date": date_str,
+            "generation": generation,
+            "last_id": closed_id,
+            "totals": [list(row) for row in queries.totals(today, tomorrow, db_path, max_id=closed_id)],
+            "heatmap": heatmap,
+            "open_totals": [],
+            "open_grid": [[0] * len(row) for row in heatmap["grid"]],
+        }
+
+    totals = {(app, site): seconds for app, site, seconds in state["totals"]}
+    heatmap = state["heatmap"]
+    grid = heatmap["grid"]
+    start = datetime.date.fromisoformat(heatmap["start"])
+    end = datetime.date.fromisoformat(heatmap["end"]) + datetime.timedelta(days=1)
+
+    def add(rows, new_grid, sign):
+        for app, site, seconds in rows:
+            totals[(app, site)] = totals.get((app, site), 0) + sign * seconds
+        for old_row, new_row in zip(grid, new_grid):
+            old_row[:] = [old + sign * new for old, new in zip(old_row, new_row)]
+
+    add(state["open_totals"], state["open_grid"], -1)
+    last_id = state["last_id"]
+    if closed_id > last_id:
+        add(queries.totals(today, tomorrow, db_path, min_id=last_id, max_id=closed_id),
+            time_buckets.heatmap(start, end, heatmap["minutes"], db_path, min_id=last_id, max_id=closed_id), 1)
+    open_totals, open_grid = [], [[0] * len(row) for row in grid]
+    if max_id > closed_id:
+        open_totals = [list(row) for row in queries.totals(today, tomorrow, db_path, min_id=closed_id, max_id=max_id)]
+        open_grid = time_buckets.heatmap(start, end, heatmap["minutes"], db_path, min_id=closed_id, max_id=max_id)
+        add(open_totals, open_grid, 1)
 
-def fetch_data_for_day(date_str):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute('''
-        SELECT app_name, site, SUM(duration)
-        FROM activity_log
-        WHERE date = ?
-        GROUP BY app_name, site
-    ''', (date_str,))
-    rows = c.fetchall()
-    conn.close()
-    return rows
-
-def generate_html(data, date_str):
+    state["totals"] = [[app, site, seconds] for (app, site), seconds in
+                       sorted(totals.items(), key=lambda item: -item[1])]
+    state["last_id"] = closed_id
+    state["open_totals"] = open_totals
+    state["open_grid"] = open_grid
+    return state
+
+def top_n(totals, n=TOP_N):
+    """Largest n (label, seconds) items, with the rest summed into a single "Other" entry."""
+    ranked = sorted(totals.items(), key=lambda item: -item[1])
+    if len(ranked) <= n:
+        return ranked
+    return ranked[:n] + [("Other", sum(seconds for _, seconds in ranked[n:]))]
+
+def script_json(value):
+    """Compact JSON that is safe to embed inside a <script> element."""
+    return json.dumps(value, separators=(",", ":")).replace("</", "<\\/")
+
+def heatmap_html(heatmap):
+    """Weekday x time-of-day table, shaded by the share of the busiest cell."""
+    grid = heatmap["grid"]
+    peak = max(max(row) for row in grid) or 1
+    slots = len(grid[0])
+    per_hour = slots // 24
+
+    html = f"<h3>Activity Heatmap ({heatmap['start']} to {heatmap['end']})</h3>\n"
+    html += "<table class='heatmap'><tr><th></th>"
+    for slot in range(slots):
+        label = f"{slot // per_hour:02}" if slot % per_hour == 0 else ""
+        html += f"<th>{label}</th>"
+    html += "</tr>\n"
+    for weekday, row in zip(heatmap["weekdays"], grid):
+        html += f"<tr><th>{weekday}</th>"
+        for slot, seconds in enumerate(row):
+            alpha = round(seconds / peak, 2)
+            start = slot * heatmap["minutes"]
+            html += (f"<td style='background: rgba(54, 162, 235, {alpha})' "
+                     f"title='{weekday} {start // 60:02}:{start % 60:02} - {seconds // 60} min'></td>")
+        html += "</tr>\n"
+    html += "</table>\n"
+    return html
+
+def generate_html(data, date_str, heatmap=None, chart_js=None, limit=TOP_N):
+    """Render the report page.
+
+    The table gets every row as compact JSON ([label, seconds] pairs) and only
+    draws the rows in view; the charts get the top `limit` entries plus "Other".
+    chart_js is the Chart.js source to inline, otherwise it is loaded from the CDN.
+    """
     app_data = {}
     site_data = {}
 
@@ -30,28 +144,45 @@ def generate_html(data, date_str):
             site_data[site] = site_data.get(site, 0) + duration
 
     # Prepare JSON for JS
-    app_labels = json.dumps(list(app_data.keys()))
-    app_values = json.dumps([round(v / 60, 2) for v in app_data.values()])
-    site_labels = json.dumps(list(site_data.keys()))
-    site_values = json.dumps([round(v / 60, 2) for v in site_data.values()])
+    rows = sorted(app_data.items(), key=lambda x: -x[1])
+    app_top = top_n(app_data, limit)
+    site_top = top_n(site_data, limit)
+    table_rows = script_json([[key, seconds] for key, seconds in rows])
+    app_labels = script_json([key for key, _ in app_top])
+    app_values = script_json([round(v / 60, 2) for _, v in app_top])
+    site_labels = script_json([key for key, _ in site_top])
+    site_values = script_json([round(v / 60, 2) for _, v in site_top])
+    if chart_js:
+        chart_script = "<script>" + chart_js.replace("</script", "<\\/script") + "</script>"
+    else:
+        chart_script = f'<script src="{CHART_JS_CDN}"></script>'
 
     html = f"""
 <!DOCTYPE html>
 <html>
 <head>
+    <meta charset="utf-8">
     <title>Usage Report - {date_str}</title>
-    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    {chart_script}
     <style>
         body {{ font-family: Arial, sans-serif; margin: 20px; }}
         table {{ border-collapse: collapse; width: 100%; margin-top: 20px; }}
         th, td {{ border: 1px solid #ddd; padding: 8px; text-align: left; }}
         th {{ background-color: #f2f2f2; cursor: pointer; }}
+        #usageTable {{ table-layout: fixed; margin-top: 0; }}
+        #usageTable td {{ height: 20px; padding: 4px 8px; white-space: nowrap; overflow: hidden; text-overflow: ellipsis; }}
+        #usageScroll {{ max-height: 480px; overflow-y: auto; margin-top: 20px; }}
+        #usageScroll thead th {{ position: sticky; top: 0; }}
+        table.heatmap {{ width: auto; }}
+        table.heatmap th, table.heatmap td {{ padding: 0; min-width: 14px; height: 18px; font-size: 10px; text-align: center; }}
     </style>
 </head>
 <body>
 
 <h2>Usage Report for {date_str}</h2>
+<p id="usageCount"></p>
 
+<div id="usageScroll">
 <table id="usageTable">
     <thead>
         <tr>
@@ -59,37 +190,78 @@ def generate_html(data, date_str):
             <th onclick="sortTable(1)">Duration (min:sec)</th>
         </tr>
     </thead>
-    <tbody>
-"""
-    for key, seconds in sorted(app_data.items(), key=lambda x: -x[1]):
-        mins = seconds // 60
-        secs = seconds % 60
-        html += f"<tr><td>{key}</td><td>{mins}:{secs:02}</td></tr>\n"
-
-    html += f"""
-    </tbody>
+    <tbody></tbody>
 </table>
+</div>
 
-<h3>Application Usage</h3>
+<h3>Application Usage (top {limit})</h3>
 <canvas id="appChart" style="max-width: 800px; max-height: 800px;"></canvas>
 
-<h3>Chrome Site Usage</h3>
+<h3>Chrome Site Usage (top {limit})</h3>
 <canvas id="siteChart" style="max-width: 800px; max-height: 800px;"></canvas>
 
+{heatmap_html(heatmap) if heatmap else ""}
+
 <script>
+// [label, seconds]; sorting compares the raw seconds, not the formatted text
+const rows = {table_rows};
+const ROW_HEIGHT = 29;
+const OVERSCAN = 10;
+const scroller = document.getElementById("usageScroll");
+const tbody = document.querySelector("#usageTable tbody");
+let sortColumn = 1, sortAsc = false;
+
+function formatDuration(seconds) {{
+    return Math.floor(seconds / 60) + ":" + String(seconds % 60).padStart(2, "0");
+}}
+
+function spacer(height) {{
+    const tr = document.createElement("tr");
+    const td = document.createElement("td");
+    td.colSpan = 2;
+    td.style.cssText = "height:" + height + "px;padding:0;border:0";
+    tr.appendChild(td);
+    return tr;
+}}
+
+function renderRows() {{
+    const first = Math.max(0, Math.floor(scroller.scrollTop / ROW_HEIGHT) - OVERSCAN);
+    const last = Math.min(rows.length, Math.ceil((scroller.scrollTop + scroller.clientHeight) / ROW_HEIGHT) + OVERSCAN);
+    const fragment = document.createDocumentFragment();
+    fragment.appendChild(spacer(first * ROW_HEIGHT));
+    for (let i = first; i < last; i++) {{
+        const tr = document.createElement("tr");
+        tr.insertCell().textContent = rows[i][0];
+        tr.insertCell().textContent = formatDuration(rows[i][1]);
+        fragment.appendChild(tr);
+    }}
+    fragment.appendChild(spacer((rows.length - last) * ROW_HEIGHT));
+    tbody.replaceChildren(fragment);
+}}
+
 function sortTable(n) {{
-    var table = document.getElementById("usageTable");
-    var rows = Array.from(table.rows).slice(1);
-    var asc = table.getAttribute("data-sort-dir") !== "asc";
-    rows.sort((a, b) => {{
-        const x = a.cells[n].textContent.toLowerCase();
-        const y = b.cells[n].textContent.toLowerCase();
-        return asc ? x.localeCompare(y) : y.localeCompare(x);
-    }});
-    rows.forEach(row => table.appendChild(row));
-    table.setAttribute("data-sort-dir", asc ? "asc" : "desc");
+    sortAsc = n === sortColumn ? !sortAsc : n === 0;
+    sortColumn = n;
+    const dir = sortAsc ? 1 : -1;
+    if (n === 0) {{
+        const collator = new Intl.Collator(undefined, {{ sensitivity: "base" }});
+        rows.sort((a, b) => dir * collator.compare(a[0], b[0]));
+    }} else {{
+        rows.sort((a, b) => dir * (a[1] - b[1]));
+    }}
+    renderRows();
 }}
 
+let renderPending = false;
+scroller.addEventListener("scroll", () => {{
+    if (!renderPending) {{
+        renderPending = true;
+        requestAnimationFrame(() => {{ renderPending = false; renderRows(); }});
+    }}
+}});
+document.getElementById("usageCount").textContent = rows.length + " applications / sites";
+renderRows();
+
 const appChart = new Chart(document.getElementById('appChart'), {{
     type: 'bar',
     data: {{
@@ -102,6 +274,7 @@ const appChart = new Chart(document.getElementById('appChart'), {{
     }},
     options: {{
         responsive: true,
+        animation: false,
         plugins: {{
             legend: {{ display: false }}
         }}
@@ -128,7 +301,8 @@ const siteChart = new Chart(document.getElementById('siteChart'), {{
         }}]
     }},
     options: {{
-        responsive: true
+        responsive: true,
+        animation: false
     }}
 }});
 </script>
@@ -138,15 +312,38 @@ const siteChart = new Chart(document.getElementById('siteChart'), {{
 """
     return html
 
-def main():
-    date_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    data = fetch_data_for_day(date_str)
-    html = generate_html(data, date_str)
+def load_chart_js(path=CHART_JS_VENDOR):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError as e:
+        raise SystemExit(f"Cannot inline Chart.js from {path}: {e}")
+
+def write_report(db_path=DB_NAME, chart_js_path=None, limit=TOP_N):
+    """Refresh the checkpointed aggregates and write REPORT_FILE."""
+    today = datetime.datetime.now().date()
+    date_str = today.strftime("%Y-%m-%d")
+    state = refresh_state(load_state(), today, db_path)
+    save_state(state)
+    chart_js = load_chart_js(chart_js_path) if chart_js_path else None
+    html = generate_html(state["totals"], date_str, state["heatmap"], chart_js, limit)
 
     with open(REPORT_FILE, "w", encoding="utf-8") as f:
         f.write(html)
 
     print(f"✅ HTML report generated: {REPORT_FILE}")
 
+def main():
+    parser = argparse.ArgumentParser(description="Generate today's HTML usage report.")
+    parser.add_argument("--db", default=DB_NAME, help="Path to activity_log.db")
+    parser.add_argument("--top", type=int, default=TOP_N, help="Entries shown in the charts before 'Other'")
+    parser.add_argument("--offline", action="store_true",
+                        help=f"Inline Chart.js from {CHART_JS_VENDOR} instead of loading it from the CDN")
+    parser.add_argument("--chart-js", help="Inline Chart.js from this file (implies --offline)")
+    args = parser.parse_args()
+
+    chart_js_path = args.chart_js or (CHART_JS_VENDOR if args.offline else None)
+    write_report(args.db, chart_js_path, args.top)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,228 @@
+# maintenance.py – retention, downsampling and compaction for activity_log.db
+#
+# Raw sessions are kept for --raw-days, then archived to gzip'd JSON lines
+# (activity_log_<day>_<last id>.jsonl.gz, one file per batch) and rolled up into
+# activity_hourly. Hourly rows older than --hourly-months are rolled up into
+# activity_daily, which is kept forever. Every step runs in short per-day
+# transactions in WAL mode, so the tracker can keep writing.
+
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from queries import bump_data_generation
+from uploader import forget_changes
+
+DB_NAME = "activity_log.db"
+ARCHIVE_DIR = "archive"
+RAW_DAYS = 30
+HOURLY_MONTHS = 6
+
+
+def connect(db_path=DB_NAME):
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def create_rollup_tables(conn):
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS activity_hourly (
+            date TEXT NOT NULL,
+            hour INTEGER NOT NULL,
+            app_name TEXT NOT NULL,
+            site TEXT NOT NULL DEFAULT '',
+            duration INTEGER NOT NULL,
+            sessions INTEGER NOT NULL,
+            PRIMARY KEY (date, hour, app_name, site)
+        );
+        CREATE TABLE IF NOT EXISTS activity_daily (
+            date TEXT NOT NULL,
+            app_name TEXT NOT NULL,
+            site TEXT NOT NULL DEFAULT '',
+            duration INTEGER NOT NULL,
+            sessions INTEGER NOT NULL,
+            PRIMARY KEY (date, app_name, site)
+        );
+        CREATE INDEX IF NOT EXISTS idx_activity_log_date ON activity_log(date);
+    ''')
+    conn.commit()
+
+
+def months_ago(day, months):
+    year, month = divmod(day.year * 12 + day.month - 1 - months, 12)
+    month += 1
+    # Clamp to the end of shorter months (e.g. 31 March -> 28/29 February)
+    last_day = (date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)).day
+    return date(year, month, min(day.day, last_day))
+
+
+def split_by_hour(start, end):
+    """Yield (date, hour, seconds) for each clock hour a session overlaps."""
+    while start < end:
+        hour_end = start.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        chunk_end = min(hour_end, end)
+        yield start.strftime("%Y-%m-%d"), start.hour, (chunk_end - start).total_seconds()
+        start = chunk_end
+
+
+def write_archive(archive_dir, day, columns, rows, max_id):
+    """One file per batch: a day archived again after late rows arrived must not replace the first batch."""
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"activity_log_{day}_{max_id}.jsonl.gz")
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(dict(zip(columns, row))) + "\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def archive_raw_day(conn, day, archive_dir, dry_run=False):
+    """Archive and roll up one day of raw sessions. Returns the number of rows removed."""
+    c = conn.cursor()
+    c.execute("SELECT * FROM activity_log WHERE date = ? ORDER BY id", (day,))
+    columns = [d[0] for d in c.description]
+    rows = c.fetchall()
+    if not rows or dry_run:
+        return len(rows)
+
+    index = {name: i for i, name in enumerate(columns)}
+    max_id = rows[-1][index["id"]]
+    write_archive(archive_dir, day, columns, rows, max_id)
+
+    hourly = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        start = datetime.fromisoformat(row[index["start_time"]])
+        end = datetime.fromisoformat(row[index["end_time"]])
+        key_rest = (row[index["app_name"]] or "", row[index["site"]] or "")
+        for bucket_day, hour, seconds in split_by_hour(start, end):
+            bucket = hourly[(bucket_day, hour) + key_rest]
+            bucket[0] += seconds
+            bucket[1] += 1
+
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.executemany('''
+            INSERT INTO activity_hourly (date, hour, app_name, site, duration, sessions)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (date, hour, app_name, site) DO UPDATE SET
+                duration = duration + excluded.duration,
+                sessions = sessions + excluded.sessions
+        ''', [key + (int(round(seconds)), sessions) for key, (seconds, sessions) in hourly.items()])
+        c.execute("DELETE FROM activity_log WHERE date = ? AND id <= ?", (day, max_id))
+        # The central store keeps archived rows, so these deletes are not uploaded
+        forget_changes(conn, [row[index["id"]] for row in rows])
+        bump_data_generation(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows)
+
+
+def roll_up_hourly(conn, cutoff, dry_run=False):
+    """Fold hourly rows older than cutoff into daily rows. Returns the number of hourly rows removed."""
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM activity_hourly WHERE date < ?", (cutoff,))
+    count = c.fetchone()[0]
+    if not count or dry_run:
+        return count
+
+    c.execute("BEGIN IMMEDIATE")
+    try:
+        c.execute('''
+            INSERT INTO activity_daily (date, app_name, site, duration, sessions)
+            SELECT date, app_name, site, SUM(duration), SUM(sessions)
+            FROM activity_hourly
+            WHERE date < ?
+            GROUP BY date, app_name, site
+            ON CONFLICT (date, app_name, site) DO UPDATE SET
+                duration = duration + excluded.duration,
+                sessions = sessions + excluded.sessions
+        ''', (cutoff,))
+        c.execute("DELETE FROM activity_hourly WHERE date < ?", (cutoff,))
+        bump_data_generation(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def incremental_vacuum(conn, pages=None):
+    """Return free pages to the OS. Needs auto_vacuum=INCREMENTAL (see --enable-incremental-vacuum)."""
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    if mode != 2:
+        print("auto_vacuum is not INCREMENTAL; run once with --enable-incremental-vacuum "
+              "while the tracker is stopped to reclaim space.")
+        return 0
+    free_before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if pages:
+        conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    else:
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+    free_after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return free_before - free_after
+
+
+def run_maintenance(db_path=DB_NAME, raw_days=RAW_DAYS, hourly_months=HOURLY_MONTHS,
+                    archive_dir=ARCHIVE_DIR, vacuum_pages=None, dry_run=False):
+    conn = connect(db_path)
+    create_rollup_tables(conn)
+    conn.isolation_level = None  # Transactions below are managed explicitly
+
+    today = date.today()
+    raw_cutoff = (today - timedelta(days=raw_days)).isoformat()
+    hourly_cutoff = months_ago(today, hourly_months).isoformat()
+
+    days = [row[0] for row in conn.execute(
+        "SELECT DISTINCT date FROM activity_log WHERE date < ? ORDER BY date", (raw_cutoff,))]
+    archived = 0
+    for day in days:
+        archived += archive_raw_day(conn, day, archive_dir, dry_run)
+    rolled = roll_up_hourly(conn, hourly_cutoff, dry_run)
+    freed = 0 if dry_run else incremental_vacuum(conn, vacuum_pages)
+    conn.close()
+
+    prefix = "[dry run] " if dry_run else ""
+    print(f"{prefix}Raw sessions before {raw_cutoff}: {archived} rows in {len(days)} day(s) archived to hourly")
+    print(f"{prefix}Hourly rows before {hourly_cutoff}: {rolled} rolled up to daily")
+    if not dry_run:
+        print(f"Freed {freed} page(s)")
+
+
+def enable_incremental_vacuum(db_path=DB_NAME):
+    """One-off switch to auto_vacuum=INCREMENTAL. VACUUM needs exclusive access, so stop the tracker first."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.isolation_level = None
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    conn.close()
+    print(f"Enabled incremental vacuum on {db_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply the retention policy to activity_log.db.")
+    parser.add_argument("--db", default=DB_NAME)
+    parser.add_argument("--raw-days", type=int, default=RAW_DAYS, help="Days of raw sessions to keep")
+    parser.add_argument("--hourly-months", type=int, default=HOURLY_MONTHS, help="Months of hourly aggregates to keep")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="Where aged-out raw days are exported")
+    parser.add_argument("--vacuum-pages", type=int, default=None, help="Max pages to free (default: all)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be done")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="Switch the DB to auto_vacuum=INCREMENTAL (stop the tracker first)")
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum(args.db)
+        return
+    run_maintenance(args.db, args.raw_days, args.hourly_months, args.archive_dir, args.vacuum_pages, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+# metrics.py – tiny in-process counters, gauges and histograms with Prometheus text output
+#
+# The tracker records into the module-level REGISTRY and periodically dumps it to
+# METRICS_FILE; remote_server.py renders that snapshot (plus its own registry) on
+# /metrics. Recording is a dict lookup and an integer add, cheap enough for the
+# once-a-second poll loop.
+
+import json
+import os
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+METRICS_FILE = "tracker_metrics.json"
+# Seconds; covers a fast Win32 call up to a commit stuck behind a checkpoint
+TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def snapshot(self):
+        return {"value": self.value}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=TIME_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def _get(self, cls, name, help_text, *args):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help_text, *args)
+        return metric
+
+    def counter(self, name, help_text=""):
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name, help_text=""):
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name, help_text="", buckets=TIME_BUCKETS):
+        return self._get(Histogram, name, help_text, buckets)
+
+    def snapshot(self):
+        return {name: dict(metric.snapshot(), type=metric.kind, help=metric.help)
+                for name, metric in self.metrics.items()}
+
+    def write_snapshot(self, path=METRICS_FILE):
+        data = {"written_at": time.time(), "metrics": self.snapshot()}
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def render(self):
+        return render_snapshot(self.snapshot())
+
+
+REGISTRY = Registry()
+
+
+def load_snapshot(path=METRICS_FILE):
+    """Return the saved snapshot dict, or None if it is missing or half-written."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _format(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_snapshot(metrics):
+    """Prometheus text exposition format (0.0.4) for a {name: snapshot} dict."""
+    lines = []
+    for name, data in sorted(metrics.items()):
+        if data.get("help"):
+            lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        if data["type"] == "histogram":
+            cumulative = 0
+            for bound, count in zip(data["buckets"] + [float("inf")], data["counts"]):
+                cumulative += count
+                lines.append(f'{name}_bucket{{le="{_format(bound)}"}} {cumulative}')
+            lines.append(f"{name}_sum {_format(data['sum'])}")
+            lines.append(f"{name}_count {data['count']}")
+        else:
+            lines.append(f"{name} {_format(data['value'])}")
+    return "\n".join(lines) + "\n"
+
+
+def file_size(path):
+    """Size of a SQLite DB including its -wal file, 0 if it does not exist."""
+    total = 0
+    for candidate in (path, path + "-wal"):
+        if os.path.exists(candidate):
+            total += os.path.getsize(candidate)
+    return total
@@ -0,0 +1,172 @@
+# queries.py – the one place the report scripts read activity data from
+#
+# All reads go through a single shared read-only connection per DB file, and
+# every period becomes a half-open [start, end) range on indexed columns. Rows
+# that maintenance.py has rolled up into activity_hourly / activity_daily are
+# included automatically, so reports keep working past the raw retention window.
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+DB_NAME = "activity_log.db"
+MAX_ROW_ID = 2 ** 63 - 1
+
+_connections = {}
+_lock = threading.Lock()
+
+
+def ensure_indexes(db_path=DB_NAME):
+    """Create the indexes the range queries rely on (no-op if they exist)."""
+    if not os.path.exists(db_path):
+        return
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_log_date ON activity_log(date)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_log_start_time ON activity_log(start_time)")
+        conn.commit()
+    except sqlite3.Error as e:
+        print(f"Could not create indexes on {db_path}: {e}")
+    finally:
+        conn.close()
+
+
+def get_connection(db_path=DB_NAME):
+    """Return the shared read-only connection for db_path, opening it on first use."""
+    with _lock:
+        conn = _connections.get(db_path)
+        if conn is None:
+            ensure_indexes(db_path)
+            uri = Path(db_path).absolute().as_uri() + "?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=30, check_same_thread=False)
+            _connections[db_path] = conn
+        return conn
+
+
+def close_connections():
+    with _lock:
+        for conn in _connections.values():
+            conn.close()
+        _connections.clear()
+
+
+def execute(sql, params=(), db_path=DB_NAME):
+    """Run a read query on the shared connection and return all rows."""
+    conn = get_connection(db_path)
+    with _lock:
+        return conn.execute(sql, params).fetchall()
+
+
+def period_range(period, value):
+    """Return [start, end) dates for a day (YYYY-MM-DD), week (YYYY-W##), month (YYYY-MM) or year (YYYY)."""
+    if period == "day":
+        start = datetime.strptime(value, "%Y-%m-%d")
+        end = start + timedelta(days=1)
+    elif period == "week":
+        year, week = value.split("-W")
+        start = datetime.strptime(f"{year}-W{int(week)}-1", "%Y-W%W-%w")
+        end = start + timedelta(days=7)
+    elif period == "month":
+        start = datetime.strptime(value, "%Y-%m")
+        end = (start + timedelta(days=32)).replace(day=1)
+    elif period == "year":
+        start = datetime.strptime(value, "%Y")
+        end = start.replace(year=start.year + 1)
+    else:
+        raise ValueError("Invalid period. Use 'day', 'week', 'month' or 'year'.")
+    return start.date(), end.date()
+
+
+def day_bounds(start_date, end_date, tz=None):
+    """Local (naive, as stored) datetimes for midnight of start_date and end_date.
+
+    start_time is stored in the tracker machine's local time. When tz is given
+    the day boundaries are midnight in that zone, converted to local time.
+    """
+    start = datetime.combine(start_date, time())
+    end = datetime.combine(end_date, time())
+    if tz:
+        if ZoneInfo is None:
+            raise ValueError("Time zones need Python 3.9+ (zoneinfo)")
+        zone = ZoneInfo(tz)
+        start = start.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+        end = end.replace(tzinfo=zone).astimezone().replace(tzinfo=None)
+    return start, end
+
+
+def table_names(db_path):
+    rows = execute("SELECT name FROM sqlite_master WHERE type = 'table'", db_path=db_path)
+    return {name for (name,) in rows}
+
+
+def max_row_id(db_path=DB_NAME):
+    return execute("SELECT COALESCE(MAX(id), 0) FROM activity_log", db_path=db_path)[0][0]
+
+
+def data_generation(db_path=DB_NAME):
+    """Counter bumped whenever existing rows are rewritten (compaction, retention)."""
+    return execute("PRAGMA user_version", db_path=db_path)[0][0]
+
+
+def bump_data_generation(conn):
+    """Mark existing rows as changed so checkpointed aggregates get rebuilt. Call inside the writing transaction."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    conn.execute(f"PRAGMA user_version = {version + 1}")
+
+
+def id_range(min_id, low="?", high="?"):
+    """SQL for the activity_log id range (low, high].
+
+    Without a lower bound the ids are wrapped in a unary + so SQLite keeps using
+    the start_time index instead of scanning the whole table by rowid.
+    """
+    column = "id" if min_id else "+id"
+    return f"{column} > {low} AND {column} <= {high}"
+
+
+def totals(start_date, end_date, db_path=DB_NAME, tz=None, min_id=0, max_id=None):
+    """Seconds per (app_name, site) for [start_date, end_date), largest first. site is None for non-browser apps.
+
+    min_id / max_id limit activity_log to the id range (min_id, max_id]; with a
+    min_id the rollup tables are skipped, as they only ever hold older rows.
+    """
+    start, end = day_bounds(start_date, end_date, tz)
+    tables = table_names(db_path) if not min_id else set()
+
+    parts = [f'''
+        SELECT app_name, NULLIF(site, '') AS site, duration FROM activity_log
+        WHERE start_time >= ? AND start_time < ? AND {id_range(min_id)}
+    ''']
+    params = [start.isoformat(), end.isoformat(), min_id, MAX_ROW_ID if max_id is None else max_id]
+    if "activity_hourly" in tables:
+        # The date prefilter uses the primary key; the hour key trims partial days at tz offsets
+        parts.append('''
+            SELECT app_name, NULLIF(site, ''), duration FROM activity_hourly
+            WHERE date >= ? AND date <= ?
+              AND date || ' ' || printf('%02d', hour) >= ? AND date || ' ' || printf('%02d', hour) < ?
+        ''')
+        params += [start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"),
+                   start.strftime("%Y-%m-%d %H"), end.strftime("%Y-%m-%d %H")]
+    if "activity_daily" in tables:
+        parts.append('''
+            SELECT app_name, NULLIF(site, ''), duration FROM activity_daily
+            WHERE date >= ? AND date < ?
+        ''')
+        params += [start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")]
+
+    sql = ("SELECT app_name, site, SUM(duration) FROM ("
+           + " UNION ALL ".join(parts)
+           + ") GROUP BY app_name, site ORDER BY SUM(duration) DESC")
+    return execute(sql, params, db_path)
+
+
+def totals_for_period(period, value, db_path=DB_NAME, tz=None):
+    start_date, end_date = period_range(period, value)
+    return totals(start_date, end_date, db_path, tz)
@@ -1,9 +1,35 @@
-from flask import Flask, jsonify, send_file
-import subprocess
+from flask import Flask, Response, jsonify, request, send_file
+import hmac
+import json
 import os
+import threading
+import time
+import zlib
+
+import central_store
+import generate_html_report
+import metrics
+import time_buckets
+from datetime import datetime
 
 app = Flask(__name__)
 REPORT_FILE = "activity_report.html"
+MAX_BATCH_ROWS = 10000
+# Limits on the request body as sent and after gunzip, so a small gzip bomb can't fill memory
+MAX_BODY_BYTES = 8 * 1024 * 1024
+MAX_DECOMPRESSED_BYTES = 64 * 1024 * 1024
+# Shared secret the uploaders send as "Authorization: Bearer <token>"; /ingest is refused without it
+INGEST_TOKEN = os.environ.get("ACTIVITY_INGEST_TOKEN", "")
+report_lock = threading.Lock()
+app.config["MAX_CONTENT_LENGTH"] = MAX_BODY_BYTES
+
+INGEST_BATCHES = metrics.REGISTRY.counter("server_ingest_batches_total", "Batches accepted on /ingest")
+INGEST_DUPLICATES = metrics.REGISTRY.counter("server_ingest_duplicate_batches_total", "Batches that were resent")
+INGEST_ROWS = metrics.REGISTRY.counter("server_ingest_rows_total", "Rows received on /ingest")
+INGEST_SECONDS = metrics.REGISTRY.histogram("server_ingest_seconds", "Time to store one /ingest batch")
+REPORT_SECONDS = metrics.REGISTRY.histogram("server_generate_report_seconds", "Time per /generate_report refresh")
+
+central_store.create_central_db()
 
 @app.route("/ping")
 def ping():
@@ -12,7 +38,9 @@ def ping():
 @app.route("/generate_report")
 def generate_report():
     try:
-        subprocess.run(["python", "generate_html_report.py"], check=True)
+        # In-process, so each refresh only folds in new rows on an already open connection
+        with report_lock, REPORT_SECONDS.time():
+            generate_html_report.write_report()
         return jsonify(status="ok", report=REPORT_FILE)
     except Exception as e:
         return jsonify(status="error", error=str(e))
@@ -23,5 +51,108 @@ def report():
         return send_file(REPORT_FILE)
     return jsonify(status="error", message="No report available")
 
+@app.route("/heatmap")
+def heatmap():
+    try:
+        days = request.args.get("days", 28, type=int)
+        minutes = request.args.get("minutes", 60, type=int)
+        end = request.args.get("end")
+        end_date = datetime.strptime(end, "%Y-%m-%d").date() if end else None
+        return jsonify(status="ok", **time_buckets.heatmap_for_days(days, end_date, minutes))
+    except Exception as e:
+        return jsonify(status="error", error=str(e)), 400
+
+@app.route("/timeseries")
+def timeseries():
+    try:
+        start = datetime.strptime(request.args["start"], "%Y-%m-%d").date()
+        end = datetime.strptime(request.args["end"], "%Y-%m-%d").date()
+        minutes = request.args.get("minutes", 60, type=int)
+        rows = time_buckets.bucket_series(start, end, minutes)
+        return jsonify(status="ok", minutes=minutes, buckets=[
+            {"start": bucket, "app": app_name, "site": site, "seconds": seconds}
+            for bucket, app_name, site, seconds in rows])
+    except Exception as e:
+        return jsonify(status="error", error=str(e)), 400
+
+class BodyTooLarge(ValueError):
+    pass
+
+def gunzip_limited(body, limit=MAX_DECOMPRESSED_BYTES):
+    """gunzip body, giving up as soon as the output would exceed limit bytes."""
+    decompressor = zlib.decompressobj(wbits=31)
+    data = decompressor.decompress(body, limit)
+    if decompressor.unconsumed_tail:
+        raise BodyTooLarge(f"batch larger than {limit} bytes uncompressed")
+    if not decompressor.eof:
+        raise ValueError("truncated gzip body")
+    return data
+
+def ingest_authorized():
+    if not INGEST_TOKEN:
+        return False
+    sent = request.headers.get("Authorization", "")
+    return hmac.compare_digest(sent.encode("utf-8"), f"Bearer {INGEST_TOKEN}".encode("utf-8"))
+
+@app.route("/ingest", methods=["POST"])
+def ingest():
+    if not ingest_authorized():
+        return jsonify(status="error", error="missing or wrong ingest token (set ACTIVITY_INGEST_TOKEN)"), 401
+    if request.content_length is None:
+        return jsonify(status="error", error="Content-Length required"), 411
+    if request.content_length > MAX_BODY_BYTES:
+        return jsonify(status="error", error=f"request body must be at most {MAX_BODY_BYTES} bytes"), 413
+    try:
+        body = request.get_data()
+        if request.headers.get("Content-Encoding") == "gzip":
+            body = gunzip_limited(body)
+        batch = json.loads(body)
+        host_id, seq, rows = str(batch["host_id"]), int(batch["seq"]), batch["rows"]
+        db_id = str(batch.get("db_id", ""))
+        deleted = [int(source_id) for source_id in batch.get("deleted", [])]
+        if len(rows) + len(deleted) > MAX_BATCH_ROWS:
+            return jsonify(status="error", error=f"batch larger than {MAX_BATCH_ROWS} rows"), 413
+    except BodyTooLarge as e:
+        return jsonify(status="error", error=str(e)), 413
+    except Exception as e:
+        return jsonify(status="error", error=f"bad batch: {e}"), 400
+
+    conn = central_store.connect()
+    try:
+        with INGEST_SECONDS.time():
+            is_new = central_store.ingest_batch(conn, host_id, seq, rows, db_id, deleted)
+        INGEST_BATCHES.inc()
+        INGEST_ROWS.inc(len(rows))
+        if not is_new:
+            INGEST_DUPLICATES.inc()
+        return jsonify(status="ok", host_id=host_id, seq=seq, rows=len(rows), duplicate=not is_new)
+    except Exception as e:
+        return jsonify(status="error", error=str(e)), 500
+    finally:
+        conn.close()
+
+@app.route("/hosts")
+def hosts():
+    conn = central_store.connect()
+    try:
+        return jsonify(status="ok", hosts=central_store.host_status(conn))
+    finally:
+        conn.close()
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Tracker snapshot plus this server's own metrics, in Prometheus text format."""
+    data = metrics.REGISTRY.snapshot()
+    data["activity_db_size_bytes"] = {"type": "gauge", "help": "Size of activity_log.db including its WAL",
+                                      "value": metrics.file_size(generate_html_report.DB_NAME)}
+    data["central_db_size_bytes"] = {"type": "gauge", "help": "Size of central_activity.db including its WAL",
+                                     "value": metrics.file_size(central_store.CENTRAL_DB)}
+    snapshot = metrics.load_snapshot()
+    if snapshot:
+        data.update(snapshot["metrics"])
+        data["tracker_snapshot_age_seconds"] = {"type": "gauge", "help": "Seconds since the tracker wrote its metrics",
+                                                "value": round(time.time() - snapshot["written_at"], 3)}
+    return Response(metrics.render_snapshot(data), mimetype="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5002)
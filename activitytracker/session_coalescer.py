@@ -0,0 +1,193 @@
+# session_coalescer.py – merges noisy back-to-back sessions before (or after) they hit the DB
+
+import argparse
+import re
+import sqlite3
+from datetime import datetime
+
+from queries import bump_data_generation
+
+DB_NAME = "activity_log.db"
+DEFAULT_GRACE_SECONDS = 5
+
+# (pattern, replacement) pairs applied to window titles before comparing them
+DEFAULT_TITLE_RULES = [
+    (r'^\(\d+\+?\)\s*', ''),                 # unread counters: "(3) YouTube"
+    (r'\b\d{1,2}:\d{2}(:\d{2})?\b', ''),     # ticking clocks and timers: "12:04 / 45:10"
+    (r'^[●•*]\s*', ''),                      # unsaved-changes markers
+    (r'\s*[-–|]\s*$', ''),                   # separators left dangling by the rules above
+    (r'\s{2,}', ' '),
+]
+
+
+def compile_rules(rules):
+    return [(re.compile(pattern), replacement) for pattern, replacement in rules]
+
+
+def normalize_title(title, compiled_rules):
+    title = title or ""
+    for pattern, replacement in compiled_rules:
+        title = pattern.sub(replacement, title)
+    return title.strip()
+
+
+class Session:
+    def __init__(self, app_name, title, site, start, end, row_id=None):
+        self.app_name = app_name
+        self.title = title
+        self.site = site
+        self.start = start
+        self.end = end
+        self.ids = [row_id] if row_id is not None else []
+        self.saved_id = None  # Row a checkpoint stored this session in, and that row's start and end
+        self.saved_start = None
+        self.saved_end = None
+
+    @property
+    def duration(self):
+        return (self.end - self.start).total_seconds()
+
+
+class SessionCoalescer:
+    """Buffers sessions and emits them merged.
+
+    Consecutive sessions of the same app and site (or, outside the browser, the
+    same normalized title) are merged when the gap between them is within the
+    grace window. A flip to something else that lasts less than the grace window
+    and comes straight back (A -> B -> A) is absorbed into the surrounding session.
+
+    A merged session is emitted only once something else follows it, which can
+    take as long as the user stays in that app. checkpoint, if given, is called
+    with the pending session after every add, so a caller can store it early.
+    """
+
+    def __init__(self, emit, grace_seconds=DEFAULT_GRACE_SECONDS, title_rules=DEFAULT_TITLE_RULES,
+                 site_func=None, absorb_flips=True, checkpoint=None):
+        self.emit = emit
+        self.checkpoint = checkpoint
+        self.grace_seconds = grace_seconds
+        self.rules = compile_rules(title_rules)
+        self.site_func = site_func
+        self.absorb_flips = absorb_flips
+        self.pending = None
+        self.flip = None
+        self.sessions_in = 0
+        self.sessions_out = 0
+
+    def key(self, session):
+        app = (session.app_name or "").lower()
+        if session.site:
+            return app, session.site.lower()
+        return app, normalize_title(session.title, self.rules).lower()
+
+    def add(self, app_name, title, start, end, site=None, row_id=None):
+        if site is None and self.site_func:
+            site = self.site_func(app_name, title)
+        self.sessions_in += 1
+        self._push(Session(app_name, title, site, start, end, row_id))
+        if self.checkpoint and self.pending is not None:
+            self.checkpoint(self.pending)
+
+    def _push(self, session):
+        pending = self.pending
+        if pending is None:
+            self.pending = session
+            return
+
+        if self.flip is not None:
+            if self.key(session) == self.key(pending):
+                # A -> short B -> A: fold all three into the first session
+                pending.end = session.end
+                pending.ids += self.flip.ids + session.ids
+                self.flip = None
+                return
+            self._emit(pending)
+            self.pending, self.flip = self.flip, None
+            self._push(session)
+            return
+
+        gap = (session.start - pending.end).total_seconds()
+        if self.key(session) == self.key(pending) and gap <= self.grace_seconds:
+            pending.end = max(pending.end, session.end)
+            pending.ids += session.ids
+            return
+
+        if self.absorb_flips and session.duration < self.grace_seconds and gap <= self.grace_seconds:
+            self.flip = session
+            return
+
+        self._emit(pending)
+        self.pending = session
+
+    def _emit(self, session):
+        self.sessions_out += 1
+        self.emit(session)
+
+    def flush(self):
+        """Emit everything still buffered (call on shutdown)."""
+        if self.pending is not None:
+            self._emit(self.pending)
+        if self.flip is not None:
+            self._emit(self.flip)
+        self.pending, self.flip = None, None
+
+
+def compact_db(db_path=DB_NAME, grace_seconds=DEFAULT_GRACE_SECONDS, title_rules=DEFAULT_TITLE_RULES,
+               dry_run=False):
+    """Apply the coalescer to rows already stored in activity_log.
+
+    Each merged group keeps its first row (with the end time and duration
+    extended) and the rest are deleted. The newest row is left alone, as the
+    tracker may still be extending it (see activity_tracker.store_session).
+    Returns (rows_before, rows_after).
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    c = conn.cursor()
+    c.execute('''
+        SELECT id, app_name, window_title, site, start_time, end_time
+        FROM activity_log
+        WHERE id < (SELECT MAX(id) FROM activity_log)
+        ORDER BY start_time, id
+    ''')
+
+    updates = []
+    deletes = []
+
+    def collect(session):
+        if len(session.ids) > 1:
+            duration = int(session.duration)
+            updates.append((session.end.isoformat(), duration, session.ids[0]))
+            deletes.extend((row_id,) for row_id in session.ids[1:])
+
+    coalescer = SessionCoalescer(collect, grace_seconds=grace_seconds, title_rules=title_rules)
+    for row_id, app_name, title, site, start_time, end_time in c.fetchall():
+        coalescer.add(app_name, title, datetime.fromisoformat(start_time), datetime.fromisoformat(end_time),
+                      site=site or "", row_id=row_id)
+    coalescer.flush()
+
+    rows_before, rows_after = coalescer.sessions_in, coalescer.sessions_out
+    if not dry_run and deletes:
+        with conn:
+            c.executemany("UPDATE activity_log SET end_time = ?, duration = ? WHERE id = ?", updates)
+            c.executemany("DELETE FROM activity_log WHERE id = ?", deletes)
+            bump_data_generation(conn)
+    conn.close()
+    return rows_before, rows_after
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge fragmented sessions in an existing activity DB.")
+    parser.add_argument("--db", default=DB_NAME, help="Path to activity_log.db")
+    parser.add_argument("--grace", type=float, default=DEFAULT_GRACE_SECONDS,
+                        help="Merge window in seconds (also the longest flip that gets absorbed)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would change")
+    args = parser.parse_args()
+
+    before, after = compact_db(args.db, args.grace, dry_run=args.dry_run)
+    reduction = (1 - after / before) * 100 if before else 0
+    verb = "Would reduce" if args.dry_run else "Reduced"
+    print(f"{verb} activity_log from {before} to {after} rows ({reduction:.1f}% fewer)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# synthetic_data.py – fill an activity_log.db with realistic fake sessions for benchmarking
+#
+#   python synthetic_data.py --rows 1000000 --days 365 --db bench_activity.db
+#
+# Sessions follow each other through a working day with short gaps. Apps and
+# Chrome sites are picked by weight, and window titles per app/site are
+# Zipf-distributed, so a few titles dominate and there is a long tail of
+# one-offs, like real usage.
+
+import argparse
+import os
+import random
+import sqlite3
+import time
+from datetime import date, datetime, timedelta
+
+DB_NAME = "activity_log.db"
+DAY_START_HOUR = 8
+DAY_HOURS = 14
+
+# (app_name, weight); chrome.exe rows get a site from SITES
+APPS = [
+    ("chrome.exe", 40), ("Code.exe", 20), ("pycharm64.exe", 8), ("WINWORD.EXE", 5), ("EXCEL.EXE", 5),
+    ("explorer.exe", 6), ("Teams.exe", 6), ("slack.exe", 4), ("WindowsTerminal.exe", 4), ("spotify.exe", 2),
+]
+SITES = [
+    ("youtube.com", 25), ("github.com", 20), ("stackoverflow.com", 12), ("mail.google.com", 10),
+    ("chat.openai.com", 8), ("docs.python.org", 6), ("reddit.com", 6), ("news.ycombinator.com", 5),
+    ("wikipedia.org", 4), ("linkedin.com", 4),
+]
+
+
+def create_schema(conn):
+    # Same layout as activity_tracker.create_db
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            app_name TEXT,
+            window_title TEXT,
+            site TEXT,
+            start_time TEXT,
+            end_time TEXT,
+            duration INTEGER,
+            date TEXT
+        )
+    ''')
+
+
+def zipf_cum_weights(count, s):
+    total, cum = 0.0, []
+    for rank in range(1, count + 1):
+        total += 1.0 / rank ** s
+        cum.append(total)
+    return cum
+
+
+def cum_weights(pairs):
+    total, cum = 0, []
+    for _, weight in pairs:
+        total += weight
+        cum.append(total)
+    return cum
+
+
+def title_for(app_name, site, rank):
+    if site:
+        return f"Page {rank} - {site} - Google Chrome"
+    return f"Document {rank} - {app_name.rsplit('.', 1)[0]}"
+
+
+def generate_rows(rows, days, end_date=None, titles=1000, zipf_s=1.1, seed=0):
+    """Yield activity_log tuples (without id) for `rows` sessions spread over `days` days ending end_date."""
+    rng = random.Random(seed)
+    end_date = end_date or date.today() - timedelta(days=1)
+    first_day = end_date - timedelta(days=days - 1)
+    app_names = [app for app, _ in APPS]
+    site_names = [site for site, _ in SITES]
+    app_cum, site_cum = cum_weights(APPS), cum_weights(SITES)
+    title_ranks = list(range(1, titles + 1))
+    title_cum = zipf_cum_weights(titles, zipf_s)
+
+    per_day, extra = divmod(rows, days)
+    for day_index in range(days):
+        count = per_day + (1 if day_index < extra else 0)
+        if not count:
+            continue
+        day = first_day + timedelta(days=day_index)
+        # Keep the mean session short enough that the day still fits in DAY_HOURS
+        mean = max(1.0, min(90.0, DAY_HOURS * 3600 / count / 1.2))
+        clock = datetime.combine(day, datetime.min.time()) + timedelta(hours=DAY_START_HOUR)
+        day_str = day.isoformat()
+
+        apps = rng.choices(app_names, cum_weights=app_cum, k=count)
+        sites = rng.choices(site_names, cum_weights=site_cum, k=count)
+        ranks = rng.choices(title_ranks, cum_weights=title_cum, k=count)
+        for app_name, site, rank in zip(apps, sites, ranks):
+            site = site if app_name == "chrome.exe" else None
+            duration = max(1, int(rng.expovariate(1 / mean)))
+            start = clock
+            end = start + timedelta(seconds=duration)
+            # Occasionally an idle gap between sessions
+            gap = rng.randint(1, 30) if rng.random() < 0.1 else 0
+            clock = end + timedelta(seconds=gap)
+            yield (app_name, title_for(app_name, site, rank), site, start.isoformat(), end.isoformat(),
+                   duration, day_str)
+
+
+def generate(db_path=DB_NAME, rows=10000, days=30, end_date=None, titles=1000, zipf_s=1.1, seed=0,
+             chunk_size=50000):
+    """Append `rows` synthetic sessions to db_path. Returns the number of rows written."""
+    conn = sqlite3.connect(db_path)
+    # Bulk load: nothing else reads this DB while it is being generated
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    create_schema(conn)
+
+    written = 0
+    chunk = []
+    for row in generate_rows(rows, days, end_date, titles, zipf_s, seed):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            written += insert_chunk(conn, chunk)
+            chunk = []
+    if chunk:
+        written += insert_chunk(conn, chunk)
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_log_date ON activity_log(date)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_activity_log_start_time ON activity_log(start_time)")
+    conn.commit()
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    return written
+
+
+def insert_chunk(conn, chunk):
+    with conn:
+        conn.executemany('''
+            INSERT INTO activity_log (app_name, window_title, site, start_time, end_time, duration, date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', chunk)
+    return len(chunk)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic activity_log data.")
+    parser.add_argument("--db", default="synthetic_activity.db", help="Database to create or append to")
+    parser.add_argument("--rows", type=int, default=10000, help="Sessions to generate")
+    parser.add_argument("--days", type=int, default=30, help="Days to spread them over (ending yesterday)")
+    parser.add_argument("--titles", type=int, default=1000, help="Distinct titles per app/site")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Zipf exponent for title popularity")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fresh", action="store_true", help="Delete the database first")
+    args = parser.parse_args()
+
+    if args.fresh:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+
+    started = time.perf_counter()
+    written = generate(args.db, args.rows, args.days, titles=args.titles, zipf_s=args.zipf, seed=args.seed)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {written} sessions over {args.days} days to {args.db} "
+          f"in {elapsed:.1f} s ({written / elapsed:,.0f} rows/s)")
+
+
+if __name__ == "__main__":
+    main()
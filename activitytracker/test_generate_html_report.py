@@ -0,0 +1,75 @@
+import sqlite3
+from datetime import date, datetime, timedelta
+
+import generate_html_report
+import queries
+import synthetic_data
+
+TODAY = date(2026, 10, 19)
+
+
+def insert(db_path, app_name, site, start, seconds):
+    end = start + timedelta(seconds=seconds)
+    with sqlite3.connect(db_path) as conn:
+        c = conn.execute('''
+            INSERT INTO activity_log (app_name, window_title, site, start_time, end_time, duration, date)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (app_name, app_name, site, start.isoformat(), end.isoformat(), seconds, start.strftime("%Y-%m-%d")))
+        return c.lastrowid
+
+
+def extend(db_path, row_id, start, seconds):
+    # What activity_tracker.save_session does for a growing session
+    end = start + timedelta(seconds=seconds)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("UPDATE activity_log SET end_time = ?, duration = ? WHERE id = ?",
+                     (end.isoformat(), seconds, row_id))
+
+
+def aggregates(state):
+    return {(app, site): seconds for app, site, seconds in state["totals"]}, state["heatmap"]["grid"]
+
+
+def test_refresh_sees_extended_newest_row(tmp_path):
+    db_path = str(tmp_path / "activity_log.db")
+    with sqlite3.connect(db_path) as conn:
+        synthetic_data.create_schema(conn)
+    try:
+        morning = datetime.combine(TODAY, datetime.min.time()) + timedelta(hours=9)
+        insert(db_path, "code.exe", None, morning, 120)
+        start = morning + timedelta(minutes=5)
+        row_id = insert(db_path, "chrome.exe", "github.com", start, 60)
+        state = generate_html_report.refresh_state(None, TODAY, db_path)
+
+        extend(db_path, row_id, start, 660)
+        state = generate_html_report.refresh_state(state, TODAY, db_path)
+        assert aggregates(state) == aggregates(generate_html_report.refresh_state(None, TODAY, db_path))
+        assert aggregates(state)[0][("chrome.exe", "github.com")] == 660
+
+        # The row is extended once more when the session ends, then the next one starts
+        extend(db_path, row_id, start, 900)
+        insert(db_path, "code.exe", None, start + timedelta(seconds=900), 30)
+        state = generate_html_report.refresh_state(state, TODAY, db_path)
+        assert aggregates(state) == aggregates(generate_html_report.refresh_state(None, TODAY, db_path))
+        assert sum(map(sum, state["heatmap"]["grid"])) == 120 + 900 + 30
+    finally:
+        queries.close_connections()
+
+
+def test_refresh_rebuilds_for_another_database(tmp_path):
+    morning = datetime.combine(TODAY, datetime.min.time()) + timedelta(hours=9)
+    paths = []
+    # The second DB has more rows, so its ids look like new rows on top of the first one's checkpoint
+    for name, seconds, rows in (("first.db", 300, 2), ("second.db", 45, 3)):
+        db_path = str(tmp_path / name)
+        with sqlite3.connect(db_path) as conn:
+            synthetic_data.create_schema(conn)
+        for _ in range(rows):
+            insert(db_path, "code.exe", None, morning, seconds)
+        paths.append(db_path)
+    try:
+        state = generate_html_report.refresh_state(None, TODAY, paths[0])
+        state = generate_html_report.refresh_state(state, TODAY, paths[1])
+        assert aggregates(state)[0] == {("code.exe", None): 135}
+    finally:
+        queries.close_connections()
@@ -0,0 +1,112 @@
+# time_buckets.py – "when" instead of "how much": bucketed time series and weekly heatmaps in SQL
+#
+# Sessions are cut at bucket boundaries inside SQLite with a recursive CTE, so a
+# 10:50-11:20 session adds 10 minutes to the 10:00 bucket and 20 to the 11:00
+# one. Times are handled as stored (tracker-local wall clock), via epoch seconds.
+
+from datetime import datetime, timedelta
+
+import queries
+
+DB_NAME = "activity_log.db"
+BUCKET_MINUTES = (15, 60)
+
+_SPLIT_SQL = '''
+    WITH RECURSIVE
+    sessions(app_name, site, seg_start, seg_end) AS (
+        SELECT app_name, NULLIF(site, ''),
+               CAST(strftime('%s', start_time) AS INTEGER),
+               CAST(strftime('%s', end_time) AS INTEGER)
+        FROM activity_log
+        WHERE start_time >= :start AND start_time < :end AND {id_range}
+    ),
+    pieces(app_name, site, piece_start, seg_end) AS (
+        SELECT app_name, site, seg_start, seg_end FROM sessions WHERE seg_end > seg_start
+        UNION ALL
+        SELECT app_name, site, (piece_start / :size + 1) * :size, seg_end
+        FROM pieces
+        WHERE (piece_start / :size + 1) * :size < seg_end
+    ),
+    buckets(bucket, app_name, site, seconds) AS (
+        SELECT (piece_start / :size) * :size, app_name, site,
+               MIN((piece_start / :size + 1) * :size, seg_end) - piece_start
+        FROM pieces
+        {rollup}
+    )
+'''
+
+# Hourly rollups (see maintenance.py) already sit on 60 minute boundaries
+_HOURLY_ROLLUP_SQL = '''
+        UNION ALL
+        SELECT CAST(strftime('%s', date || ' ' || printf('%02d:00:00', hour)) AS INTEGER),
+               app_name, NULLIF(site, ''), duration
+        FROM activity_hourly
+        WHERE date >= :start_date AND date < :end_date AND :min_id = 0
+'''
+
+
+def _params(start_date, end_date, minutes, min_id, max_id, tz):
+    if minutes not in BUCKET_MINUTES:
+        raise ValueError(f"Bucket size must be one of {BUCKET_MINUTES} minutes")
+    start, end = queries.day_bounds(start_date, end_date, tz)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "start_date": start.strftime("%Y-%m-%d"),
+        "end_date": end.strftime("%Y-%m-%d"),
+        "size": minutes * 60,
+        "min_id": min_id or 0,
+        "max_id": queries.MAX_ROW_ID if max_id is None else max_id,
+    }
+
+
+def _split_sql(db_path, minutes, min_id):
+    use_rollup = minutes == 60 and "activity_hourly" in queries.table_names(db_path)
+    return _SPLIT_SQL.format(id_range=queries.id_range(min_id, ":min_id", ":max_id"),
+                             rollup=_HOURLY_ROLLUP_SQL if use_rollup else "")
+
+
+def bucket_series(start_date, end_date, minutes=60, db_path=DB_NAME, min_id=0, max_id=None, tz=None):
+    """[(bucket_start, app_name, site, seconds)] for sessions starting in [start_date, end_date).
+
+    min_id / max_id restrict the scan to activity_log ids in (min_id, max_id] (for incremental refreshes).
+    """
+    sql = _split_sql(db_path, minutes, min_id) + '''
+        SELECT bucket, app_name, site, SUM(seconds)
+        FROM buckets
+        GROUP BY bucket, app_name, site
+        ORDER BY bucket
+    '''
+    rows = queries.execute(sql, _params(start_date, end_date, minutes, min_id, max_id, tz), db_path)
+    epoch = datetime(1970, 1, 1)
+    return [((epoch + timedelta(seconds=bucket)).isoformat(), app, site, seconds)
+            for bucket, app, site, seconds in rows]
+
+
+def heatmap(start_date, end_date, minutes=60, db_path=DB_NAME, min_id=0, max_id=None, tz=None):
+    """7 x (1440 / minutes) grid of seconds, rows Monday..Sunday, columns time-of-day buckets."""
+    sql = _split_sql(db_path, minutes, min_id) + '''
+        SELECT (CAST(strftime('%w', bucket, 'unixepoch') AS INTEGER) + 6) % 7 AS weekday,
+               (bucket % 86400) / :size AS slot,
+               SUM(seconds)
+        FROM buckets
+        GROUP BY weekday, slot
+    '''
+    grid = [[0] * (1440 // minutes) for _ in range(7)]
+    params = _params(start_date, end_date, minutes, min_id, max_id, tz)
+    for weekday, slot, seconds in queries.execute(sql, params, db_path):
+        grid[weekday][slot] = seconds
+    return grid
+
+
+def heatmap_for_days(days=28, end_date=None, minutes=60, db_path=DB_NAME, max_id=None, tz=None):
+    """Heatmap over the `days` days ending with end_date (default today)."""
+    end_date = end_date or datetime.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+    return {
+        "start": start_date.isoformat(),
+        "end": end_date.isoformat(),
+        "minutes": minutes,
+        "weekdays": ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"],
+        "grid": heatmap(start_date, end_date + timedelta(days=1), minutes, db_path, max_id=max_id, tz=tz),
+    }
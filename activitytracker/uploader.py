@@ -0,0 +1,180 @@
+# uploader.py – ships unsent activity_log rows to a central remote_server /ingest endpoint
+#
+# Rows that change after they were sent (merged by session_coalescer.compact_db)
+# are recorded by triggers in upload_changes and sent again, or sent as deleted.
+# Rows aged out by maintenance.py are not deletions: the central store keeps them.
+
+import gzip
+import json
+import os
+import socket
+import sqlite3
+import threading
+import urllib.request
+import uuid
+
+DB_NAME = "activity_log.db"
+BATCH_SIZE = 500
+UPLOAD_INTERVAL = 60
+# Same variable remote_server reads; the tracker's --upload-token overrides it
+TOKEN_ENV = "ACTIVITY_INGEST_TOKEN"
+
+ROW_FIELDS = ("id", "app_name", "window_title", "site", "start_time", "end_time", "duration", "date")
+
+
+def create_state_table(conn):
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS upload_state (
+            host_id TEXT PRIMARY KEY,
+            last_sent_id INTEGER NOT NULL,
+            next_seq INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS upload_changes (
+            id INTEGER PRIMARY KEY,
+            deleted INTEGER NOT NULL,
+            version INTEGER NOT NULL
+        );
+        CREATE TRIGGER IF NOT EXISTS upload_track_update AFTER UPDATE ON activity_log
+        WHEN OLD.id <= (SELECT COALESCE(MAX(last_sent_id), 0) FROM upload_state)
+        BEGIN
+            INSERT OR REPLACE INTO upload_changes (id, deleted, version)
+            VALUES (OLD.id, 0, (SELECT COALESCE(MAX(version), 0) + 1 FROM upload_changes));
+        END;
+        CREATE TRIGGER IF NOT EXISTS upload_track_delete AFTER DELETE ON activity_log
+        WHEN OLD.id <= (SELECT COALESCE(MAX(last_sent_id), 0) FROM upload_state)
+        BEGIN
+            INSERT OR REPLACE INTO upload_changes (id, deleted, version)
+            VALUES (OLD.id, 1, (SELECT COALESCE(MAX(version), 0) + 1 FROM upload_changes));
+        END;
+    ''')
+    conn.commit()
+
+
+def database_id(conn):
+    """Random id of this activity_log.db, so the server can tell it apart from an earlier DB of the same host."""
+    conn.execute("CREATE TABLE IF NOT EXISTS upload_identity (db_id TEXT NOT NULL)")
+    row = conn.execute("SELECT db_id FROM upload_identity").fetchone()
+    if row:
+        return row[0]
+    # A DB that uploaded before ids existed keeps the empty id its rows already have on the server
+    uploaded = conn.execute("SELECT COUNT(*) FROM upload_state").fetchone()[0]
+    db_id = "" if uploaded else uuid.uuid4().hex
+    with conn:
+        conn.execute("INSERT INTO upload_identity (db_id) VALUES (?)", (db_id,))
+    return db_id
+
+
+def forget_changes(conn, ids):
+    """Drop recorded changes for rows that were archived rather than merged (see maintenance.py)."""
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'upload_changes'").fetchone():
+        conn.executemany("DELETE FROM upload_changes WHERE id = ?", [(row_id,) for row_id in ids])
+
+
+def save_state(conn, host_id, last_sent_id, seq):
+    with conn:
+        conn.execute("INSERT OR REPLACE INTO upload_state (host_id, last_sent_id, next_seq) VALUES (?, ?, ?)",
+                     (host_id, last_sent_id, seq))
+
+
+def post_batch(url, payload, token=None, timeout=30):
+    data = gzip.compress(json.dumps(payload).encode("utf-8"))
+    req = urllib.request.Request(url, data=data, method="POST", headers={
+        "Content-Type": "application/json",
+        "Content-Encoding": "gzip",
+        "Authorization": f"Bearer {token or os.environ.get(TOKEN_ENV, '')}",
+    })
+    with urllib.request.urlopen(req, timeout=timeout) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def upload_changes(conn, url, host_id, db_id, last_sent_id, seq, batch_size=BATCH_SIZE, token=None):
+    """Re-send rows changed after they were uploaded. Returns (rows sent, next seq)."""
+    c = conn.cursor()
+    sent = 0
+    while True:
+        c.execute("SELECT id, deleted, version FROM upload_changes ORDER BY id LIMIT ?", (batch_size,))
+        changes = c.fetchall()
+        if not changes:
+            return sent, seq
+
+        changed_ids = [row_id for row_id, deleted, _ in changes if not deleted]
+        c.execute(f'''
+            SELECT {", ".join(ROW_FIELDS)} FROM activity_log
+            WHERE id IN ({", ".join("?" * len(changed_ids))})
+        ''', changed_ids)
+        rows = [dict(zip(ROW_FIELDS, row)) for row in c.fetchall()]
+        found = {row["id"] for row in rows}
+        deleted = [row_id for row_id, _, _ in changes if row_id not in found]
+
+        reply = post_batch(url, {"host_id": host_id, "db_id": db_id, "seq": seq, "rows": rows,
+                                 "deleted": deleted}, token)
+        if reply.get("status") != "ok":
+            raise RuntimeError(reply.get("error", "ingest rejected"))
+
+        seq += 1
+        with conn:
+            # A row changed again meanwhile has a newer version and stays queued
+            conn.executemany("DELETE FROM upload_changes WHERE id = ? AND version = ?",
+                             [(row_id, version) for row_id, _, version in changes])
+        save_state(conn, host_id, last_sent_id, seq)
+        sent += len(changes)
+
+
+def upload_pending(url, host_id, db_path=DB_NAME, batch_size=BATCH_SIZE, token=None):
+    """Send every row not yet acknowledged by the server, and rows changed since. Returns the number of rows sent."""
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        create_state_table(conn)
+        db_id = database_id(conn)
+        c = conn.cursor()
+        c.execute("SELECT last_sent_id, next_seq FROM upload_state WHERE host_id = ?", (host_id,))
+        last_sent_id, seq = c.fetchone() or (0, 1)
+
+        sent, seq = upload_changes(conn, url, host_id, db_id, last_sent_id, seq, batch_size, token)
+        while True:
+            # The newest row waits for a newer one: the tracker may still be extending it (see store_session)
+            c.execute(f'''
+                SELECT {", ".join(ROW_FIELDS)} FROM activity_log
+                WHERE id > ? AND id < (SELECT MAX(id) FROM activity_log) ORDER BY id LIMIT ?
+            ''', (last_sent_id, batch_size))
+            rows = [dict(zip(ROW_FIELDS, row)) for row in c.fetchall()]
+            if not rows:
+                return sent
+
+            reply = post_batch(url, {"host_id": host_id, "db_id": db_id, "seq": seq, "rows": rows}, token)
+            if reply.get("status") != "ok":
+                raise RuntimeError(reply.get("error", "ingest rejected"))
+
+            # A retry after a lost reply re-sends the same seq; the server treats it as a no-op
+            last_sent_id, seq = rows[-1]["id"], seq + 1
+            save_state(conn, host_id, last_sent_id, seq)
+            sent += len(rows)
+    finally:
+        conn.close()
+
+
+class Uploader(threading.Thread):
+    """Background thread that periodically uploads new rows."""
+
+    def __init__(self, url, host_id=None, db_path=DB_NAME, interval=UPLOAD_INTERVAL, batch_size=BATCH_SIZE,
+                 token=None):
+        super().__init__(daemon=True)
+        self.url = url
+        self.token = token
+        self.host_id = host_id or socket.gethostname()
+        self.db_path = db_path
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                upload_pending(self.url, self.host_id, self.db_path, self.batch_size, self.token)
+            except Exception as e:
+                # Server unreachable or rejected the batch; the same rows go out next round
+                print(f"Upload failed: {e}")
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
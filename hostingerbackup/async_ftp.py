@@ -0,0 +1,409 @@
+"""asyncio FTP backend for the backup engine.
+
+AsyncFTPClient speaks just enough FTP for a backup (login, CWD, NLST, SIZE,
+MDTM, RETR over passive data connections) on asyncio streams, and can pipeline
+control commands: a batch of CWD probes or SIZE/MDTM queries is written in one
+go and the replies are read back in order, so a directory costs one round trip
+instead of one per entry.
+
+AsyncFTPBackup keeps BackupEngine's recording, download decisions and
+persistent walk frontier, and replaces the transfer part with a pool of such
+connections: several directories from the frontier are walked at once, and
+their files are downloaded over whichever connection is free.
+"""
+import asyncio
+import os
+from asyncio import FIRST_COMPLETED
+import re
+
+from backup_engine import parse_ftp_time
+from hostinger_bakup import HostingerBackup
+
+BLOCK_SIZE = 64 * 1024
+EPSV_RE = re.compile(r'\(\|\|\|(\d+)\|\)')
+PASV_RE = re.compile(r'(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)')
+
+
+class FTPError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class AsyncFTPClient:
+    def __init__(self, host, port=21, timeout=60):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.reader = None
+        self.writer = None
+        self.use_epsv = True
+        self.throttle = None  # Shared bandwidth limiter with a reserve(nbytes) -> delay method
+
+    async def connect(self, username, password):
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port), self.timeout)
+        await self._expect(await self._read_reply())
+        code, text = await self.command(f'USER {username}')
+        if code == 331:
+            await self.voidcmd(f'PASS {password}')
+        elif code >= 400:
+            raise FTPError(code, text)
+        await self.voidcmd('TYPE I')
+
+    async def _read_reply(self):
+        line = await asyncio.wait_for(self.reader.readline(), self.timeout)
+        if not line:
+            raise ConnectionError("FTP control connection closed")
+        line = line.decode('utf-8', 'replace').rstrip('\r\n')
+        lines = [line]
+        if line[3:4] == '-':
+            # Multi-line reply, ends with "<code> "
+            end = line[:3] + ' '
+            while True:
+                line = (await asyncio.wait_for(self.reader.readline(), self.timeout))
+                if not line:
+                    raise ConnectionError("FTP control connection closed")
+                line = line.decode('utf-8', 'replace').rstrip('\r\n')
+                lines.append(line)
+                if line.startswith(end):
+                    break
+        return int(lines[0][:3]), '\n'.join(lines)
+
+    @staticmethod
+    async def _expect(reply):
+        code, text = reply
+        if code >= 400:
+            raise FTPError(code, text)
+        return reply
+
+    async def command(self, cmd):
+        self.writer.write(cmd.encode('utf-8') + b'\r\n')
+        await self.writer.drain()
+        return await self._read_reply()
+
+    async def voidcmd(self, cmd):
+        return await self._expect(await self.command(cmd))
+
+    async def pipeline(self, commands):
+        """Send all commands at once and return their (code, text) replies in order."""
+        if not commands:
+            return []
+        self.writer.write(b''.join(cmd.encode('utf-8') + b'\r\n' for cmd in commands))
+        await self.writer.drain()
+        return [await self._read_reply() for _ in commands]
+
+    async def _open_data(self):
+        if self.use_epsv:
+            code, text = await self.command('EPSV')
+            match = EPSV_RE.search(text)
+            if code == 229 and match:
+                return await asyncio.wait_for(
+                    asyncio.open_connection(self.host, int(match.group(1))), self.timeout)
+            self.use_epsv = False
+        _, text = await self.voidcmd('PASV')
+        match = PASV_RE.search(text)
+        if not match:
+            raise FTPError(0, f"Unparseable PASV reply: {text}")
+        port = int(match.group(5)) * 256 + int(match.group(6))
+        # Like ftplib, ignore the advertised address (often private behind NAT) and reuse the control host
+        return await asyncio.wait_for(asyncio.open_connection(self.host, port), self.timeout)
+
+    async def _transfer(self, cmd, sink):
+        data_reader, data_writer = await self._open_data()
+        try:
+            await self._expect(await self.command(cmd))  # 125 / 150
+            received = 0
+            while True:
+                chunk = await asyncio.wait_for(data_reader.read(BLOCK_SIZE), self.timeout)
+                if not chunk:
+                    break
+                sink(chunk)
+                received += len(chunk)
+                if self.throttle:
+                    delay = self.throttle.reserve(len(chunk))
+                    if delay:
+                        await asyncio.sleep(delay)
+        finally:
+            data_writer.close()
+        await self._expect(await self._read_reply())  # 226
+        return received
+
+    async def nlst(self, path=None):
+        lines = []
+        buffer = bytearray()
+        await self._transfer(f'NLST {path}' if path else 'NLST', buffer.extend)
+        for line in buffer.decode('utf-8', 'replace').splitlines():
+            if line:
+                lines.append(line)
+        return lines
+
+    async def mlsd(self, path):
+        """[(name, facts)] with lower-cased fact names, like ftplib.FTP.mlsd."""
+        buffer = bytearray()
+        await self._transfer(f'MLSD {path}', buffer.extend)
+        entries = []
+        for line in buffer.decode('utf-8', 'replace').splitlines():
+            facts_text, _, name = line.partition(' ')
+            facts = {}
+            for fact in facts_text.rstrip(';').split(';'):
+                key, _, value = fact.partition('=')
+                facts[key.lower()] = value
+            entries.append((name, facts))
+        return entries
+
+    async def retr(self, path, sink):
+        """Download path, passing each chunk to sink. Returns the bytes received."""
+        return await self._transfer(f'RETR {path}', sink)
+
+    async def quit(self):
+        if self.writer is None:
+            return
+        try:
+            await asyncio.wait_for(self.command('QUIT'), 5)
+        except Exception:
+            pass
+        self.writer.close()
+        self.writer = None
+
+
+def parse_mdtm(reply):
+    code, text = reply
+    return parse_ftp_time(text[4:]) if code == 213 else None
+
+
+def parse_size(reply):
+    code, text = reply
+    if code == 213:
+        try:
+            return int(text[4:].strip())
+        except ValueError:
+            return 0
+    return 0
+
+
+class AsyncFTPBackup(HostingerBackup):
+    def __init__(self, *args, connections=4, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = max(1, connections)
+
+    def connect(self):
+        # Connections are opened inside the event loop by download_directory
+        print(f"Using asyncio backend with {self.connections} connection(s) to {self.host}")
+
+    def download_directory(self, remote_path, local_path, last_incremental_time=None):
+        asyncio.run(self._download_tree(remote_path, local_path, last_incremental_time))
+
+    def download_planned(self, files, is_incremental=False):
+        asyncio.run(self._download_planned(files, is_incremental))
+
+    async def _new_client(self):
+        client = AsyncFTPClient(self.host, self.port)
+        client.throttle = self.throttle
+        await client.connect(self.username, self.password)
+        return client
+
+    async def _open_pool(self):
+        """A queue of idle, connected clients."""
+        pool = asyncio.Queue()
+        for client in await asyncio.gather(*(self._new_client() for _ in range(self.connections))):
+            pool.put_nowait(client)
+        print(f"Connected to {self.host} as {self.username}")
+        return pool
+
+    @staticmethod
+    async def _close_pool(pool):
+        clients = []
+        while not pool.empty():
+            clients.append(pool.get_nowait())
+        await asyncio.gather(*(client.quit() for client in clients), return_exceptions=True)
+
+    async def _fetch_all(self, pool, downloads, is_incremental, workers):
+        """Download (remote, local, size, mtime) items from an iterable, each on the next free connection."""
+        downloads = iter(downloads)
+
+        async def fetch():
+            for remote_item, local_item, size, remote_mtime in downloads:
+                client = await pool.get()
+                try:
+                    # A retry may replace the connection; the replacement goes back into the pool
+                    client = await self._download_file(client, remote_item, local_item, size, remote_mtime,
+                                                       is_incremental=is_incremental)
+                finally:
+                    pool.put_nowait(client)
+
+        await asyncio.gather(*(fetch() for _ in range(workers)))
+
+    async def _download_planned(self, files, is_incremental):
+        pool = await self._open_pool()
+        downloads = ((self._normalize_ftp_path(self.remote_dir + '/' + relative),
+                      os.path.join(self.backup_dir, *relative.split('/')), size, remote_mtime)
+                     for relative, size, remote_mtime in files)
+        try:
+            await self._fetch_all(pool, downloads, is_incremental, self.connections)
+        finally:
+            await self._close_pool(pool)
+
+    async def _download_tree(self, remote_path, local_path, last_incremental_time):
+        pool = await self._open_pool()
+        self._frontier_add([(self._normalize_ftp_path(remote_path), local_path)])
+        self.conn.commit()
+
+        active = {}
+        try:
+            while True:
+                # Keep up to one directory per connection in flight, so listings overlap downloads
+                for remote_dir, local_dir in self._frontier_next(self.connections - len(active), active.values()):
+                    task = asyncio.ensure_future(self._walk_directory(pool, remote_dir, local_dir,
+                                                                      last_incremental_time))
+                    active[task] = remote_dir
+                if not active:
+                    break
+                done, _ = await asyncio.wait(active, return_when=FIRST_COMPLETED)
+                for task in done:
+                    remote_dir = active.pop(task)
+                    try:
+                        task.result()
+                    except FTPError as e:
+                        # Unreadable directory: skip it. Other errors end the backup and leave it to be resumed.
+                        print(f"\nError accessing remote directory {remote_dir}: {e}")
+                    self._frontier_done(remote_dir)
+        finally:
+            for task in active:
+                task.cancel()
+            await asyncio.gather(*active, return_exceptions=True)
+            await self._close_pool(pool)
+
+    async def _list_directory(self, client, remote_path):
+        """Like FTPTransport.list_directory: [(name, type, size, mtime)], types None after an NLST fallback."""
+        if self.transport.use_mlsd:
+            try:
+                entries = []
+                for name, facts in await client.mlsd(remote_path):
+                    kind = facts.get('type', '').lower()
+                    if kind in ('cdir', 'pdir') or name in ('.', '..'):
+                        continue
+                    size = int(facts['size']) if facts.get('size', '').isdigit() else None
+                    entries.append((name, kind if kind in ('dir', 'file') else None, size,
+                                    parse_ftp_time(facts.get('modify'))))
+                return entries
+            except FTPError as e:
+                if e.code not in (500, 501, 502, 504):
+                    raise
+                self.transport.use_mlsd = False
+                print("Server does not support MLSD, falling back to NLST")
+        items = [item.rsplit('/', 1)[-1] for item in await client.nlst()]
+        return [(item, None, None, None) for item in items if item not in ('.', '..')]
+
+    async def _walk_directory(self, pool, remote_path, local_path, last_incremental_time):
+        """List one directory on a free connection, queue its subdirectories and download its files."""
+        client = await pool.get()
+        try:
+            files, subdirs, keep = await self._scan_directory(client, remote_path, local_path)
+        finally:
+            pool.put_nowait(client)
+        # Queued before the downloads, so an interruption below only repeats this directory
+        self._frontier_add(subdirs)
+        self.conn.commit()
+
+        downloads = []
+        for remote_item, local_item, relative, size, remote_mtime in files:
+            if self.filter and self.filter.check_file(relative, size, remote_mtime):
+                continue
+            keep.add(os.path.basename(local_item))
+            if not self._should_download(remote_item, local_item, last_incremental_time, remote_mtime, size):
+                continue
+            if self._already_downloaded(local_item, size, remote_mtime):
+                continue
+            downloads.append((remote_item, local_item, size, remote_mtime))
+        if self.verifying:
+            self._sweep_local(local_path, keep)
+
+        await self._fetch_all(pool, downloads, bool(last_incremental_time), min(self.connections, len(downloads)))
+
+    async def _scan_directory(self, client, remote_path, local_path):
+        """Files [[remote, local, relative, size, mtime]], subdirectories [(remote, local)] and the names of
+        the non-file entries to keep (see _sweep_local) of one directory."""
+        print(f"Entering remote directory: {remote_path}")
+        await client.voidcmd(f'CWD {remote_path}')
+
+        started = asyncio.get_running_loop().time()
+        listing = await self._list_directory(client, remote_path)
+        self._log_listing(remote_path, asyncio.get_running_loop().time() - started, len(listing))
+
+        entries = []
+        for item, entry_type, size, remote_mtime in listing:
+            remote_item = self._normalize_ftp_path(remote_path + '/' + item)
+            relative = self._relative_path(remote_item)
+            # Names that are excluded either way are skipped without a CWD probe
+            if entry_type is None and self.filter and self.filter.check_unknown(relative):
+                continue
+            entries.append([item, remote_item, relative, entry_type, size, remote_mtime])
+
+        # Same directory-vs-file probe as the ftplib walk, but all CWDs go out in one round trip
+        unknown = [entry for entry in entries if entry[3] is None]
+        for entry, (code, text) in zip(unknown, await client.pipeline([f'CWD {entry[1]}' for entry in unknown])):
+            if code < 400:
+                entry[3] = 'dir'
+            elif code == 550:
+                entry[3] = 'file'
+            else:
+                print(f"\nFTP Permission Error on {entry[1]}: {text}")
+
+        files = []
+        subdirs = []
+        keep = {entry[0] for entry in entries if entry[3] is None}  # Couldn't be probed
+        for item, remote_item, relative, entry_type, size, remote_mtime in entries:
+            local_item = os.path.join(local_path, item)
+            if entry_type == 'dir':
+                if self.filter and self.filter.check_dir(relative):
+                    continue
+                keep.add(item)
+                print(f"Found directory: {remote_item}")
+                os.makedirs(local_item, exist_ok=True)
+                subdirs.append((remote_item, local_item))
+            elif entry_type == 'file':
+                files.append([remote_item, local_item, relative, size, remote_mtime])
+
+        # NLST gives no size or mtime: fetch them for all files in one round trip
+        missing = [entry for entry in files if entry[3] is None or entry[4] is None]
+        replies = await client.pipeline([cmd for entry in missing
+                                         for cmd in (f'SIZE {entry[0]}', f'MDTM {entry[0]}')])
+        for index, entry in enumerate(missing):
+            entry[3], entry[4] = parse_size(replies[2 * index]), parse_mdtm(replies[2 * index + 1])
+        return files, subdirs, keep
+
+    async def _download_file(self, client, remote_item, local_item, file_size, remote_mtime,
+                             is_incremental=False):
+        """Download one file on client, reconnecting between retries. Returns the client to keep using."""
+        retries = 3
+        size_text = f"{file_size / 1024:.1f} KB" if file_size is not None else "size unknown"
+        status_msg = f"Downloading: {remote_item} ({size_text})"
+        if is_incremental:
+            status_msg = f"Incremental {status_msg}"
+        print(status_msg, end='\r')
+        os.makedirs(os.path.dirname(local_item), exist_ok=True)
+        if os.path.lexists(local_item):
+            os.remove(local_item)  # May be a hardlink shared with older backups; never write through it
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        for attempt in range(retries):
+            try:
+                with open(local_item, 'wb') as f:
+                    received = await client.retr(remote_item, f.write)
+                self._record_file(local_item, received, remote_mtime)
+                self._log_transfer(remote_item, received, loop.time() - started, attempt, True)
+                return client
+            except Exception as e:
+                if attempt == retries - 1:
+                    print(f"\nFailed to download {remote_item} after {retries} attempts: {e}")
+                    self._log_transfer(remote_item, 0, loop.time() - started, attempt, False)
+                    return client
+                await asyncio.sleep(2)
+                await client.quit()
+                try:
+                    client = await self._new_client()
+                except Exception as e_connect:
+                    print(f"\nReconnect failed: {e_connect}")
+        return client
@@ -0,0 +1,939 @@
+"""Backup engine shared by hostinger_bakup.py and fullbackup.py, over a pluggable transport.
+
+BackupEngine does everything that doesn't depend on where the files come
+from: the history DB, full/incremental/synthetic decisions, the persistent
+walk frontier and resume, filters, plans and telemetry. A Transport lists
+directories and streams files:
+
+    FTPTransport     an FTP server, through ftplib (MLSD, or NLST plus probes)
+    LocalTransport   a directory on this machine, e.g. a NAS mount or a test tree
+
+    engine = BackupEngine(LocalTransport("/mnt/nas/www"), "/", "backups")
+    engine.run_backup()
+
+Transport paths are absolute and '/'-separated below the transport's root,
+as on an FTP server. The asyncio backend (async_ftp.py) keeps the engine and
+replaces its transfer loop with a pool of its own FTP connections.
+"""
+import os
+import ftplib
+import posixpath
+import shutil
+from datetime import datetime, timedelta, timezone
+import time
+import sqlite3
+
+import planner
+import snapshots
+
+TELEMETRY_BATCH = 500  # Per-file / per-directory rows buffered before they are written
+BLOCK_SIZE = 64 * 1024
+BASELINE_MARGIN = timedelta(seconds=2)  # MDTM has whole seconds, start times have microseconds
+
+
+def parse_ftp_time(value):
+    """MDTM / MLSD modify timestamp (YYYYMMDDHHMMSS[.sss], UTC) -> datetime, or None."""
+    value = (value or '').strip()
+    if len(value) < 14:
+        return None
+    try:
+        return datetime.strptime(value[:14], "%Y%m%d%H%M%S")
+    except ValueError:
+        return None
+
+
+class Transport:
+    """Where a backup reads from. Subclasses implement the methods that raise NotImplementedError."""
+    host = None  # Identifies the source in the history DB
+    skip_errors = ()  # Errors meaning a directory can't be read; the walk skips it and goes on
+
+    @property
+    def connected(self):
+        return True
+
+    def connect(self):
+        pass
+
+    def close(self):
+        pass
+
+    def list_directory(self, remote_path):
+        """[(name, 'dir' | 'file' | None, size, mtime)] of remote_path; None values are looked up on demand."""
+        raise NotImplementedError
+
+    def probe_type(self, remote_item, current_dir):
+        """'dir' or 'file' for an entry listed without a type, None if it can't be told."""
+        return None
+
+    def size(self, remote_path):
+        """Size in bytes, 0 if it can't be had."""
+        raise NotImplementedError
+
+    def mtime(self, remote_path):
+        """Modification time as a naive UTC datetime, or None."""
+        raise NotImplementedError
+
+    def retrieve(self, remote_path, write):
+        """Stream the file's content to write(chunk)."""
+        raise NotImplementedError
+
+    def is_disconnect(self, error):
+        """True if error means the connection is gone and a retry has to reconnect first."""
+        return False
+
+
+class FTPTransport(Transport):
+    skip_errors = (ftplib.error_perm,)
+
+    def __init__(self, host, username, password, port=21):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.ftp = None
+        self.use_mlsd = True  # Cleared once the server turns MLSD down
+
+    @property
+    def connected(self):
+        return self.ftp is not None
+
+    def connect(self):
+        """Establish FTP connection"""
+        print(f"Connecting to {self.host}...")
+        self.ftp = ftplib.FTP()
+        self.ftp.connect(self.host, self.port)
+        self.ftp.login(self.username, self.password)
+        print(f"Connected to {self.host} as {self.username}")
+
+    def close(self):
+        if self.ftp:
+            try:
+                self.ftp.quit()
+            except Exception:
+                self.ftp.close()
+            self.ftp = None
+            print("FTP connection closed")
+
+    def list_directory(self, remote_path):
+        """With MLSD the type ('dir' / 'file'), size and mtime come with the listing.
+        Servers without MLSD fall back to NLST, with type, size and mtime left as None.
+        """
+        self.ftp.cwd(remote_path)  # NLST and the type probes work relative to it
+        if self.use_mlsd:
+            try:
+                entries = []
+                for name, facts in self.ftp.mlsd(remote_path, facts=['type', 'size', 'modify']):
+                    kind = facts.get('type', '').lower()
+                    if kind in ('cdir', 'pdir') or name in ('.', '..'):
+                        continue
+                    entry_type = kind if kind in ('dir', 'file') else None  # e.g. symlinks get probed
+                    size = int(facts['size']) if facts.get('size', '').isdigit() else None
+                    entries.append((name, entry_type, size, parse_ftp_time(facts.get('modify'))))
+                return entries
+            except ftplib.error_perm as e:
+                if str(e)[:3] not in ('500', '501', '502', '504'):
+                    raise
+                self.use_mlsd = False
+                print("Server does not support MLSD, falling back to NLST")
+
+        items = []
+        self.ftp.retrlines('NLST', items.append)
+        self.ftp.voidcmd('TYPE I')  # retrlines leaves ASCII mode behind, in which SIZE is refused
+        return [(item, None, None, None) for item in items if item not in ('.', '..')]
+
+    def probe_type(self, remote_item, current_dir):
+        """By trying to CWD into the entry."""
+        try:
+            self.ftp.cwd(remote_item)  # Attempt to CWD
+            # If CWD succeeds, it's a directory
+            self.ftp.cwd(current_dir)
+            return 'dir'
+        except ftplib.error_perm as e_perm:
+            # If CWD fails with 550, it's likely a file
+            if "550" in str(e_perm):
+                return 'file'
+            print(f"\nFTP Permission Error on {remote_item}: {e_perm}")
+            return None
+
+    def size(self, remote_path):
+        try:
+            size = self.ftp.size(remote_path)
+            return size if size is not None else 0
+        except ftplib.error_perm:
+            return 0
+        except Exception as e:
+            return 0
+
+    def mtime(self, remote_path):
+        """Through MDTM."""
+        try:
+            resp = self.ftp.voidcmd(f'MDTM {remote_path}')
+            return parse_ftp_time(resp[4:])
+        except ftplib.error_perm:
+            return None
+        except Exception as e:
+            return None
+
+    def retrieve(self, remote_path, write):
+        self.ftp.retrbinary(f'RETR {remote_path}', write)
+
+    def is_disconnect(self, error):
+        return isinstance(error, (EOFError, OSError)) or str(error).startswith('421')
+
+
+class LocalTransport(Transport):
+    """A directory tree on this machine. Symlinked directories are not followed."""
+    skip_errors = (PermissionError, FileNotFoundError, NotADirectoryError)
+
+    def __init__(self, root):
+        self.root = os.path.abspath(os.path.expanduser(root))
+        self.host = f"file://{self.root}"
+
+    def _local(self, remote_path):
+        return os.path.join(self.root, *[part for part in remote_path.split('/') if part])
+
+    @staticmethod
+    def _utc(timestamp):
+        # Same convention as MDTM, so incrementals compare alike whatever the transport
+        return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+    def connect(self):
+        if not os.path.isdir(self.root):
+            raise FileNotFoundError(f"Source directory not found: {self.root}")
+        print(f"Reading from {self.root}")
+
+    def list_directory(self, remote_path):
+        entries = []
+        with os.scandir(self._local(remote_path)) as listing:
+            for entry in listing:
+                if entry.is_dir(follow_symlinks=False):
+                    entries.append((entry.name, 'dir', None, None))
+                elif entry.is_file():
+                    stat = entry.stat()
+                    entries.append((entry.name, 'file', stat.st_size, self._utc(stat.st_mtime)))
+        return entries
+
+    def size(self, remote_path):
+        try:
+            return os.path.getsize(self._local(remote_path))
+        except OSError:
+            return 0
+
+    def mtime(self, remote_path):
+        try:
+            return self._utc(os.path.getmtime(self._local(remote_path)))
+        except OSError:
+            return None
+
+    def retrieve(self, remote_path, write):
+        with open(self._local(remote_path), 'rb') as f:
+            for chunk in iter(lambda: f.read(BLOCK_SIZE), b''):
+                write(chunk)
+
+
+class BackupEngine:
+    def __init__(self, transport, remote_dir, local_dir, db_path="backup_history.db"):
+        self.transport = transport
+        self.host = transport.host
+        self.remote_dir = self._normalize_ftp_path(remote_dir)
+        self.local_dir = local_dir
+        self.file_count = 0
+        self.dir_count = 0
+        self.total_size = 0  # In bytes
+        self.start_time_actual = None  # Actual start time of run_backup
+        self.current_backup_timestamp = None  # Snapshot for this specific backup run
+        self.backup_dir = None
+        self.backup_type = 'auto'
+        self.full_interval = timedelta(weeks=1)  # Age after which 'auto' makes a full backup
+        self.throttle = None  # Optional shared bandwidth limiter (see scheduler.TokenBucket)
+        self.filter = None  # Optional filters.PathFilter applied during the walk
+        self.resume = True  # Continue an interrupted walk of the same site instead of starting over
+        self.resuming = False  # Set while a resumed walk runs (see _resume_interrupted)
+        self.plan_path = None  # Download the files of this saved plan (planner.py) instead of walking
+        self.synthetic_full = False  # Build full backups from the previous ones plus a verifying walk
+        self.verifying = False  # Set while the walk checks a synthetic full against the server
+        self.removed_count = 0  # Files/dirs a synthetic full dropped because the server no longer has them
+
+        self.db_path = db_path
+        self.conn = None  # Database connection
+        self.cursor = None  # Database cursor
+        self.current_backup_id = None  # ID of the current backup record in DB
+        self.transfer_log = []  # Buffered file_transfers rows
+        self.listing_log = []  # Buffered directory_listings rows
+
+        self._init_db()  # Initialize the database upon class instantiation
+
+        print(f"Normalized remote_dir: {self.remote_dir}")
+
+    @staticmethod
+    def _normalize_ftp_path(path):
+        """Internal helper to ensure FTP paths use forward slashes and are absolute."""
+        path = path.replace('\\', '/').strip('/')  # Replace backslashes, strip leading/trailing
+        if not path:  # If path was just slashes or empty after stripping
+            return '/'
+        return '/' + path  # Ensure it's an absolute path
+
+    def _init_db(self):
+        """Initializes the SQLite database and creates the backups table if it doesn't exist."""
+        try:
+            # Several backups may share the history DB when run by scheduler.py
+            self.conn = sqlite3.connect(self.db_path, timeout=30)
+            self.cursor = self.conn.cursor()
+            # The walk commits once per directory; WAL keeps that cheap and readers unblocked
+            self.cursor.execute("PRAGMA journal_mode=WAL")
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS backups (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    backup_type TEXT NOT NULL,
+                    start_time TEXT NOT NULL,
+                    end_time TEXT,
+                    remote_directory TEXT NOT NULL,
+                    local_directory TEXT NOT NULL,
+                    files_backed_up INTEGER,
+                    directories_backed_up INTEGER,
+                    total_size_mb REAL,
+                    status TEXT NOT NULL
+                )
+            ''')
+            # Older history files lack the newer columns; rows without a host match any host
+            columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(backups)")]
+            for column in ('host', 'baseline_time', 'synthetic_from'):
+                if column not in columns:
+                    try:
+                        self.cursor.execute(f"ALTER TABLE backups ADD COLUMN {column} TEXT")
+                    except sqlite3.OperationalError:
+                        pass  # Added meanwhile by another backup sharing the DB
+            # Directories still to visit (done = 0) and already visited (done = 1) by each backup's walk
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS walk_frontier (
+                    backup_id INTEGER NOT NULL,
+                    remote_path TEXT NOT NULL,
+                    local_path TEXT NOT NULL,
+                    done INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (backup_id, remote_path)
+                )
+            ''')
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_walk_frontier_pending ON walk_frontier (backup_id, done)")
+            # Telemetry for backup_stats.py: every download attempt and every directory listing
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS file_transfers (
+                    backup_id INTEGER NOT NULL,
+                    directory TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    bytes INTEGER NOT NULL,
+                    seconds REAL NOT NULL,
+                    retries INTEGER NOT NULL,
+                    ok INTEGER NOT NULL
+                )
+            ''')
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_file_transfers_backup ON file_transfers (backup_id)")
+            self.cursor.execute('''
+                CREATE TABLE IF NOT EXISTS directory_listings (
+                    backup_id INTEGER NOT NULL,
+                    remote_path TEXT NOT NULL,
+                    seconds REAL NOT NULL,
+                    entries INTEGER NOT NULL
+                )
+            ''')
+            self.cursor.execute(
+                "CREATE INDEX IF NOT EXISTS idx_directory_listings_backup ON directory_listings (backup_id)")
+            self.conn.commit()
+            print(f"Database initialized: {self.db_path}")
+        except sqlite3.Error as e:
+            print(f"Database error during initialization: {e}")
+            # Potentially re-raise or handle more gracefully
+            raise
+
+    def _get_last_backup_times(self):
+        """
+        Queries the database for the last successful full and incremental backup times
+        for the current remote_directory.
+        Returns a tuple: (last_full_backup_datetime, last_incremental_backup_datetime)
+        """
+        last_full = None
+        last_incremental = None
+
+        try:
+            # Get last successful full backup
+            self.cursor.execute(f'''
+                SELECT MAX(start_time) FROM backups
+                WHERE backup_type = 'full' AND status = 'success' AND remote_directory = ?
+                  AND (host = ? OR host IS NULL)
+            ''', (self.remote_dir, self.host))
+            result = self.cursor.fetchone()[0]
+            if result:
+                last_full = datetime.fromisoformat(result)
+
+            # Get last successful incremental backup
+            self.cursor.execute(f'''
+                SELECT MAX(start_time) FROM backups
+                WHERE backup_type IN ('full', 'incremental') AND status = 'success' AND remote_directory = ?
+                  AND (host = ? OR host IS NULL)
+            ''', (self.remote_dir, self.host))
+            result = self.cursor.fetchone()[0]
+            if result:
+                last_incremental = datetime.fromisoformat(result)
+
+        except sqlite3.Error as e:
+            print(f"Database error getting last backup times: {e}")
+
+        return last_full, last_incremental
+
+    def _record_backup_start(self, backup_type, local_dir, baseline=None, synthetic_from=None):
+        """Records the start of a backup operation in the database."""
+        try:
+            self.cursor.execute('''
+                INSERT INTO backups (backup_type, start_time, remote_directory, local_directory, status, host,
+                                     baseline_time, synthetic_from)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (backup_type, self.current_backup_timestamp.isoformat(), self.remote_dir, local_dir, 'running',
+                  self.host, baseline.isoformat() if baseline else None, synthetic_from))
+            self.conn.commit()
+            self.current_backup_id = self.cursor.lastrowid  # Store the ID for later update
+            print(f"Backup start recorded with ID: {self.current_backup_id}")
+        except sqlite3.Error as e:
+            print(f"Database error recording backup start: {e}")
+            self.current_backup_id = None  # Indicate failure to get an ID
+
+    def _update_backup_record(self, status):
+        """Updates the backup record with final statistics and status."""
+        if self.current_backup_id is None:
+            print("Warning: No backup ID to update. Record might not have been inserted.")
+            return
+
+        try:
+            self._flush_telemetry()
+            end_time = datetime.now().isoformat()
+            total_size_mb = self.total_size / (1024 * 1024)  # Convert bytes to MB
+
+            self.cursor.execute('''
+                UPDATE backups
+                SET end_time = ?,
+                    files_backed_up = ?,
+                    directories_backed_up = ?,
+                    total_size_mb = ?,
+                    status = ?
+                WHERE id = ?
+            ''', (end_time, self.file_count, self.dir_count, total_size_mb, status, self.current_backup_id))
+            self.conn.commit()
+            print(f"Backup record ID {self.current_backup_id} updated with status: {status}")
+        except sqlite3.Error as e:
+            print(f"Database error updating backup record: {e}")
+
+    def _resume_interrupted(self):
+        """Pick up the latest interrupted walk of this site, if there is one.
+
+        A walk is interrupted when its backup record is still 'running' (the process
+        was killed) or 'failed', it has unvisited directories left and no backup of
+        the site succeeded since. Returns (backup_type, incremental baseline) or None.
+        """
+        self.cursor.execute('''
+            SELECT id, backup_type, start_time, local_directory, files_backed_up, directories_backed_up,
+                   total_size_mb, baseline_time, synthetic_from
+            FROM backups b
+            WHERE remote_directory = ? AND host = ? AND status IN ('running', 'failed')
+              AND id > (SELECT COALESCE(MAX(id), 0) FROM backups
+                        WHERE remote_directory = ? AND host = ? AND status = 'success')
+              AND EXISTS (SELECT 1 FROM walk_frontier f WHERE f.backup_id = b.id AND f.done = 0)
+            ORDER BY id DESC LIMIT 1
+        ''', (self.remote_dir, self.host, self.remote_dir, self.host))
+        row = self.cursor.fetchone()
+        if row is None:
+            return None
+        backup_id, backup_type, start_time, local_dir, files, dirs, size_mb, baseline, synthetic_from = row
+        if self.backup_type not in ('auto', backup_type) or not os.path.isdir(local_dir):
+            return None
+
+        self.current_backup_id = backup_id
+        self.current_backup_timestamp = datetime.fromisoformat(start_time)
+        self.backup_dir = local_dir
+        # Progress as of the last completed directory
+        self.file_count = files or 0
+        self.dir_count = dirs or 0
+        self.total_size = int((size_mb or 0) * 1024 * 1024)
+        self.resuming = True
+        self.verifying = synthetic_from is not None
+        self.cursor.execute("UPDATE backups SET status = 'running', end_time = NULL WHERE id = ?", (backup_id,))
+        self.conn.commit()
+        print(f"\nResuming interrupted {backup_type.upper()} backup (ID {backup_id}) into {local_dir}")
+        return backup_type, datetime.fromisoformat(baseline) if baseline else None
+
+    def _synthetic_sources(self):
+        """[(id, start time, local dir)] newest first: the latest full (or folded) backup and the incrementals
+        after it, or None if there is no such chain with all its directories on disk."""
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(backups)")]
+        folded = "folded_time IS NOT NULL" if 'folded_time' in columns else "0"  # See snapshots.py
+        self.cursor.execute(f'''
+            SELECT id, backup_type, start_time, local_directory, {folded} FROM backups
+            WHERE status = 'success' AND remote_directory = ? AND host = ?
+            ORDER BY start_time DESC, id DESC
+        ''', (self.remote_dir, self.host))
+        chain = []
+        for backup_id, backup_type, start_time, local_dir, is_folded in self.cursor.fetchall():
+            if not os.path.isdir(local_dir):
+                return None
+            chain.append((backup_id, datetime.fromisoformat(start_time), local_dir))
+            if backup_type == 'full' or is_folded:
+                return chain
+        return None
+
+    def _build_synthetic_full(self, chain):
+        """Full backup from the previous backups: hardlink their files, then walk the server to verify.
+
+        The walk works like an incremental since the newest backup of the chain,
+        except that files missing locally or differing in size are downloaded as
+        well, and whatever the server no longer lists is removed.
+        """
+        print(f"\nPerforming a SYNTHETIC FULL backup from {len(chain)} earlier backup(s)...")
+        baseline = chain[0][1]
+        self.create_backup_dir(suffix="_FULL")
+        self._record_backup_start("full", self.backup_dir, baseline=baseline,
+                                  synthetic_from=",".join(str(backup_id) for backup_id, _, _ in reversed(chain)))
+        linked = sum(snapshots.fill_missing(self.backup_dir, local_dir) for _, _, local_dir in chain)
+        print(f"Linked {linked} files from earlier backups")
+        self.verifying = True
+        self.download_directory(self.remote_dir, self.backup_dir, last_incremental_time=baseline)
+
+    def _sweep_local(self, local_path, keep):
+        """Synthetic full: remove what the earlier backups left in local_path that the server doesn't list."""
+        try:
+            names = os.listdir(local_path)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if name in keep:
+                continue
+            path = os.path.join(local_path, name)
+            print(f"Removing (gone from server): {path}")
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            self.removed_count += 1
+
+    def _frontier_add(self, directories):
+        """Queue [(remote_path, local_path)] for the walk; directories already queued or visited are ignored."""
+        self.cursor.executemany('''
+            INSERT OR IGNORE INTO walk_frontier (backup_id, remote_path, local_path) VALUES (?, ?, ?)
+        ''', [(self.current_backup_id, remote, local) for remote, local in directories])
+
+    def _frontier_next(self, limit=1, skip=()):
+        """The oldest queued directories as [(remote_path, local_path)], leaving out those in skip."""
+        skip = set(skip)
+        self.cursor.execute('''
+            SELECT remote_path, local_path FROM walk_frontier
+            WHERE backup_id = ? AND done = 0
+            ORDER BY rowid LIMIT ?
+        ''', (self.current_backup_id, limit + len(skip)))
+        return [row for row in self.cursor.fetchall() if row[0] not in skip][:limit]
+
+    def _frontier_done(self, remote_path):
+        """Mark a directory visited and checkpoint the counters with it, for _resume_interrupted."""
+        self.dir_count += 1
+        self._flush_telemetry()
+        self.cursor.execute('''
+            UPDATE walk_frontier SET done = 1 WHERE backup_id = ? AND remote_path = ?
+        ''', (self.current_backup_id, remote_path))
+        self.cursor.execute('''
+            UPDATE backups SET files_backed_up = ?, directories_backed_up = ?, total_size_mb = ? WHERE id = ?
+        ''', (self.file_count, self.dir_count, self.total_size / (1024 * 1024), self.current_backup_id))
+        self.conn.commit()
+
+    def _frontier_clear(self):
+        """Drop the walk state of a finished backup, and of older walks of the site it superseded."""
+        self.cursor.execute('''
+            DELETE FROM walk_frontier WHERE backup_id IN (
+                SELECT id FROM backups WHERE remote_directory = ? AND (host = ? OR host IS NULL) AND id <= ?)
+        ''', (self.remote_dir, self.host, self.current_backup_id))
+        self.conn.commit()
+
+    def _log_transfer(self, remote_path, nbytes, seconds, retries, ok):
+        """Buffer the telemetry of one download (the bytes actually received, time including retries)."""
+        directory, name = posixpath.split(remote_path)
+        self.transfer_log.append((self.current_backup_id, directory, name, nbytes, seconds, retries, int(ok)))
+        if len(self.transfer_log) >= TELEMETRY_BATCH:
+            self._flush_telemetry()
+            self.conn.commit()
+
+    def _log_listing(self, remote_path, seconds, entries):
+        """Buffer the time one directory listing took."""
+        self.listing_log.append((self.current_backup_id, remote_path, seconds, entries))
+
+    def _flush_telemetry(self):
+        """Write the buffered telemetry rows; the caller commits."""
+        if self.transfer_log:
+            self.cursor.executemany('''
+                INSERT INTO file_transfers (backup_id, directory, name, bytes, seconds, retries, ok)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', self.transfer_log)
+            self.transfer_log = []
+        if self.listing_log:
+            self.cursor.executemany('''
+                INSERT INTO directory_listings (backup_id, remote_path, seconds, entries) VALUES (?, ?, ?, ?)
+            ''', self.listing_log)
+            self.listing_log = []
+
+    def connect(self):
+        self.transport.connect()
+
+    def disconnect(self):
+        """Close the transport and the database connection"""
+        self.transport.close()
+        if self.conn:
+            self.conn.close()
+            print("Database connection closed")
+
+    def create_backup_dir(self, suffix=""):
+        """Create local backup directory with timestamp and optional suffix."""
+        timestamp = self.current_backup_timestamp.strftime("%Y%m%d_%H%M%S")
+        self.backup_dir = os.path.join(self.local_dir, f"hostinger_backup_{timestamp}{suffix}")
+        os.makedirs(self.backup_dir, exist_ok=True)
+        print(f"Backup directory created: {self.backup_dir}")
+
+    def download_file(self, remote_path, local_path, is_incremental=False, file_size=None, remote_mtime=None):
+        """Download a single file. The mtime is looked up unless the listing already provided it."""
+        retries = 3
+        display_path = self._normalize_ftp_path(remote_path)
+        size_text = f"{file_size / 1024:.1f} KB" if file_size is not None else "size unknown"
+        started = time.perf_counter()
+
+        for attempt in range(retries):
+            try:
+                status_msg = f"Downloading: {display_path} ({size_text})"
+                if is_incremental:
+                    status_msg = f"Incremental {status_msg}"
+                print(status_msg, end='\r')
+
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                if os.path.lexists(local_path):
+                    os.remove(local_path)  # May be a hardlink shared with older backups; never write through it
+
+                received = 0
+                with open(local_path, 'wb') as f:
+                    def write(chunk):
+                        nonlocal received
+                        if self.throttle:
+                            time.sleep(self.throttle.reserve(len(chunk)))
+                        f.write(chunk)
+                        received += len(chunk)
+                    self.transport.retrieve(display_path, write)
+
+                if remote_mtime is None:
+                    remote_mtime = self.transport.mtime(remote_path)
+                self._record_file(local_path, received, remote_mtime)
+                self._log_transfer(display_path, received, time.perf_counter() - started, attempt, True)
+                return True
+            except Exception as e:
+                if attempt == retries - 1:
+                    print(f"\nFailed to download {display_path} after {retries} attempts: {e}")
+                    self._log_transfer(display_path, 0, time.perf_counter() - started, attempt, False)
+                    return False
+                time.sleep(2)
+                if self.transport.is_disconnect(e):
+                    # Connection lost: reconnect like the asyncio backend, or every retry fails too
+                    try:
+                        self.transport.close()
+                        self.transport.connect()
+                    except Exception as e_connect:
+                        print(f"\nReconnect failed: {e_connect}")
+        return False
+
+    def _record_file(self, local_path, received, remote_mtime):
+        """Count a finished download (by bytes received) and copy the remote modification time onto the local file."""
+        self.file_count += 1
+        self.total_size += received
+        if remote_mtime:
+            # Set local file modification time to match remote if possible
+            # access time (atime) can be left as current or set to mtime for simplicity
+            os.utime(local_path,
+                     (time.time(), self._epoch(remote_mtime)))  # using current time for atime, mtime from remote
+
+    @staticmethod
+    def _epoch(remote_mtime):
+        """Unix time of a remote mtime. They are naive UTC, which .timestamp() alone would read as local time."""
+        return remote_mtime.replace(tzinfo=timezone.utc).timestamp()
+
+    @staticmethod
+    def _utc_baseline(baseline):
+        """An incremental baseline as remote mtimes can be compared with it.
+
+        Baselines are start times from the history DB, in local time; remote
+        mtimes are naive UTC (MDTM / MLSD, LocalTransport). The margin makes a
+        file changed in the second the previous backup started count as changed.
+        """
+        return baseline.astimezone(timezone.utc).replace(tzinfo=None) - BASELINE_MARGIN
+
+    def _should_download(self, remote_item, local_item, last_incremental_time, remote_mtime, size=None):
+        """Decide whether a file found during the walk gets downloaded (shared by all backends)."""
+        if not last_incremental_time:
+            # Full backup, download unconditionally
+            return True
+        if self.verifying:
+            # Synthetic full: local_item is the file as the earlier backups have it
+            if not os.path.exists(local_item):
+                print(f"Missing from earlier backups: {remote_item}")
+                return True
+            if size is not None and os.path.getsize(local_item) != size:
+                print(f"Size changed: {remote_item}")
+                return True
+            # Downloads carry the remote mtime (see _record_file), and so do their hardlinks
+            if remote_mtime and abs(os.stat(local_item).st_mtime - self._epoch(remote_mtime)) > 1:
+                print(f"Modification time changed: {remote_item}")
+                return True
+        # Incremental logic: only download if remote_mtime is available and newer than last_incremental_time
+        if remote_mtime and remote_mtime > self._utc_baseline(last_incremental_time):
+            print(f"File modified: {remote_item}")
+            return True
+        if remote_mtime:
+            # Unmodified. Incrementals go to a fresh directory, so local_item never exists and can't decide this.
+            return False
+        # Without a modification time the file can't be judged, download it
+        print(f"No modification time, downloading: {remote_item}")
+        return True
+
+    def _already_downloaded(self, local_item, size, remote_mtime):
+        """On a resumed walk, True (and counted) for a file a previous attempt finished downloading.
+
+        Only finished downloads carry the remote modification time, so a partly
+        written file never matches.
+        """
+        if not self.resuming or size is None or remote_mtime is None or not os.path.exists(local_item):
+            return False
+        stat = os.stat(local_item)
+        if stat.st_size != size or abs(stat.st_mtime - self._epoch(remote_mtime)) > 1:
+            return False
+        self.file_count += 1
+        self.total_size += size
+        return True
+
+    def _execute_plan(self):
+        """Download the files of a saved plan without listing the server. Returns the backup type."""
+        header = planner.read_plan_header(self.plan_path)
+        if header['host'] != self.host or header['remote_dir'] != self.remote_dir:
+            raise ValueError(f"The plan is for {header['host']}:{header['remote_dir']}, "
+                             f"not {self.host}:{self.remote_dir}")
+        backup_type = header['backup_type'] if self.backup_type == 'auto' else self.backup_type
+        baseline = datetime.fromisoformat(header['baseline']) if header['baseline'] else None
+        if backup_type == 'incremental' and baseline is None:
+            raise ValueError("The plan has no incremental baseline, only a full backup can run from it")
+
+        # The backup covers the server as listed, so the next incremental has to count from the listing
+        self.current_backup_timestamp = datetime.fromisoformat(header['listed_at'])
+        print(f"\nPerforming a {backup_type.upper()} backup from plan {self.plan_path} "
+              f"(listed {self.current_backup_timestamp:%Y-%m-%d %H:%M})...")
+        self.create_backup_dir(suffix="_FULL" if backup_type == 'full' else "_INC")
+        self._record_backup_start(backup_type, self.backup_dir,
+                                  baseline=baseline if backup_type == 'incremental' else None)
+        self.download_planned(planner.planned_files(self.plan_path, backup_type == 'incremental'),
+                              is_incremental=backup_type == 'incremental')
+        self.dir_count = header['directories']
+        return backup_type
+
+    def download_planned(self, files, is_incremental=False):
+        """Download [(relative path, size, mtime)] below remote_dir into backup_dir."""
+        for relative, size, remote_mtime in files:
+            remote_item = self._normalize_ftp_path(self.remote_dir + '/' + relative)
+            local_item = os.path.join(self.backup_dir, *relative.split('/'))
+            self.download_file(remote_item, local_item, is_incremental=is_incremental,
+                               file_size=size, remote_mtime=remote_mtime)
+
+    def _relative_path(self, remote_item):
+        """Path below the backed up remote directory, as the filter rules see it."""
+        root = self.remote_dir.rstrip('/')
+        if remote_item.startswith(root + '/'):
+            return remote_item[len(root) + 1:]
+        return remote_item.lstrip('/')
+
+    def download_directory(self, remote_path, local_path, last_incremental_time=None):
+        """Download the tree below remote_path, with incremental logic and filters.
+
+        The walk is breadth-first over a work queue kept in the walk_frontier table
+        together with the directories already visited, so memory holds one directory
+        listing at a time however large the tree is, and a walk cut short by a crash
+        or a lost connection continues where it stopped on the next run.
+        """
+        self._frontier_add([(self._normalize_ftp_path(remote_path), local_path)])
+        self.conn.commit()
+        while True:
+            pending = self._frontier_next()
+            if not pending:
+                break
+            current_remote_dir, current_local_dir = pending[0]
+            try:
+                self._walk_directory(current_remote_dir, current_local_dir, last_incremental_time)
+            except self.transport.skip_errors as e:
+                # Unreadable directory: skip it. Other errors end the backup and leave it to be resumed.
+                print(f"\nError accessing remote directory {current_remote_dir}: {e}")
+            self._frontier_done(current_remote_dir)
+
+    def _walk_directory(self, remote_path, local_path, last_incremental_time):
+        """List one directory, queue its subdirectories and download its files."""
+        print(f"Entering remote directory: {remote_path}")
+        started = time.perf_counter()
+        listing = self.transport.list_directory(remote_path)
+        self._log_listing(remote_path, time.perf_counter() - started, len(listing))
+
+        subdirs = []
+        files = []
+        keep = set()  # Names a synthetic full keeps locally
+        for item, entry_type, size, remote_mtime in listing:
+            remote_item = self._normalize_ftp_path(remote_path + '/' + item)
+            local_item = os.path.join(local_path, item)
+            relative = self._relative_path(remote_item)
+
+            if entry_type is None:
+                # Names that are excluded either way are skipped without the CWD probe
+                if self.filter and self.filter.check_unknown(relative):
+                    continue
+                entry_type = self.transport.probe_type(remote_item, remote_path)
+            if entry_type != 'file':
+                keep.add(item)  # Directories, and entries that couldn't be probed
+
+            if entry_type == 'dir':
+                if self.filter and self.filter.check_dir(relative):
+                    keep.discard(item)
+                    continue
+                print(f"Found directory: {remote_item}")
+                os.makedirs(local_item, exist_ok=True)
+                subdirs.append((remote_item, local_item))
+            elif entry_type == 'file':
+                files.append((remote_item, local_item, relative, size, remote_mtime))
+
+        # Queued before the downloads, so an interruption below only repeats this directory
+        self._frontier_add(subdirs)
+        self.conn.commit()
+
+        for remote_item, local_item, relative, size, remote_mtime in files:
+            try:
+                if self.filter:
+                    # Size / age limits need the facts NLST doesn't give
+                    if self.filter.max_size is not None and size is None:
+                        size = self.transport.size(remote_item)
+                    if self.filter.max_age is not None and remote_mtime is None:
+                        remote_mtime = self.transport.mtime(remote_item)
+                    if self.filter.check_file(relative, size, remote_mtime):
+                        continue
+                keep.add(os.path.basename(local_item))
+                # Incremental logic: check modification time
+                if last_incremental_time and remote_mtime is None:
+                    remote_mtime = self.transport.mtime(remote_item)
+                if self.verifying and size is None and os.path.exists(local_item):
+                    size = self.transport.size(remote_item)
+                if not self._should_download(remote_item, local_item, last_incremental_time, remote_mtime, size):
+                    continue
+                if self.resuming and os.path.exists(local_item):
+                    if size is None:
+                        size = self.transport.size(remote_item)
+                    if remote_mtime is None:
+                        remote_mtime = self.transport.mtime(remote_item)
+                    if self._already_downloaded(local_item, size, remote_mtime):
+                        continue
+                self.download_file(remote_item, local_item, is_incremental=bool(last_incremental_time),
+                                   file_size=size, remote_mtime=remote_mtime)
+            except Exception as e:
+                keep.add(os.path.basename(local_item))  # Keep what the earlier backups had
+                print(f"\nError processing {remote_item}: {e}")
+
+        if self.verifying:
+            self._sweep_local(local_path, keep)
+
+    def run_backup(self):
+        """Execute the full or incremental backup process. Returns 'success' or 'failed'."""
+        self.start_time_actual = time.time()
+        self.current_backup_timestamp = datetime.now()  # Capture start time of this run
+
+        backup_status = 'failed'  # Default status
+
+        try:
+            self.connect()
+
+            last_full_backup, last_incremental_backup = self._get_last_backup_times()
+
+            # Determine backup type based on schedule and last backup times
+            now = self.current_backup_timestamp
+
+            is_full_backup = False
+            backup_type_name = "incremental"  # Default for record
+
+            if self.backup_type == 'full':  # Explicitly requested full backup
+                is_full_backup = True
+                backup_type_name = "full"
+            elif self.backup_type == 'auto':
+                # Check if it's time for a weekly full backup
+                # current time is Sunday, June 29, 2025 at 6:18:37 PM IST
+                # Pune, Maharashtra, India.
+                # Assuming "weekly" means every 7 days from the last full backup,
+                # or if the last full backup was more than 7 days ago.
+                # Or, if today is Sunday (for a fixed weekly schedule)
+
+                # Option 1: Based on timedelta from last full
+                if last_full_backup is None or (now - last_full_backup > self.full_interval):
+                    is_full_backup = True
+                    backup_type_name = "full"
+                # Option 2: Based on day of week (e.g., always Sunday for full)
+                # if now.weekday() == 6: # Monday is 0, Sunday is 6
+                #     is_full_backup = True
+                #     backup_type_name = "full"
+
+            resumed = self._resume_interrupted() if self.resume and not self.plan_path else None
+            chain = None
+            if is_full_backup and self.synthetic_full and not (resumed or self.plan_path):
+                chain = self._synthetic_sources()
+            if self.plan_path:
+                backup_type_name = self._execute_plan()
+            elif resumed:
+                backup_type_name, baseline = resumed
+                self.download_directory(self.remote_dir, self.backup_dir, last_incremental_time=baseline)
+            elif chain:
+                self._build_synthetic_full(chain)
+            elif is_full_backup:
+                print("\nPerforming a FULL backup...")
+                self.create_backup_dir(suffix="_FULL")
+                self._record_backup_start("full", self.backup_dir)
+                self.download_directory(self.remote_dir, self.backup_dir)
+            else:  # Incremental
+                print("\nPerforming an INCREMENTAL backup...")
+                if last_incremental_backup is None:
+                    print("No previous incremental baseline found. Performing a full backup instead.")
+                    # Fallback to full if no incremental baseline
+                    self.create_backup_dir(suffix="_FULL")
+                    self._record_backup_start("full", self.backup_dir)  # Record as full backup
+                    self.download_directory(self.remote_dir, self.backup_dir)
+                    backup_type_name = "full"
+                else:
+                    self.create_backup_dir(suffix="_INC")
+                    self._record_backup_start("incremental", self.backup_dir, baseline=last_incremental_backup)
+                    self.download_directory(self.remote_dir, self.backup_dir,
+                                            last_incremental_time=last_incremental_backup)
+                    backup_type_name = "incremental"
+
+            backup_status = 'success'  # If we reached here, it was successful
+            self._frontier_clear()
+
+        except Exception as e:
+            print(f"\nBackup failed: {e}")
+            backup_status = 'failed'  # Set status to failed
+        finally:
+            self._update_backup_record(backup_status)  # Update the record regardless of success/failure
+            self.disconnect()  # Closes the transport and the DB
+
+            # Print summary
+            duration = time.time() - self.start_time_actual
+            print("\n" + "=" * 50)
+            print("Backup Complete!")
+            print(f"Type: {backup_type_name.capitalize()}")
+            print(f"Directories: {self.dir_count}")
+            print(f"Files: {self.file_count}")
+            print(f"Total size: {self.total_size / 1024 / 1024:.2f} MB")
+            if self.verifying:
+                print(f"Removed (gone from server): {self.removed_count}")
+            print(f"Duration: {duration:.1f} seconds")
+            print(f"Backup location: {self.backup_dir}")
+            if self.filter and self.filter.stats:
+                print("Skipped by filters (MB where the size was known):")
+                print(self.filter.report())
+            print("=" * 50)
+            print(f"Backup details stored in {self.db_path}")
+        return backup_status
@@ -0,0 +1,139 @@
+"""Backup performance history from the telemetry in backup_history.db.
+
+    python backup_stats.py
+    python backup_stats.py --host ftp.example.com --runs 30 --top 15
+
+Shows, per run, the wall time, bytes actually received, throughput and retries;
+then the directories that are slowest to list and to download, and the files
+that needed retries or failed, across all runs shown. The per-file and
+per-directory rows are written by BackupEngine (file_transfers,
+directory_listings); older runs without them show their totals only.
+"""
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+
+
+def site_filter(host, remote_dir, prefix=""):
+    clauses, params = [], []
+    if host:
+        clauses.append(f"{prefix}host = ?")
+        params.append(host)
+    if remote_dir:
+        clauses.append(f"{prefix}remote_directory = ?")
+        params.append(remote_dir)
+    return "".join(f" AND {clause}" for clause in clauses), params
+
+
+def recent_runs(conn, host=None, remote_dir=None, runs=20):
+    """Latest finished runs, oldest first, with their telemetry aggregated."""
+    where, params = site_filter(host, remote_dir, "b.")
+    rows = conn.execute(f'''
+        SELECT b.id, b.backup_type, b.start_time, b.end_time, b.status, b.files_backed_up, b.total_size_mb,
+               t.transfers, t.bytes, t.seconds, t.retries, t.failed, l.seconds
+        FROM backups b
+        LEFT JOIN (SELECT backup_id, COUNT(*) AS transfers, SUM(bytes) AS bytes, SUM(seconds) AS seconds,
+                          SUM(retries) AS retries, SUM(1 - ok) AS failed
+                   FROM file_transfers GROUP BY backup_id) t ON t.backup_id = b.id
+        LEFT JOIN (SELECT backup_id, SUM(seconds) AS seconds FROM directory_listings GROUP BY backup_id) l
+               ON l.backup_id = b.id
+        WHERE b.end_time IS NOT NULL {where}
+        ORDER BY b.id DESC LIMIT ?
+    ''', params + [runs]).fetchall()
+    return rows[::-1]
+
+
+def print_runs(rows):
+    print(f"{'id':>5} {'start':<16} {'type':<11} {'status':<8} {'files':>7} {'MB':>9} {'wall s':>8} "
+          f"{'MB/s':>7} {'list s':>7} {'retries':>7} {'failed':>6}")
+    for (backup_id, backup_type, start, end, status, files, size_mb, transfers, nbytes, _, retries, failed,
+         listing) in rows:
+        wall = (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+        size_mb = nbytes / 1024 / 1024 if nbytes is not None else (size_mb or 0)
+        rate = f"{size_mb / wall:7.2f}" if wall > 0 else f"{'-':>7}"
+        telemetry = transfers is not None
+        print(f"{backup_id:>5} {start[:16]:<16} {backup_type:<11} {status:<8} {files or 0:>7} {size_mb:>9.2f} "
+              f"{wall:>8.1f} {rate} "
+              f"{f'{listing:.1f}' if listing is not None else '-':>7} "
+              f"{retries if telemetry else '-':>7} {failed if telemetry else '-':>6}")
+
+
+def slowest_listings(conn, backup_ids, top):
+    marks = ",".join("?" * len(backup_ids))
+    return conn.execute(f'''
+        SELECT remote_path, COUNT(*), AVG(seconds), MAX(seconds), AVG(entries)
+        FROM directory_listings WHERE backup_id IN ({marks})
+        GROUP BY remote_path ORDER BY AVG(seconds) DESC LIMIT ?
+    ''', backup_ids + [top]).fetchall()
+
+
+def slowest_directories(conn, backup_ids, top):
+    """Directories by download time per run, with their effective throughput."""
+    marks = ",".join("?" * len(backup_ids))
+    return conn.execute(f'''
+        SELECT directory, COUNT(DISTINCT backup_id), SUM(seconds) / COUNT(DISTINCT backup_id),
+               SUM(bytes) / COUNT(DISTINCT backup_id), COUNT(*) / COUNT(DISTINCT backup_id)
+        FROM file_transfers WHERE backup_id IN ({marks})
+        GROUP BY directory ORDER BY SUM(seconds) / COUNT(DISTINCT backup_id) DESC LIMIT ?
+    ''', backup_ids + [top]).fetchall()
+
+
+def retry_hotspots(conn, backup_ids, top):
+    marks = ",".join("?" * len(backup_ids))
+    return conn.execute(f'''
+        SELECT CASE directory WHEN '/' THEN '/' || name ELSE directory || '/' || name END,
+               COUNT(*), SUM(retries), SUM(1 - ok)
+        FROM file_transfers WHERE backup_id IN ({marks}) AND (retries > 0 OR ok = 0)
+        GROUP BY directory, name ORDER BY SUM(1 - ok) DESC, SUM(retries) DESC LIMIT ?
+    ''', backup_ids + [top]).fetchall()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show backup throughput trends, slow directories and retries.")
+    parser.add_argument("--db-file", default="backup_history.db", help="Backup history database")
+    parser.add_argument("--host", help="Only runs against this FTP host")
+    parser.add_argument("--remote-dir", help="Only runs of this remote directory (as stored, e.g. /public_html)")
+    parser.add_argument("--runs", type=int, default=20, help="How many recent runs to include")
+    parser.add_argument("--top", type=int, default=10, help="Rows in each ranking")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_file):
+        print(f"Database not found: {args.db_file}")
+        raise SystemExit(1)
+    conn = sqlite3.connect(args.db_file, timeout=30)
+    try:
+        rows = recent_runs(conn, args.host, args.remote_dir, args.runs)
+        if not rows:
+            print("No finished backups recorded.")
+            return
+        print(f"Last {len(rows)} run(s):")
+        print_runs(rows)
+
+        backup_ids = [row[0] for row in rows]
+        listings = slowest_listings(conn, backup_ids, args.top)
+        if listings:
+            print("\nSlowest directories to list (average over runs):")
+            for path, runs, average, worst, entries in listings:
+                print(f"  {average * 1000:8.0f} ms avg  {worst * 1000:8.0f} ms max  {entries:8.0f} entries  "
+                      f"{runs:>3} run(s)  {path}")
+
+        directories = slowest_directories(conn, backup_ids, args.top)
+        if directories:
+            print("\nSlowest directories to download (per run):")
+            for directory, runs, seconds, nbytes, files in directories:
+                rate = nbytes / seconds / 1024 / 1024 if seconds else 0
+                print(f"  {seconds:8.1f} s  {nbytes / 1024 / 1024:9.2f} MB  {rate:7.2f} MB/s  {files:>6} files  "
+                      f"{runs:>3} run(s)  {directory}")
+
+        hotspots = retry_hotspots(conn, backup_ids, args.top)
+        if hotspots:
+            print("\nRetry hotspots:")
+            for path, transfers, retries, failed in hotspots:
+                print(f"  {retries:>4} retries  {failed:>3} failed  in {transfers:>3} transfer(s)  {path}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare the ftplib and asyncio backends against a local FTP server with simulated latency.
+
+A pyftpdlib server serves a generated tree. Clients reach it through a proxy
+that delays every packet by half the round trip time in each direction. The
+proxy rewrites PASV/EPSV replies so that data connections pay the latency too.
+Each backend then runs a full backup of the tree. The server and proxy are
+shared with ftp_harness.py, which also checks incrementals and failures.
+
+    python bench_ftp.py --rtt-ms 80 --dirs 10 --files 20 --file-kb 32 --connections 1,4,8
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from async_ftp import AsyncFTPBackup
+from ftp_harness import PASSWORD, USER, LatencyProxy, start_ftp_server
+from hostinger_bakup import HostingerBackup
+
+
+def make_tree(root, dirs, files, file_kb):
+    payload = os.urandom(file_kb * 1024)
+    for d in range(dirs):
+        directory = os.path.join(root, "site", f"dir{d:03}")
+        os.makedirs(directory, exist_ok=True)
+        for f in range(files):
+            with open(os.path.join(directory, f"file{f:03}.bin"), "wb") as out:
+                out.write(payload)
+    return dirs * files, dirs * files * file_kb * 1024
+
+
+def run_backup(backup_class, port, out_dir, **extra):
+    os.makedirs(out_dir, exist_ok=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        backup = backup_class("127.0.0.1", USER, PASSWORD, "/site", out_dir, port=port,
+                              db_path=os.path.join(out_dir, "history.db"), **extra)
+        backup.backup_type = "full"
+        started = time.perf_counter()
+        backup.run_backup()
+    elapsed = time.perf_counter() - started
+    # Count what actually landed on disk rather than trusting the backup's own counters
+    files = size = 0
+    for directory, _, names in os.walk(backup.backup_dir):
+        files += len(names)
+        size += sum(os.path.getsize(os.path.join(directory, name)) for name in names)
+    return elapsed, files, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the ftplib and asyncio backup backends.")
+    parser.add_argument("--rtt-ms", type=float, default=50, help="Simulated round trip time")
+    parser.add_argument("--dirs", type=int, default=10)
+    parser.add_argument("--files", type=int, default=20, help="Files per directory")
+    parser.add_argument("--file-kb", type=int, default=32)
+    parser.add_argument("--connections", default="1,4,8", help="asyncio connection counts to try")
+    parser.add_argument("--output", help="Append the results as a JSON line to this file")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="bench_ftp_")
+    try:
+        root = os.path.join(work, "remote")
+        expected_files, expected_bytes = make_tree(root, args.dirs, args.files, args.file_kb)
+        server, server_port = start_ftp_server(root)
+        proxy_port = LatencyProxy(server_port, args.rtt_ms / 1000).start()
+        print(f"{expected_files} files, {expected_bytes / 1024 / 1024:.1f} MB, RTT {args.rtt_ms:.0f} ms")
+
+        runs = [("ftplib", HostingerBackup, {})]
+        runs += [(f"asyncio x{n}", AsyncFTPBackup, {"connections": int(n)}) for n in args.connections.split(",")]
+        results = []
+        for index, (name, backup_class, extra) in enumerate(runs):
+            out_dir = os.path.join(work, f"out{index}")
+            elapsed, files, size = run_backup(backup_class, proxy_port, out_dir, **extra)
+            ok = files == expected_files and size == expected_bytes
+            results.append({"backend": name, "seconds": round(elapsed, 3), "files": files, "bytes": size,
+                            "complete": ok})
+            print(f"{name:<12} {elapsed:8.2f} s  {files / elapsed:8.1f} files/s  "
+                  f"{size / elapsed / 1024 / 1024:6.2f} MB/s{'' if ok else '  INCOMPLETE'}")
+        server.close_all()
+
+        if args.output:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"timestamp": datetime.now().isoformat(), "rtt_ms": args.rtt_ms,
+                                    "dirs": args.dirs, "files": args.files, "file_kb": args.file_kb,
+                                    "results": results}) + "\n")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""gitignore-style include/exclude rules plus size and age limits for the remote walk.
+
+Rules use .gitignore syntax, matched against paths relative to the backed up
+remote directory:
+
+    wp-content/cache/      only the top level wp-content/cache directory (a slash anchors)
+    **/wp-content/cache/   wp-content/cache at any depth
+    node_modules/          any directory called node_modules
+    *.log                  any file ending in .log
+    /backups/*.zip         zips directly inside the top level backups directory
+    !keep.log              re-include (the last matching rule wins)
+
+Directories are checked before they are listed or entered, so an excluded
+subtree costs no FTP round trips at all. Files are checked before download;
+size and age limits need the size / modification time, which come for free
+with MLSD listings.
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+# Opt-in defaults for typical Hostinger/WordPress sites (--default-excludes)
+DEFAULT_RULES = [
+    "**/wp-content/cache/",
+    "**/wp-content/upgrade/",
+    "**/wp-content/ai1wm-backups/",
+    "**/wp-content/updraft/",
+    "node_modules/",
+    ".git/",
+    "logs/",
+    "*.log",
+    "error_log",
+]
+
+
+class Rule:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        text = pattern
+        self.negate = text.startswith("!")
+        if self.negate:
+            text = text[1:]
+        if text.startswith("\\"):
+            text = text[1:]  # Escaped leading "!" or "#"
+        self.dir_only = text.endswith("/")
+        text = text.rstrip("/")
+        # A slash at the start or in the middle anchors the pattern to the root
+        anchored = "/" in text
+        self.regex = ("^" if anchored else "^(?:.*/)?") + _translate(text.lstrip("/")) + "$"
+        self.matcher = re.compile(self.regex)
+
+    def matches(self, path, is_dir):
+        if self.dir_only and not is_dir:
+            return False
+        return self.matcher.match(path) is not None
+
+
+def _translate(pattern):
+    """gitignore glob -> regex fragment (without anchors)."""
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        elif pattern[i] == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape("["))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return "".join(out)
+
+
+def as_utc(mtime):
+    """Remote mtimes (MLSD / MDTM, LocalTransport) are naive UTC; make them aware so they compare with now."""
+    return mtime.replace(tzinfo=timezone.utc) if mtime.tzinfo is None else mtime
+
+
+class PathFilter:
+    """Compiled rule set. check_dir / check_file return the label of the rule that skips a path, or None."""
+
+    def __init__(self, rules=(), max_size=None, max_age_days=None, now=None):
+        self.rules = [Rule(line) for line in (r.strip() for r in rules) if line and not line.startswith("#")]
+        # One alternation over every rule: most paths match nothing and are decided by a single search
+        self.any_rule = re.compile("|".join(f"(?:{rule.regex})" for rule in self.rules)) if self.rules else None
+        self.max_size = max_size
+        self.max_age_days = max_age_days
+        self.max_age = timedelta(days=max_age_days) if max_age_days is not None else None
+        self.now = now or datetime.now(timezone.utc)
+        self.stats = {}
+
+    @classmethod
+    def from_options(cls, exclude=(), exclude_from=None, default_excludes=False, max_size_mb=None,
+                     max_age_days=None):
+        """Build a filter from CLI / config values, or return None if nothing is filtered."""
+        rules = list(DEFAULT_RULES) if default_excludes else []
+        if exclude_from:
+            with open(exclude_from, "r", encoding="utf-8") as f:
+                rules += f.read().splitlines()
+        rules += list(exclude or [])
+        max_size = int(max_size_mb * 1024 * 1024) if max_size_mb else None
+        if not rules and max_size is None and max_age_days is None:
+            return None
+        return cls(rules, max_size, max_age_days)
+
+    def _rule_for(self, path, is_dir):
+        if self.any_rule is None or not self.any_rule.match(path):
+            return None
+        for rule in reversed(self.rules):
+            if rule.matches(path, is_dir):
+                return None if rule.negate else rule.pattern
+        return None
+
+    def _count(self, label, kind, size=None):
+        entry = self.stats.setdefault(label, {"files": 0, "dirs": 0, "bytes": 0})
+        entry[kind] += 1
+        if size:
+            entry["bytes"] += size
+
+    def check_dir(self, path):
+        label = self._rule_for(path, True)
+        if label:
+            self._count(label, "dirs")
+        return label
+
+    def check_file(self, path, size=None, mtime=None):
+        label = self._rule_for(path, False)
+        if label is None and self.max_size is not None and size is not None and size > self.max_size:
+            label = f"size > {self.max_size / 1024 / 1024:g} MB"
+        if label is None and self.max_age is not None and mtime is not None and self.now - as_utc(mtime) > self.max_age:
+            label = f"age > {self.max_age_days:g} days"
+        if label:
+            self._count(label, "files", size)
+        return label
+
+    def check_unknown(self, path):
+        """For entries of unknown type (NLST): the rule that skips it whether it is a file or a directory."""
+        file_label = self._rule_for(path, False)
+        if file_label and self._rule_for(path, True):
+            self._count(file_label, "files")
+            return file_label
+        return None
+
+    def report(self):
+        lines = []
+        for label, entry in sorted(self.stats.items(), key=lambda item: (-item[1]["bytes"], item[0])):
+            lines.append(f"  {label:<32} {entry['dirs']:>6} dirs  {entry['files']:>7} files  "
+                         f"{entry['bytes'] / 1024 / 1024:>10.2f} MB")
+        return "\n".join(lines)
@@ -0,0 +1,424 @@
+"""Local FTP test harness and regression benchmark for the backup backends.
+
+Starts a pyftpdlib server on a generated site tree, puts a proxy in front of
+it that adds latency and counts traffic, and runs a full backup, a batch of
+changes, an incremental backup and optionally a synthetic full against it
+with each backend. Every phase is timed and checked:
+
+    full / synthetic   the local copy matches the remote tree file for file
+    incremental        exactly the changed and added files were downloaded
+
+Round trips are counted as the FTP commands the client sends; data
+connections and bytes received are counted by the proxy. Failures can be
+injected: RETR answered with a transient 451 (--fail-rate) and the control
+connection dropped before a command (--drop-rate). A backup that fails is run
+again, which resumes its walk, up to --attempts times.
+
+    python ftp_harness.py --shape small,deep --rtt-ms 40 --backends ftplib,asyncio:4
+    python ftp_harness.py --shape mixed --fail-rate 0.05 --drop-rate 0.0005 --synthetic --output harness.jsonl
+
+Shapes: small (many small files), huge (a few large files), deep (long
+directory chains) and mixed (a WordPress-like site). --scale multiplies the
+file counts (huge: the file sizes). Backends: ftplib, asyncio:N (connections)
+and local, which reads the same tree through LocalTransport without FTP. The
+exit status is 1 if any check failed.
+"""
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from pyftpdlib.authorizers import DummyAuthorizer
+from pyftpdlib.handlers import FTPHandler
+from pyftpdlib.log import config_logging
+from pyftpdlib.servers import ThreadedFTPServer
+
+from async_ftp import AsyncFTPBackup
+from backup_engine import BackupEngine, LocalTransport
+from hostinger_bakup import HostingerBackup
+
+USER, PASSWORD = "bench", "bench"
+SHAPES = ("small", "huge", "deep", "mixed")
+PASV_REPLY_RE = re.compile(rb'^227 .*?(\d+),(\d+),(\d+),(\d+),(\d+),(\d+)')
+EPSV_REPLY_RE = re.compile(rb'^229 .*\(\|\|\|(\d+)\|\)')
+
+
+# -- Site trees ---------------------------------------------------------------
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        while size > 0:
+            chunk = min(size, 1024 * 1024)
+            f.write(os.urandom(chunk))
+            size -= chunk
+
+
+def make_tree(root, shape, scale=1, seed=0):
+    """Generate a site below root/site. Returns (files, bytes)."""
+    rng = random.Random(seed)
+    site = os.path.join(root, "site")
+    files = []
+    if shape == "small":
+        for d in range(20 * scale):
+            for f in range(50):
+                files.append((f"dir{d:03}/file{f:03}.txt", rng.randint(200, 8 * 1024)))
+    elif shape == "huge":
+        for f in range(3):
+            files.append((f"media/big{f}.bin", 16 * 1024 * 1024 * scale))
+        files.append(("index.html", 4096))
+    elif shape == "deep":
+        for chain in range(2 * scale):
+            path = f"chain{chain}"
+            for depth in range(25):
+                path += f"/level{depth:02}"
+                for f in range(3):
+                    files.append((f"{path}/file{f}.dat", rng.randint(1024, 16 * 1024)))
+    elif shape == "mixed":
+        for f in range(150 * scale):
+            files.append((f"wp-admin/includes/admin{f:04}.php", rng.randint(1024, 40 * 1024)))
+        for f in range(250 * scale):
+            files.append((f"wp-includes/lib{f // 50}/inc{f:04}.php", rng.randint(512, 60 * 1024)))
+        for plugin in range(8 * scale):
+            for f in range(30):
+                files.append((f"wp-content/plugins/plugin{plugin:02}/src/file{f:02}.php", rng.randint(512, 20 * 1024)))
+        for month in range(1, 13):
+            for f in range(8 * scale):
+                files.append((f"wp-content/uploads/2024/{month:02}/image{f:03}.jpg",
+                              rng.randint(50 * 1024, 400 * 1024)))
+        for f in range(200 * scale):
+            files.append((f"wp-content/cache/page{f:04}.html", rng.randint(200, 4096)))
+        files.append(("wp-config.php", 3 * 1024))
+    else:
+        raise ValueError(f"Unknown shape {shape!r}, expected one of {', '.join(SHAPES)}")
+    # An hour old, like a live site's files: clear of the margin incrementals give their baseline
+    aged = time.time() - 3600
+    for relative, size in files:
+        write_file(os.path.join(site, relative), size)
+        os.utime(os.path.join(site, relative), (aged, aged))
+    return len(files), sum(size for _, size in files)
+
+
+def mutate_tree(site, seed=0, modify=0.05, add=0.01, delete=0.01):
+    """Change, add and delete some files. Returns the relative paths an incremental must download."""
+    rng = random.Random(seed + 1)
+    paths = sorted(os.path.relpath(os.path.join(d, name), site) for d, _, names in os.walk(site) for name in names)
+    count = lambda share: max(1, int(len(paths) * share))
+    picked = rng.sample(paths, min(len(paths), count(modify) + count(delete)))
+    changed, removed = picked[:count(modify)], picked[count(modify):]
+    for relative in changed:
+        with open(os.path.join(site, relative), "ab") as f:
+            f.write(os.urandom(rng.randint(1, 4096)))
+    for relative in removed:
+        os.remove(os.path.join(site, relative))
+    added = []
+    for index in range(count(add)):
+        relative = os.path.join(os.path.dirname(rng.choice(paths)), f"added{index:04}.bin")
+        write_file(os.path.join(site, relative), rng.randint(100, 64 * 1024))
+        added.append(relative)
+    return set(changed) | set(added)
+
+
+def tree_digest(root):
+    digest = {}
+    for directory, _, names in os.walk(root):
+        for name in names:
+            path = os.path.join(directory, name)
+            with open(path, "rb") as f:
+                digest[os.path.relpath(path, root)] = hashlib.md5(f.read()).hexdigest()
+    return digest
+
+
+# -- Server, proxy and failure injection --------------------------------------
+
+class FailureInjector:
+    def __init__(self, fail_rate=0.0, drop_rate=0.0, seed=0):
+        self.fail_rate = fail_rate
+        self.drop_rate = drop_rate
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.failed = 0
+        self.dropped = 0
+
+    def roll(self, rate):
+        with self.lock:
+            return rate > 0 and self.rng.random() < rate
+
+
+def start_ftp_server(root, injector=None):
+    config_logging(level=logging.WARNING)
+    authorizer = DummyAuthorizer()
+    authorizer.add_user(USER, PASSWORD, root, perm="elr")
+
+    class HarnessHandler(FTPHandler):
+        banner = "harness ready"
+
+        def pre_process_command(self, line, cmd, arg):
+            if injector and self.authenticated and cmd.upper() != "QUIT" and injector.roll(injector.drop_rate):
+                injector.dropped += 1
+                self.close()
+                return
+            return super().pre_process_command(line, cmd, arg)
+
+        def ftp_RETR(self, file):
+            if injector and injector.roll(injector.fail_rate):
+                injector.failed += 1
+                self.respond("451 Injected failure.")
+                return
+            return super().ftp_RETR(file)
+
+    HarnessHandler.authorizer = authorizer
+    server = ThreadedFTPServer(("127.0.0.1", 0), HarnessHandler)
+    server.max_cons = 256
+    threading.Thread(target=server.serve_forever, kwargs={"handle_exit": False}, daemon=True).start()
+    return server, server.address[1]
+
+
+class LatencyProxy:
+    """TCP proxy adding one-way delay to every chunk and counting the traffic, on its own event loop thread."""
+
+    def __init__(self, target_port, rtt):
+        self.target_port = target_port
+        self.delay = rtt / 2
+        self.loop = asyncio.new_event_loop()
+        self.port = None
+        self.reset()
+
+    def reset(self):
+        self.stats = {"commands": 0, "data_connections": 0, "bytes": 0}
+
+    def start(self):
+        ready = threading.Event()
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            server = self.loop.run_until_complete(
+                asyncio.start_server(lambda r, w: self._session(r, w, self.target_port, control=True),
+                                     "127.0.0.1", 0))
+            self.port = server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.port
+
+    async def _session(self, client_reader, client_writer, port, control):
+        try:
+            server_reader, server_writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            client_writer.close()
+            return
+        if not control:
+            self.stats["data_connections"] += 1
+        await asyncio.gather(self._pipe(client_reader, server_writer, upstream=True, control=control),
+                             self._pipe(server_reader, client_writer, upstream=False, control=control),
+                             return_exceptions=True)
+
+    async def _pipe(self, reader, writer, upstream, control):
+        queue = asyncio.Queue()
+
+        async def deliver():
+            while True:
+                due, data = await queue.get()
+                if data is None:
+                    break
+                await asyncio.sleep(max(0, due - self.loop.time()))
+                writer.write(data)
+                await writer.drain()
+            writer.close()
+
+        sender = asyncio.ensure_future(deliver())
+        try:
+            while True:
+                data = await (reader.readline() if control and not upstream else reader.read(65536))
+                if not data:
+                    break
+                if upstream and control:
+                    self.stats["commands"] += data.count(b"\n")
+                elif not upstream:
+                    self.stats["bytes"] += len(data)
+                    if control:
+                        data = await self._rewrite_passive(data)
+                queue.put_nowait((self.loop.time() + self.delay, data))
+        finally:
+            queue.put_nowait((0, None))
+            await sender
+
+    async def _rewrite_passive(self, line):
+        """Point PASV/EPSV replies at a delaying listener in front of the real data port."""
+        match = PASV_REPLY_RE.match(line) or EPSV_REPLY_RE.match(line)
+        if not match:
+            return line
+        groups = match.groups()
+        data_port = int(groups[4]) * 256 + int(groups[5]) if len(groups) == 6 else int(groups[0])
+        listener = None
+
+        async def on_connect(reader, writer):
+            listener.close()
+            await self._session(reader, writer, data_port, control=False)
+
+        listener = await asyncio.start_server(on_connect, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        if len(groups) == 6:
+            return f"227 Entering passive mode (127,0,0,1,{port // 256},{port % 256}).\r\n".encode()
+        return f"229 Entering extended passive mode (|||{port}|).\r\n".encode()
+
+
+# -- Backup runs ---------------------------------------------------------------
+
+def parse_backend(text, server_root):
+    """'ftplib', 'asyncio:N' or 'local' -> (label, factory(port, out_dir, db_path) making the backup).
+
+    local reads the server's files directly through LocalTransport, without
+    FTP or the proxy: the engine's own cost, and a check of the transport.
+    """
+    name, _, connections = text.partition(":")
+    if name == "ftplib":
+        return "ftplib", lambda port, out_dir, db_path: HostingerBackup(
+            "127.0.0.1", USER, PASSWORD, "/site", out_dir, port=port, db_path=db_path)
+    if name == "asyncio":
+        n = int(connections or 4)
+        return f"asyncio x{n}", lambda port, out_dir, db_path: AsyncFTPBackup(
+            "127.0.0.1", USER, PASSWORD, "/site", out_dir, port=port, db_path=db_path, connections=n)
+    if name == "local":
+        return "local", lambda port, out_dir, db_path: BackupEngine(
+            LocalTransport(server_root), "/site", out_dir, db_path=db_path)
+    raise ValueError(f"Unknown backend {text!r}, expected ftplib, asyncio:N or local")
+
+
+def run_backup(factory, port, out_dir, backup_type="full", attempts=1, synthetic=False):
+    """Run one backup (resuming after failures). Returns (backup, seconds, attempts used, status)."""
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    for attempt in range(1, attempts + 1):
+        with contextlib.redirect_stdout(io.StringIO()):
+            backup = factory(port, out_dir, os.path.join(out_dir, "history.db"))
+            backup.backup_type = backup_type
+            backup.synthetic_full = synthetic
+            backup.full_interval = timedelta(0)
+            status = backup.run_backup()
+        if status == "success":
+            break
+    return backup, time.perf_counter() - started, attempt, status
+
+
+def downloaded_files(out_dir, backup_id):
+    """Relative paths the file_transfers telemetry recorded as received by one backup."""
+    conn = sqlite3.connect(os.path.join(out_dir, "history.db"))
+    try:
+        rows = conn.execute("SELECT directory, name FROM file_transfers WHERE backup_id = ? AND ok = 1",
+                            (backup_id,)).fetchall()
+    finally:
+        conn.close()
+    return {os.path.relpath(f"{directory}/{name}", "/site") for directory, name in rows}
+
+
+def run_scenario(shape, backend, args, work, pristine, server_root, proxy):
+    label, factory = parse_backend(backend, server_root)
+    site = os.path.join(server_root, "site")
+    shutil.rmtree(server_root, ignore_errors=True)
+    shutil.copytree(pristine, server_root)
+    out_dir = tempfile.mkdtemp(prefix="out_", dir=work)
+    results = []
+
+    def phase(name, backup_type, check, synthetic=False):
+        proxy.reset()
+        backup, seconds, attempts, status = run_backup(factory, proxy.port, out_dir, backup_type,
+                                                       args.attempts, synthetic=synthetic)
+        ok, detail = (status == "success", status) if status != "success" else check(backup)
+        results.append(dict({"shape": shape, "backend": label, "phase": name, "seconds": round(seconds, 3),
+                             "attempts": attempts, "files": backup.file_count, "ok": ok, "detail": detail},
+                            **proxy.stats))
+        print(f"{shape:<7} {label:<11} {name:<12} {seconds:8.2f} s {proxy.stats['commands']:>7} cmds "
+              f"{proxy.stats['data_connections']:>6} data {proxy.stats['bytes'] / 1024 / 1024:>9.2f} MB "
+              f"{attempts:>2} try  {'ok' if ok else 'FAILED: ' + detail}")
+        return backup
+
+    def matches_remote(backup):
+        local, remote = tree_digest(backup.backup_dir), tree_digest(site)
+        if local == remote:
+            return True, "identical"
+        missing = len(set(remote) - set(local))
+        differ = sum(1 for path in remote if path in local and local[path] != remote[path])
+        extra_files = len(set(local) - set(remote))
+        return False, f"{missing} missing, {differ} differ, {extra_files} extra"
+
+    phase("full", "full", matches_remote)
+    time.sleep(1.1)  # Changes must get a later mtime (MDTM has one second resolution)
+    expected = {path.replace(os.sep, "/") for path in mutate_tree(site, args.seed)}
+
+    def exact_changes(backup):
+        got = downloaded_files(out_dir, backup.current_backup_id)
+        if got == expected:
+            return True, f"{len(got)} changed files"
+        return False, f"{len(expected - got)} changes missed, {len(got - expected)} unchanged files downloaded"
+
+    phase("incremental", "incremental", exact_changes)
+    if args.synthetic:
+        time.sleep(1.1)
+        phase("synthetic", "full", matches_remote, synthetic=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backup backends against a local FTP server.")
+    parser.add_argument("--shape", default="small", help=f"Comma separated tree shapes: {', '.join(SHAPES)}")
+    parser.add_argument("--scale", type=int, default=1, help="Multiplies file counts (huge: file sizes)")
+    parser.add_argument("--backends", default="ftplib,asyncio:4", help="Comma separated: ftplib, asyncio:N, local")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="Simulated round trip time")
+    parser.add_argument("--fail-rate", type=float, default=0, help="Share of RETRs answered with a 451")
+    parser.add_argument("--drop-rate", type=float, default=0, help="Chance per command of dropping the connection")
+    parser.add_argument("--attempts", type=int, default=5, help="Runs per backup, resuming after a failure")
+    parser.add_argument("--synthetic", action="store_true", help="Also build and verify a synthetic full")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Append the results as a JSON line to this file")
+    args = parser.parse_args()
+
+    work = tempfile.mkdtemp(prefix="ftp_harness_")
+    all_results = []
+    try:
+        server_root = os.path.join(work, "remote")
+        os.makedirs(server_root)
+        injector = FailureInjector(args.fail_rate, args.drop_rate, args.seed)
+        server, server_port = start_ftp_server(server_root, injector)
+        proxy = LatencyProxy(server_port, args.rtt_ms / 1000)
+        proxy.start()
+        for shape in args.shape.split(","):
+            pristine = os.path.join(work, f"pristine_{shape}")
+            files, size = make_tree(pristine, shape, args.scale, args.seed)
+            print(f"\n{shape}: {files} files, {size / 1024 / 1024:.1f} MB, RTT {args.rtt_ms:.0f} ms")
+            for backend in args.backends.split(","):
+                all_results += run_scenario(shape, backend, args, work, pristine, server_root, proxy)
+        server.close_all()
+        if injector.failed or injector.dropped:
+            print(f"\nInjected {injector.failed} RETR failures and {injector.dropped} dropped connections")
+
+        if args.output:
+            with open(args.output, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"timestamp": datetime.now().isoformat(), "rtt_ms": args.rtt_ms,
+                                    "scale": args.scale, "fail_rate": args.fail_rate, "drop_rate": args.drop_rate,
+                                    "seed": args.seed, "results": all_results}) + "\n")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    failed = [r for r in all_results if not r["ok"]]
+    if failed:
+        print(f"\n{len(failed)} check(s) failed")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""Dry-run planning for BackupEngine: what a backup would transfer, and how long it would take.
+
+    python hostinger_bakup.py --host ftp.example.com --username u123 --plan
+    python hostinger_bakup.py --host ftp.example.com --username u123 --execute-plan plan.jsonl
+
+Planning runs the listing phase only. Directory listings are cached in the
+listing_cache table of the history DB, and a listing younger than
+--cache-minutes is reused instead of asking the server again. The result is
+the exact file set (after filters) of a full and of an incremental run, their
+sizes, and an ETA fitted from the duration, file count and size of earlier
+successful runs of the same site.
+
+The plan is saved as JSON lines: a header with the totals, then one line per
+file. --execute-plan downloads exactly those files without listing again.
+"""
+import json
+import os
+import re
+import shutil
+from collections import deque
+from datetime import datetime, timedelta
+
+PLAN_VERSION = 1
+CACHE_MINUTES = 60
+HISTORY_RUNS = 10
+
+
+class ListingCache:
+    """Resolved directory listings [(name, 'dir' | 'file', size, mtime)] per host and remote path."""
+
+    def __init__(self, conn, host, max_age):
+        self.conn = conn
+        self.host = host
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.oldest = None  # Listing time of the oldest cached listing used
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS listing_cache (
+                host TEXT NOT NULL,
+                remote_path TEXT NOT NULL,
+                listed_at TEXT NOT NULL,
+                entries TEXT NOT NULL,
+                PRIMARY KEY (host, remote_path)
+            )
+        ''')
+
+    def get(self, remote_path):
+        row = self.conn.execute('''
+            SELECT listed_at, entries FROM listing_cache WHERE host = ? AND remote_path = ?
+        ''', (self.host, remote_path)).fetchone()
+        listed_at = datetime.fromisoformat(row[0]) if row else None
+        if listed_at is None or datetime.now() - listed_at > self.max_age:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.oldest = min(self.oldest or listed_at, listed_at)
+        return [(name, kind, size, datetime.fromisoformat(mtime) if mtime else None)
+                for name, kind, size, mtime in json.loads(row[1])]
+
+    def put(self, remote_path, entries):
+        self.conn.execute('''
+            INSERT OR REPLACE INTO listing_cache (host, remote_path, listed_at, entries) VALUES (?, ?, ?, ?)
+        ''', (self.host, remote_path, datetime.now().isoformat(),
+              json.dumps([(name, kind, size, mtime.isoformat() if mtime else None)
+                          for name, kind, size, mtime in entries])))
+        self.conn.commit()
+
+
+def fetch_listing(backup, remote_path):
+    """List remote_path through the backup's transport with every type, size and mtime resolved."""
+    transport = backup.transport
+    if not transport.connected:
+        transport.connect()  # Only now: a plan made from cached listings needs no connection
+    entries = []
+    for name, kind, size, mtime in transport.list_directory(remote_path):
+        remote_item = backup._normalize_ftp_path(remote_path + '/' + name)
+        if kind is None:
+            kind = transport.probe_type(remote_item, remote_path)
+        if kind == 'file':
+            if size is None:
+                size = transport.size(remote_item)
+            if mtime is None:
+                mtime = transport.mtime(remote_item)
+        if kind in ('dir', 'file'):
+            entries.append((name, kind, size, mtime))
+    return entries
+
+
+def list_tree(backup, cache):
+    """Yield (relative path, size, mtime) for every file below backup.remote_dir that passes the filters."""
+    queue = deque([backup.remote_dir])
+    while queue:
+        remote_path = queue.popleft()
+        entries = cache.get(remote_path)
+        if entries is None:
+            print(f"Listing remote directory: {remote_path}")
+            entries = fetch_listing(backup, remote_path)
+            cache.put(remote_path, entries)
+        for name, kind, size, mtime in entries:
+            remote_item = backup._normalize_ftp_path(remote_path + '/' + name)
+            relative = backup._relative_path(remote_item)
+            if kind == 'dir':
+                if not (backup.filter and backup.filter.check_dir(relative)):
+                    queue.append(remote_item)
+            elif not (backup.filter and backup.filter.check_file(relative, size, mtime)):
+                yield relative, size or 0, mtime
+
+
+def choose_backup_type(backup, now):
+    """(backup type, incremental baseline) that run_backup would pick right now."""
+    last_full, last_incremental = backup._get_last_backup_times()
+    backup_type = backup.backup_type
+    if backup_type == 'auto':
+        backup_type = 'full' if last_full is None or now - last_full > backup.full_interval else 'incremental'
+    if backup_type == 'incremental' and last_incremental is None:
+        backup_type = 'full'
+    return backup_type, last_incremental
+
+
+def run_history(conn, host, remote_dir, limit=HISTORY_RUNS):
+    """[(seconds, files, bytes)] of the latest successful runs of the site, or of any site if it has none.
+
+    Synthetic fulls are left out: their time is mostly local linking, not transfer.
+    """
+    query = '''
+        SELECT start_time, end_time, files_backed_up, total_size_mb FROM backups
+        WHERE status = 'success' AND end_time IS NOT NULL AND synthetic_from IS NULL {}
+        ORDER BY id DESC LIMIT ?
+    '''
+    rows = conn.execute(query.format("AND host = ? AND remote_directory = ?"), (host, remote_dir, limit)).fetchall()
+    if not rows:
+        rows = conn.execute(query.format(""), (limit,)).fetchall()
+    history = []
+    for start, end, files, size_mb in rows:
+        seconds = (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+        if seconds > 0:
+            history.append((seconds, files or 0, (size_mb or 0) * 1024 * 1024))
+    return history
+
+
+def estimate_seconds(history, files, nbytes):
+    """Fit seconds = per_file * files + nbytes / rate to past runs (least squares); None without history.
+
+    Falls back to the overall byte (or file) rate when the runs can't separate
+    the two costs, e.g. a single run or runs with the same average file size.
+    """
+    if not history:
+        return None
+    ff = sum(f * f for _, f, _ in history)
+    fb = sum(f * b for _, f, b in history)
+    bb = sum(b * b for _, _, b in history)
+    fs = sum(f * s for s, f, _ in history)
+    bs = sum(b * s for s, _, b in history)
+    det = ff * bb - fb * fb
+    if det > 1e-9 * ff * bb:
+        per_file = (fs * bb - bs * fb) / det
+        per_byte = (bs * ff - fs * fb) / det
+        if per_file >= 0 and per_byte >= 0:
+            return per_file * files + per_byte * nbytes
+    seconds = sum(s for s, _, _ in history)
+    total_bytes = sum(b for _, _, b in history)
+    total_files = sum(f for _, f, _ in history)
+    if total_bytes:
+        return seconds / total_bytes * nbytes
+    return seconds / total_files * files if total_files else None
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "ETA unknown (no finished backups recorded)"
+    return f"ETA {timedelta(seconds=round(seconds))}"
+
+
+def default_plan_path(backup, now):
+    # Hosts can be URLs or paths (file://..., LocalTransport), which must not leak separators into the name
+    host = re.sub(r'[^\w.-]', '_', backup.host)
+    return os.path.join(backup.local_dir, f"plan_{host}_{now.strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+
+def make_plan(backup, plan_path=None, cache_minutes=CACHE_MINUTES):
+    """List the site (through the cache) and write a plan file. Returns the plan header."""
+    listed_at = datetime.now()
+    plan_path = plan_path or default_plan_path(backup, listed_at)
+    backup_type, baseline = choose_backup_type(backup, listed_at)
+    cache = ListingCache(backup.conn, backup.host, timedelta(minutes=cache_minutes))
+    history = run_history(backup.conn, backup.host, backup.remote_dir)
+    utc_baseline = backup._utc_baseline(baseline) if baseline else None
+    totals = {'full': {'files': 0, 'bytes': 0}, 'incremental': {'files': 0, 'bytes': 0}}
+
+    # File lines go to a side file first: the header with the totals comes first in the plan
+    os.makedirs(os.path.dirname(os.path.abspath(plan_path)), exist_ok=True)
+    body_path = plan_path + '.tmp'
+    try:
+        with open(body_path, 'w', encoding='utf-8') as body:
+            for relative, size, mtime in list_tree(backup, cache):
+                # Same rule as _should_download: unknown mtimes are always fetched
+                changed = baseline is not None and (mtime is None or mtime > utc_baseline)
+                totals['full']['files'] += 1
+                totals['full']['bytes'] += size
+                if changed:
+                    totals['incremental']['files'] += 1
+                    totals['incremental']['bytes'] += size
+                body.write(json.dumps({'path': relative, 'size': size,
+                                       'mtime': mtime.isoformat() if mtime else None, 'inc': changed}) + '\n')
+    finally:
+        backup.transport.close()
+
+    for kind in totals:
+        totals[kind]['seconds'] = estimate_seconds(history, totals[kind]['files'], totals[kind]['bytes'])
+    header = {
+        'plan': PLAN_VERSION,
+        'host': backup.host,
+        'remote_dir': backup.remote_dir,
+        # Changes after the oldest listing used must still be seen by the next incremental
+        'listed_at': min(listed_at, cache.oldest or listed_at).isoformat(),
+        'backup_type': backup_type,
+        'baseline': baseline.isoformat() if baseline else None,
+        'directories': cache.hits + cache.misses,
+        'full': totals['full'],
+        'incremental': totals['incremental'] if baseline else None,
+    }
+    with open(plan_path, 'w', encoding='utf-8') as f, open(body_path, 'r', encoding='utf-8') as body:
+        f.write(json.dumps(header) + '\n')
+        shutil.copyfileobj(body, f)
+    os.remove(body_path)
+
+    print("\n" + "=" * 50)
+    print(f"Plan for {backup.host}:{backup.remote_dir}")
+    print(f"Directories: {header['directories']} ({cache.hits} from cached listings)")
+    print(f"Next run: {backup_type.upper()}" +
+          (f" (changes since {baseline:%Y-%m-%d %H:%M})" if backup_type == 'incremental' else ""))
+    for kind in ('full', 'incremental'):
+        if header[kind] is None:
+            print(f"{kind.capitalize()}: no baseline yet, the first backup is always full")
+            continue
+        entry = header[kind]
+        print(f"{kind.capitalize()}: {entry['files']} files, {entry['bytes'] / 1024 / 1024:.2f} MB, "
+              f"{format_eta(entry['seconds'])}")
+    if backup.filter and backup.filter.stats:
+        print("Skipped by filters (MB where the size was known):")
+        print(backup.filter.report())
+    print("=" * 50)
+    print(f"Plan saved to {plan_path}; run it with --execute-plan {plan_path}")
+    return header
+
+
+def read_plan_header(plan_path):
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+    if header.get('plan') != PLAN_VERSION:
+        raise ValueError(f"{plan_path} is not a backup plan (version {PLAN_VERSION})")
+    return header
+
+
+def planned_files(plan_path, incremental):
+    """Yield (relative path, size, mtime) of the files a full or incremental run of the plan downloads."""
+    with open(plan_path, 'r', encoding='utf-8') as f:
+        f.readline()  # Header
+        for line in f:
+            entry = json.loads(line)
+            if entry['inc'] or not incremental:
+                yield (entry['path'], entry['size'],
+                       datetime.fromisoformat(entry['mtime']) if entry['mtime'] else None)
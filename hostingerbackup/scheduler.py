@@ -0,0 +1,274 @@
+"""Run backups for many sites from one config file, under shared limits.
+
+    python scheduler.py sites.json
+    python scheduler.py sites.json --dry-run
+
+The config is JSON (see sites.example.json). Global settings cap the total
+number of FTP connections, the connections per host and the total download
+bandwidth. Sites whose weekly full backup is overdue (according to the backups
+table in the history DB) go first, the rest follow oldest backup first. Every
+job records itself in the backups table as usual, and each scheduler run adds
+a row to schedule_runs. With a "retention" policy (globally or per site, see
+snapshots.py) each successful backup is followed by pruning of that site.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+import snapshots
+from filters import PathFilter
+from hostinger_bakup import HostingerBackup
+
+DEFAULTS = {
+    "db_path": "backup_history.db",
+    "max_connections": 8,
+    "per_host_connections": 2,
+    "max_bandwidth_kbps": 0,  # 0 means unlimited
+    "full_interval_days": 7,
+    "retention": None,  # e.g. {"daily": 7, "weekly": 4, "monthly": 6}
+    "synthetic_full": False,  # Build weekly fulls locally from the previous backups
+}
+
+
+class TokenBucket:
+    """Thread-safe byte budget shared by every transfer.
+
+    reserve(n) books n bytes and returns how long the caller should wait before
+    using them, so both the blocking and the asyncio backends can share it.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.capacity = float(burst or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, nbytes):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= nbytes
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class Site:
+    def __init__(self, config, settings):
+        self.name = config.get("name") or f"{config['host']}:{config.get('remote_dir', '/')}"
+        self.host = config["host"]
+        self.port = config.get("port", 21)
+        self.username = config["username"]
+        self.password_env = config.get("password_env")
+        self.password = config.get("password")
+        self.remote_dir = config.get("remote_dir", "/")
+        self.local_dir = os.path.expanduser(config.get("local_dir", "."))
+        self.backend = config.get("backend", "ftplib")
+        self.type = config.get("type", "auto")
+        self.synthetic_full = config.get("synthetic_full", settings["synthetic_full"])
+        self.retention = config.get("retention", settings["retention"])
+        self.filter_options = (config.get("exclude", []), config.get("exclude_from"),
+                               config.get("default_excludes", False), config.get("max_size_mb"),
+                               config.get("max_age_days"))
+        wanted = config.get("connections", 1) if self.backend == "asyncio" else 1
+        # A job can never hold more connections than the limits allow, or it would never start
+        self.connections = max(1, min(wanted, settings["max_connections"], settings["per_host_connections"]))
+        self.priority = None
+        self.reason = ""
+
+    def get_password(self):
+        if self.password_env:
+            password = os.environ.get(self.password_env)
+            if password is None:
+                raise ValueError(f"Environment variable {self.password_env} is not set")
+            return password
+        if self.password is None:
+            raise ValueError("No password or password_env configured")
+        return self.password
+
+
+def load_config(path):
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    settings = dict(DEFAULTS, **{key: value for key, value in config.items() if key != "sites"})
+    sites = [Site(site, settings) for site in config.get("sites", [])]
+    return settings, sites
+
+
+def last_backup_times(db_path, site):
+    """(last successful full, last successful full-or-incremental) for a site, as datetimes or None."""
+    if not os.path.exists(db_path):
+        return None, None
+    remote_dir = HostingerBackup._normalize_ftp_path(site.remote_dir)
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(backups)")]
+        host_filter = "AND (host = ? OR host IS NULL)" if "host" in columns else ""
+        params = (remote_dir, site.host) if host_filter else (remote_dir,)
+        row = conn.execute(f'''
+            SELECT MAX(CASE WHEN backup_type = 'full' THEN start_time END), MAX(start_time)
+            FROM backups
+            WHERE status = 'success' AND remote_directory = ? {host_filter}
+        ''', params).fetchone()
+    except sqlite3.Error:
+        return None, None
+    finally:
+        conn.close()
+    return tuple(datetime.fromisoformat(value) if value else None for value in row)
+
+
+def prioritize(sites, db_path, full_interval, now=None):
+    """Sort sites in place: due full backups first (oldest full first), then the longest since any backup."""
+    now = now or datetime.now()
+    for site in sites:
+        last_full, last_any = last_backup_times(db_path, site)
+        if site.type == "full" or (site.type == "auto" and (last_full is None or now - last_full > full_interval)):
+            site.priority = (0, last_full or datetime.min)
+            if site.type == "full":
+                site.reason = "full, requested"
+            elif last_full is None:
+                site.reason = "full, never backed up"
+            else:
+                site.reason = f"full, overdue by {now - last_full - full_interval}"
+        else:
+            site.priority = (1, last_any or datetime.min)
+            site.reason = "incremental" + (f", last backup {last_any:%Y-%m-%d %H:%M}" if last_any else "")
+    sites.sort(key=lambda site: site.priority)
+    return sites
+
+
+class Limits:
+    def __init__(self, max_connections, per_host_connections):
+        self.free = max_connections
+        self.per_host = per_host_connections
+        self.in_use = {}
+
+    def fits_globally(self, site):
+        return site.connections <= self.free
+
+    def fits_host(self, site):
+        return self.in_use.get(site.host, 0) + site.connections <= self.per_host
+
+    def take(self, site):
+        self.free -= site.connections
+        self.in_use[site.host] = self.in_use.get(site.host, 0) + site.connections
+
+    def release(self, site):
+        self.free += site.connections
+        self.in_use[site.host] -= site.connections
+
+
+def run_site(site, settings, throttle):
+    backup_class, extra = HostingerBackup, {}
+    if site.backend == "asyncio":
+        from async_ftp import AsyncFTPBackup
+        backup_class, extra = AsyncFTPBackup, {"connections": site.connections}
+
+    backup = backup_class(host=site.host, username=site.username, password=site.get_password(),
+                          remote_dir=site.remote_dir, local_dir=site.local_dir, port=site.port,
+                          db_path=settings["db_path"], **extra)
+    backup.backup_type = "full" if site.priority[0] == 0 else site.type
+    backup.full_interval = timedelta(days=settings["full_interval_days"])
+    backup.synthetic_full = site.synthetic_full
+    backup.throttle = throttle
+    backup.filter = PathFilter.from_options(*site.filter_options)
+    status = backup.run_backup()
+    if status == "success" and site.retention:
+        snapshots.apply_policy(settings["db_path"], host=site.host, remote_dir=backup.remote_dir, **site.retention)
+    return status
+
+
+def record_schedule_run(db_path, started, results):
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schedule_runs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                start_time TEXT NOT NULL,
+                end_time TEXT NOT NULL,
+                sites INTEGER NOT NULL,
+                succeeded INTEGER NOT NULL,
+                failed INTEGER NOT NULL,
+                details TEXT
+            )
+        ''')
+        succeeded = sum(1 for status in results.values() if status == "success")
+        conn.execute('''
+            INSERT INTO schedule_runs (start_time, end_time, sites, succeeded, failed, details)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (started.isoformat(), datetime.now().isoformat(), len(results), succeeded,
+              len(results) - succeeded, json.dumps(results)))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_schedule(settings, sites):
+    """Run every site, starting jobs in priority order as connections free up. Returns {name: status}."""
+    started = datetime.now()
+    limits = Limits(settings["max_connections"], settings["per_host_connections"])
+    rate = settings["max_bandwidth_kbps"] * 1024
+    throttle = TokenBucket(rate) if rate > 0 else None
+    pending = list(sites)
+    running = {}
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, settings["max_connections"])) as pool:
+        while pending or running:
+            for site in list(pending):
+                if not limits.fits_globally(site):
+                    # Don't let smaller, lower priority jobs starve this one
+                    break
+                if limits.fits_host(site):
+                    limits.take(site)
+                    pending.remove(site)
+                    print(f"[scheduler] Starting {site.name} ({site.reason})")
+                    running[pool.submit(run_site, site, settings, throttle)] = site
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                site = running.pop(future)
+                limits.release(site)
+                try:
+                    results[site.name] = future.result()
+                except Exception as e:
+                    print(f"[scheduler] {site.name} failed: {e}")
+                    results[site.name] = "failed"
+                print(f"[scheduler] Finished {site.name}: {results[site.name]}")
+
+    record_schedule_run(settings["db_path"], started, results)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Back up many FTP sites under shared connection/bandwidth limits.")
+    parser.add_argument("config", help="JSON config with global limits and a list of sites")
+    parser.add_argument("--only", action="append", help="Only run the named site (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="Show the order and reasons without running")
+    args = parser.parse_args()
+
+    settings, sites = load_config(args.config)
+    if args.only:
+        sites = [site for site in sites if site.name in args.only]
+    prioritize(sites, settings["db_path"], timedelta(days=settings["full_interval_days"]))
+
+    if args.dry_run:
+        for position, site in enumerate(sites, 1):
+            print(f"{position:>3}. {site.name:<30} {site.connections} conn  {site.reason}")
+        return
+
+    results = run_schedule(settings, sites)
+    failed = [name for name, status in results.items() if status != "success"]
+    print(f"\n[scheduler] {len(results) - len(failed)}/{len(results)} site(s) backed up successfully")
+    if failed:
+        print(f"[scheduler] Failed: {', '.join(failed)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
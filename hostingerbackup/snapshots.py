@@ -0,0 +1,240 @@
+"""Grandfather-father-son retention for the backup directories recorded in backup_history.db.
+
+    python snapshots.py --daily 7 --weekly 4 --monthly 12 --dry-run
+    python snapshots.py --host ftp.example.com --daily 14 --weekly 8
+
+For every site (host + remote directory) the newest successful backup is
+always kept, plus the newest backup of each of the last N days, M ISO weeks and
+K months that have one. Everything else is pruned: its directory is deleted and
+its row is marked 'pruned', so the history and telemetry stay in the DB.
+Failed backups older than the site's latest success (and so never resumed) are
+pruned too.
+
+An incremental backup only holds the files that changed since the previous
+one. Before a backup it depends on is pruned, a kept incremental is folded:
+the files it lacks are hardlinked in from the older backups of its chain (or
+copied where hardlinks aren't possible), which turns it into a complete
+snapshot of that day without downloading anything. Folded rows get a
+folded_time and serve as the base of later incrementals from then on.
+Incrementals don't record deletions, so files removed from the server
+between the backups of a chain stay in the folded snapshot.
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+from datetime import datetime
+
+
+class Snapshot:
+    def __init__(self, row):
+        self.id, self.backup_type, start_time, self.local_dir, self.status, self.folded_time = row
+        self.start = datetime.fromisoformat(start_time)
+        self.reasons = []
+
+    @property
+    def self_contained(self):
+        """A full backup, or an incremental that was folded into one."""
+        return self.backup_type == 'full' or self.folded_time is not None
+
+    def __repr__(self):
+        return f"{self.start:%Y-%m-%d %H:%M} {self.backup_type:<11} #{self.id}"
+
+
+def ensure_schema(conn):
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(backups)")]
+    if 'folded_time' not in columns:
+        try:
+            conn.execute("ALTER TABLE backups ADD COLUMN folded_time TEXT")
+        except sqlite3.OperationalError:
+            pass  # Added meanwhile by another process sharing the DB
+    conn.commit()
+
+
+def load_sites(conn, host=None, remote_dir=None):
+    rows = conn.execute("SELECT DISTINCT host, remote_directory FROM backups ORDER BY host, remote_directory")
+    return [(h, d) for h, d in rows if (host is None or h == host) and (remote_dir is None or d == remote_dir)]
+
+
+def load_snapshots(conn, host, remote_dir):
+    """Successful backups of a site oldest first, and failed ones that no later run will resume."""
+    rows = conn.execute('''
+        SELECT id, backup_type, start_time, local_directory, status, folded_time FROM backups
+        WHERE host IS ? AND remote_directory = ? AND status IN ('success', 'failed')
+        ORDER BY start_time, id
+    ''', (host, remote_dir)).fetchall()
+    snapshots = [Snapshot(row) for row in rows]
+    successful = [s for s in snapshots if s.status == 'success']
+    latest = successful[-1].id if successful else None
+    # Failed runs after the latest success may still be resumed (see BackupEngine._resume_interrupted)
+    stale = [s for s in snapshots if s.status == 'failed' and latest is not None and s.id < latest]
+    return successful, stale
+
+
+def select_kept(snapshots, daily=0, weekly=0, monthly=0):
+    """Mark the snapshots a GFS policy keeps (s.reasons) and return their ids. snapshots: oldest first."""
+    rules = [
+        ('daily', daily, lambda s: s.start.date()),
+        ('weekly', weekly, lambda s: s.start.isocalendar()[:2]),
+        ('monthly', monthly, lambda s: (s.start.year, s.start.month)),
+    ]
+    kept = set()
+    for name, count, bucket in rules:
+        last_bucket = None
+        for snapshot in reversed(snapshots):
+            if count <= 0:
+                break
+            key = bucket(snapshot)
+            if key != last_bucket:
+                last_bucket = key
+                snapshot.reasons.append(name)
+                kept.add(snapshot.id)
+                count -= 1
+    if snapshots:
+        snapshots[-1].reasons.insert(0, 'latest')
+        kept.add(snapshots[-1].id)
+    return kept
+
+
+def plan_folds(snapshots, kept):
+    """[(incremental, sources newest first)] that must be folded before the backups not in kept go away."""
+    folds = []
+    self_contained = {s.id for s in snapshots if s.self_contained}
+    for index, snapshot in enumerate(snapshots):
+        if snapshot.id not in kept or snapshot.id in self_contained:
+            continue
+        sources = []
+        for earlier in reversed(snapshots[:index]):
+            sources.append(earlier)
+            if earlier.id in self_contained:
+                break
+        if any(source.id not in kept for source in sources):
+            folds.append((snapshot, sources))
+            self_contained.add(snapshot.id)  # Later incrementals can build on it
+    return folds
+
+
+def link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy2(source, target)  # Other file system, or no hardlinks there
+
+
+def fill_missing(target, source):
+    """Hardlink every file of source that target lacks into target. Returns the number of files added."""
+    added = 0
+    for directory, _, names in os.walk(source):
+        relative = os.path.relpath(directory, source)
+        target_dir = os.path.normpath(os.path.join(target, relative))
+        for name in names:
+            target_file = os.path.join(target_dir, name)
+            if not os.path.lexists(target_file):
+                os.makedirs(target_dir, exist_ok=True)
+                link_or_copy(os.path.join(directory, name), target_file)
+                added += 1
+    return added
+
+
+def unshared_size(path):
+    """Bytes that deleting path frees: files that have no other hardlink."""
+    total = 0
+    for directory, _, names in os.walk(path):
+        for name in names:
+            stat = os.lstat(os.path.join(directory, name))
+            if stat.st_nlink == 1:
+                total += stat.st_size
+    return total
+
+
+def apply_retention(conn, host, remote_dir, daily=0, weekly=0, monthly=0, dry_run=False):
+    """Fold and prune one site. Returns (pruned count, bytes freed)."""
+    snapshots, stale = load_snapshots(conn, host, remote_dir)
+    kept = select_kept(snapshots, daily, weekly, monthly)
+    folds = plan_folds(snapshots, kept)
+    pruned = [s for s in snapshots if s.id not in kept] + stale
+
+    print(f"\n{host or '(any host)'}:{remote_dir}")
+    for snapshot in snapshots:
+        if snapshot.id in kept:
+            print(f"  keep   {snapshot}  ({', '.join(snapshot.reasons)})")
+    for snapshot, sources in folds:
+        print(f"  fold   {snapshot}  <- {', '.join(f'#{s.id}' for s in sources)}")
+    for snapshot in pruned:
+        print(f"  prune  {snapshot}" + ("  (failed)" if snapshot.status == 'failed' else ""))
+
+    if dry_run:
+        return len(pruned), 0
+
+    protected = set()
+    for snapshot, sources in folds:
+        if not os.path.isdir(snapshot.local_dir):
+            print(f"  Cannot fold #{snapshot.id}: {snapshot.local_dir} is missing, keeping its chain")
+            protected.update(source.id for source in sources)
+            continue
+        added = sum(fill_missing(snapshot.local_dir, source.local_dir)
+                    for source in sources if os.path.isdir(source.local_dir))
+        conn.execute("UPDATE backups SET folded_time = ? WHERE id = ?", (datetime.now().isoformat(), snapshot.id))
+        conn.commit()
+        print(f"  Folded #{snapshot.id}: {added} files linked in")
+
+    freed = 0
+    pruned = [snapshot for snapshot in pruned if snapshot.id not in protected]
+    for snapshot in pruned:
+        if os.path.isdir(snapshot.local_dir):
+            freed += unshared_size(snapshot.local_dir)
+            shutil.rmtree(snapshot.local_dir)
+        # The row stays for the history; its walk state is of no further use
+        conn.execute("UPDATE backups SET status = 'pruned' WHERE id = ?", (snapshot.id,))
+        conn.execute("DELETE FROM walk_frontier WHERE backup_id = ?", (snapshot.id,))
+        conn.commit()
+    return len(pruned), freed
+
+
+def apply_policy(db_path, daily=0, weekly=0, monthly=0, host=None, remote_dir=None, dry_run=False):
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        ensure_schema(conn)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS walk_frontier (
+                backup_id INTEGER NOT NULL,
+                remote_path TEXT NOT NULL,
+                local_path TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (backup_id, remote_path)
+            )
+        ''')
+        total_pruned = total_freed = 0
+        for site_host, site_dir in load_sites(conn, host, remote_dir):
+            pruned, freed = apply_retention(conn, site_host, site_dir, daily, weekly, monthly, dry_run)
+            total_pruned += pruned
+            total_freed += freed
+        return total_pruned, total_freed
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prune backup directories with a grandfather-father-son policy.")
+    parser.add_argument("--db-file", default="backup_history.db", help="Backup history database")
+    parser.add_argument("--daily", type=int, default=7, help="Keep the newest backup of this many days")
+    parser.add_argument("--weekly", type=int, default=4, help="Keep the newest backup of this many weeks")
+    parser.add_argument("--monthly", type=int, default=6, help="Keep the newest backup of this many months")
+    parser.add_argument("--host", help="Only this FTP host")
+    parser.add_argument("--remote-dir", help="Only this remote directory (as stored, e.g. /public_html)")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be kept, folded and pruned")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db_file):
+        print(f"Database not found: {args.db_file}")
+        raise SystemExit(1)
+    pruned, freed = apply_policy(args.db_file, args.daily, args.weekly, args.monthly, args.host, args.remote_dir,
+                                 args.dry_run)
+    if args.dry_run:
+        print(f"\n{pruned} backup(s) would be pruned")
+    else:
+        print(f"\n{pruned} backup(s) pruned, {freed / 1024 / 1024:.2f} MB freed")
+
+
+if __name__ == "__main__":
+    main()
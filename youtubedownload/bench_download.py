@@ -0,0 +1,246 @@
+"""Throughput benchmark for the yt-dlp download profiles.
+
+Serves a synthetic HLS stream and a plain progressive file from a local HTTP
+server that adds per request latency and a per connection bandwidth cap, then
+downloads both with every profile in download_profiles.PROFILES.
+
+The resume run downloads the progressive file with retries off while the
+server drops the connection halfway through, then downloads it again. The
+second run should pick up the .part file where the first one stopped; its
+row shows the MB fetched again and the offset it resumed from.
+
+    python bench_download.py --segments 60 --segment-kb 512 --latency 0.05
+"""
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import yt_dlp
+from yt_dlp.utils import DownloadError
+
+from download_profiles import PROFILES, build_ydl_opts
+
+
+def make_payload(size):
+    """Built once per server; segments and ranges are zero-copy slices of it."""
+    block = bytes(i % 251 for i in range(4096))
+    return memoryview(block * (size // len(block) + 1))[:size]
+
+
+class SyntheticStreamHandler(BaseHTTPRequestHandler):
+    # Set on the class by make_server()
+    segments = 0
+    segment_size = 0
+    file_size = 0
+    latency = 0.0
+    rate = 0  # Bytes per second per connection, 0 means unlimited
+    payload = memoryview(b"")
+    # /resume.mp4: byte offset at which the next response is cut off (None = serve normally)
+    interrupt_at = None
+    stats = None  # {"bytes": ..., "range_starts": [...]} of the /resume.mp4 responses sent in full
+    stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _segment(self, index):
+        # Different bytes per segment without building a new buffer
+        offset = index % 251
+        return self.payload[offset:offset + self.segment_size]
+
+    def _send_body(self, data):
+        """Send data; returns the number of bytes written before the client went away."""
+        chunk = 64 * 1024
+        sent = 0
+        try:
+            for offset in range(0, len(data), chunk):
+                piece = data[offset:offset + chunk]
+                self.wfile.write(piece)
+                sent += len(piece)
+                if self.rate:
+                    time.sleep(chunk / self.rate)
+        except (BrokenPipeError, ConnectionResetError):
+            # yt-dlp probes the URL and drops the connection once it has the headers
+            pass
+        return sent
+
+    def _send_file(self, resumable):
+        start, end = 0, self.file_size - 1
+        range_header = self.headers.get("Range")
+        if range_header:
+            match = re.fullmatch(r"bytes=(\d+)-(\d*)", range_header.strip())
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), end)
+        body = self.payload[start:end + 1]
+        self.send_response(206 if range_header else 200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(len(body)))
+        if range_header:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{self.file_size}")
+        self.end_headers()
+        if not resumable:
+            self._send_body(body)
+            return
+
+        cut = self.interrupt_at
+        if cut is not None and start <= cut <= end:
+            # Promise the whole range, send part of it and hang up, like a dropped connection
+            if self._send_body(body[:cut - start]) == cut - start:
+                type(self).interrupt_at = None
+            self.close_connection = True
+            return
+        # yt-dlp's probe of the URL hangs up after the headers; only count what the download itself read
+        if self._send_body(body) == len(body):
+            with self.stats_lock:
+                self.stats["bytes"] += len(body)
+                self.stats["range_starts"].append(start)
+
+    def do_GET(self):
+        time.sleep(self.latency)
+
+        if self.path == "/hls/index.m3u8":
+            lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-TARGETDURATION:4", "#EXT-X-MEDIA-SEQUENCE:0"]
+            for i in range(self.segments):
+                lines += ["#EXTINF:4.0,", f"seg{i}.ts"]
+            lines.append("#EXT-X-ENDLIST")
+            body = ("\n".join(lines) + "\n").encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/vnd.apple.mpegurl")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        match = re.fullmatch(r"/hls/seg(\d+)\.ts", self.path)
+        if match and int(match.group(1)) < self.segments:
+            body = self._segment(int(match.group(1)))
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp2t")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self._send_body(body)
+            return
+
+        if self.path in ("/video.mp4", "/resume.mp4"):
+            self._send_file(resumable=self.path == "/resume.mp4")
+            return
+
+        self.send_error(404)
+
+
+def make_server(segments, segment_size, file_size, latency, rate):
+    handler = type("Handler", (SyntheticStreamHandler,), {
+        "segments": segments,
+        "segment_size": segment_size,
+        "file_size": file_size,
+        "latency": latency,
+        "rate": rate,
+        # Segments start at offsets up to 250, so leave room for that past the end of a segment
+        "payload": make_payload(max(file_size, segment_size + 251)),
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_download(url, profile):
+    output_folder = tempfile.mkdtemp(prefix="bench_download_")
+    try:
+        ydl_opts = build_ydl_opts(output_folder, profile=profile, format="best",
+                                  quiet=True, noprogress=True, cachedir=False)
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([url])
+        elapsed = time.perf_counter() - started
+        size = sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(output_folder) for name in files)
+        return size, elapsed
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+
+def run_resume(url, profile, handler):
+    """Interrupted download followed by a resumed one.
+
+    Returns (bytes fetched by the resumed run, its seconds, offset it resumed
+    from, whether the finished file is intact).
+    """
+    output_folder = tempfile.mkdtemp(prefix="bench_resume_")
+    try:
+        common = dict(format="best", quiet=True, noprogress=True, cachedir=False)
+        handler.interrupt_at = handler.file_size // 2
+        handler.stats = {"bytes": 0, "range_starts": []}
+        try:
+            with yt_dlp.YoutubeDL(build_ydl_opts(output_folder, profile=profile, retries=0, **common)) as ydl:
+                ydl.download([url])
+        except DownloadError:
+            pass  # Expected: the connection was dropped and retries are off
+        handler.interrupt_at = None
+
+        handler.stats = {"bytes": 0, "range_starts": []}
+        started = time.perf_counter()
+        with yt_dlp.YoutubeDL(build_ydl_opts(output_folder, profile=profile, **common)) as ydl:
+            ydl.download([url])
+        elapsed = time.perf_counter() - started
+
+        finished = [os.path.join(root, name) for root, _, files in os.walk(output_folder)
+                    for name in files if not name.endswith(".part")]
+        intact = False
+        if len(finished) == 1:
+            with open(finished[0], "rb") as f:
+                intact = f.read() == handler.payload[:handler.file_size]
+        resumed_from = min(handler.stats["range_starts"], default=0)
+        return handler.stats["bytes"], elapsed, resumed_from, intact
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark yt-dlp download profiles against a local server.")
+    parser.add_argument("--segments", type=int, default=60, help="Number of HLS segments")
+    parser.add_argument("--segment-kb", type=int, default=512, help="Size of each HLS segment in KB")
+    parser.add_argument("--file-mb", type=int, default=64, help="Size of the progressive file in MB")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of latency added to every request")
+    parser.add_argument("--rate-kb", type=int, default=4096, help="Per connection bandwidth cap in KB/s (0 = none)")
+    parser.add_argument("--profile", action="append", choices=sorted(PROFILES),
+                        help="Profile to benchmark (repeatable, default: all)")
+    parser.add_argument("--no-resume", action="store_true", help="Skip the interrupted-then-resumed run")
+    args = parser.parse_args()
+
+    server = make_server(args.segments, args.segment_kb * 1024, args.file_mb * 1024 * 1024,
+                         args.latency, args.rate_kb * 1024)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    streams = {
+        "hls": base_url + "/hls/index.m3u8",
+        "progressive": base_url + "/video.mp4",
+    }
+
+    print(f"{'profile':<14}{'stream':<13}{'MB':>8}{'seconds':>10}{'MB/s':>9}")
+    try:
+        for profile in args.profile or PROFILES:
+            for stream, url in streams.items():
+                size, elapsed = run_download(url, profile)
+                mb = size / 1024 / 1024
+                print(f"{profile:<14}{stream:<13}{mb:>8.1f}{elapsed:>10.2f}{mb / elapsed:>9.1f}")
+            if not args.no_resume:
+                size, elapsed, resumed_from, intact = run_resume(base_url + "/resume.mp4", profile,
+                                                                 server.RequestHandlerClass)
+                mb = size / 1024 / 1024
+                note = f"resumed at {resumed_from / 1024 / 1024:.1f} MB" if resumed_from else "restarted from 0"
+                if not intact:
+                    note += ", FILE CORRUPT"
+                print(f"{profile:<14}{'resume':<13}{mb:>8.1f}{elapsed:>10.2f}{mb / elapsed:>9.1f}  {note}")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Import-time benchmark for download_playlist.py.
+
+Runs `python -X importtime -c "import download_playlist"` in fresh interpreters,
+reports the cumulative import time and the heaviest modules, and fails if a
+heavy dependency is loaded at import time or the time exceeds --max-ms.
+
+    python bench_import.py --runs 5 --output import_times.json --max-ms 150
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from datetime import datetime
+
+# Modules that must only be imported once their stage actually runs
+HEAVY_MODULES = ("yt_dlp", "moviepy", "pytube", "numpy", "imageio")
+
+LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def measure_once(module):
+    here = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=here, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            imports.append({"module": name, "self_us": int(self_us),
+                            "cumulative_us": int(cumulative_us), "depth": len(indent) // 2})
+    target = next(i for i in reversed(imports) if i["module"] == module)
+    return target["cumulative_us"], imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of download_playlist.py.")
+    parser.add_argument("--module", default="download_playlist", help="Module to import")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure (best run is kept)")
+    parser.add_argument("--top", type=int, default=10, help="Heaviest modules to list")
+    parser.add_argument("--max-ms", type=float, default=None, help="Fail if the best run is slower than this")
+    parser.add_argument("--output", help="Append the result as a JSON line to this file")
+    args = parser.parse_args()
+
+    runs = [measure_once(args.module) for _ in range(args.runs)]
+    best_us, imports = min(runs, key=lambda run: run[0])
+
+    print(f"{args.module}: best {best_us / 1000:.1f} ms over {args.runs} run(s)")
+    print(f"\n{'self ms':>9}  module")
+    for entry in sorted(imports, key=lambda i: -i["self_us"])[:args.top]:
+        print(f"{entry['self_us'] / 1000:>9.1f}  {entry['module']}")
+
+    imported = {entry["module"] for entry in imports}
+    heavy = sorted(name for name in imported if name.split(".")[0] in HEAVY_MODULES)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            f.write(json.dumps({
+                "timestamp": datetime.now().isoformat(),
+                "module": args.module,
+                "python": sys.version.split()[0],
+                "best_ms": best_us / 1000,
+                "runs_ms": [run[0] / 1000 for run in runs],
+                "heavy_imports": heavy,
+            }) + "\n")
+
+    failed = False
+    if heavy:
+        print(f"\nHeavy modules imported eagerly: {', '.join(heavy)}")
+        failed = True
+    if args.max_ms is not None and best_us / 1000 > args.max_ms:
+        print(f"\nImport time {best_us / 1000:.1f} ms exceeds the {args.max_ms:.1f} ms budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
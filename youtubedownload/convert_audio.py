@@ -0,0 +1,141 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_FOLDER = 'Audio'
+
+
+def find_mp4s(input_folder):
+    """Every mp4 under input_folder, without descending into the Audio folders we write to."""
+    for root, subdirs, files in os.walk(input_folder):
+        subdirs[:] = [d for d in subdirs if d != AUDIO_FOLDER]
+        for file in sorted(files):
+            yield os.path.join(root, file)
+
+
+def build_jobs(input_folder, files=None):
+    """Collect (mp4_path, mp3_path) pairs that still need converting.
+
+    files limits the jobs to those paths (e.g. what one download produced)
+    instead of everything under input_folder. Audio folders are never walked
+    into, every input and output appears at most once, and files whose mp3 is
+    already newer than the mp4 are skipped.
+    """
+    jobs = []
+    seen_inputs = set()
+    seen_outputs = set()
+    skipped = 0
+
+    for mp4_path in (find_mp4s(input_folder) if files is None else files):
+        if not mp4_path.lower().endswith('.mp4'):
+            continue
+
+        root, file = os.path.split(mp4_path)
+        mp3_path = os.path.join(root, AUDIO_FOLDER, os.path.splitext(file)[0] + '.mp3')
+
+        real_input = os.path.realpath(mp4_path)
+        real_output = os.path.normcase(os.path.realpath(mp3_path))
+        if real_input in seen_inputs or real_output in seen_outputs:
+            continue
+        seen_inputs.add(real_input)
+        seen_outputs.add(real_output)
+
+        try:
+            if os.path.getmtime(mp3_path) >= os.path.getmtime(mp4_path):
+                skipped += 1
+                continue
+        except OSError:
+            pass  # No mp3 yet
+
+        jobs.append((mp4_path, mp3_path))
+
+    return jobs, skipped
+
+
+def preload_moviepy():
+    """Process pool initializer: import moviepy once per worker instead of on its first file."""
+    try:
+        import moviepy.editor  # noqa: F401
+    except ImportError as e:
+        print(f"moviepy not available, audio conversion will fail: {e}")
+
+
+def convert_file(mp4_path, mp3_path):
+    """Extract the audio track of one mp4. Runs inside a worker process."""
+    started = time.perf_counter()
+    # Write next to the target and rename at the end, so an interrupted
+    # conversion never leaves an mp3 that looks newer than its input.
+    # The pid keeps two processes converting the same file from sharing it.
+    partial_path = f"{os.path.splitext(mp3_path)[0]}.{os.getpid()}.partial.mp3"
+    try:
+        # Imported here so only the worker processes load moviepy (and numpy, imageio, ...)
+        from moviepy.editor import VideoFileClip
+
+        os.makedirs(os.path.dirname(mp3_path), exist_ok=True)
+        video_clip = VideoFileClip(mp4_path)
+        try:
+            audio_clip = video_clip.audio
+            audio_clip.write_audiofile(partial_path, logger=None)
+            audio_clip.close()
+        finally:
+            video_clip.close()
+        os.replace(partial_path, mp3_path)
+        return mp4_path, mp3_path, time.perf_counter() - started, None
+    except Exception as e:
+        try:
+            os.remove(partial_path)
+        except OSError:
+            pass  # Failed before anything was written
+        return mp4_path, mp3_path, time.perf_counter() - started, str(e)
+
+
+def convert_mp4_to_mp3(input_folder, workers=None, executor=None, files=None):
+    """Convert every mp4 under input_folder (or only those in files) that has no up-to-date mp3.
+
+    executor is an existing process pool to run the conversions on (it is left
+    running); without one a pool of `workers` processes is created for this call.
+    """
+    print(f"Starting audio conversion to mp3 format.")
+    jobs, skipped = build_jobs(input_folder, files)
+    if skipped:
+        print(f"Skipping {skipped} file(s) that are already converted.")
+    if not jobs:
+        print(f"Audio conversion to mp3 format is complete.")
+        return []
+
+    results = []
+    started = time.perf_counter()
+    own_executor = executor is None
+    if own_executor:
+        workers = min(workers or os.cpu_count() or 1, len(jobs))
+        print(f"Converting {len(jobs)} file(s) using {workers} worker process(es).")
+        executor = ProcessPoolExecutor(max_workers=workers)
+    else:
+        # A shared pool (e.g. the daemon's) may be busy with other jobs too, so its size says little here
+        print(f"Converting {len(jobs)} file(s) on the shared worker pool.")
+    try:
+        futures = [executor.submit(convert_file, mp4_path, mp3_path) for mp4_path, mp3_path in jobs]
+        for done, future in enumerate(as_completed(futures), start=1):
+            mp4_path, mp3_path, seconds, error = future.result()
+            results.append((mp4_path, mp3_path, seconds, error))
+            if error:
+                print(f"[{done}/{len(jobs)}] Failed {mp4_path} after {seconds:.1f}s: {error}")
+            else:
+                print(f"[{done}/{len(jobs)}] Audio conversion done for {mp3_path} ({seconds:.1f}s)")
+    finally:
+        if own_executor:
+            executor.shutdown()
+    wall_time = time.perf_counter() - started
+
+    timings = [seconds for _, _, seconds, error in results if not error]
+    failed = len(results) - len(timings)
+    print("\n" + "=" * 50)
+    print(f"Converted: {len(timings)}  Failed: {failed}  Skipped: {skipped}")
+    print(f"Wall time: {wall_time:.1f}s  Worker time: {sum(timings):.1f}s")
+    if timings:
+        slowest = max((r for r in results if not r[3]), key=lambda r: r[2])
+        print(f"Average per file: {sum(timings) / len(timings):.1f}s  "
+              f"Slowest: {os.path.basename(slowest[0])} ({slowest[2]:.1f}s)")
+    print("=" * 50)
+    print(f"Audio conversion to mp3 format is complete.")
+    return results
@@ -0,0 +1,292 @@
+"""Long-running downloader that keeps yt-dlp and moviepy loaded between batches.
+
+yt-dlp is imported once in the daemon itself. Audio conversion runs on one
+process pool that lives as long as the daemon; its workers import moviepy when
+they start, so only the first conversion pays for that import.
+
+Jobs live in a SQLite queue table (download_queue.db). They can be added
+directly with `--add URL`, or by appending lines to a queue file which the
+daemon tails. Each line of the queue file is one job:
+
+    <url> [audio] [profile=<name>]
+
+`audio` also converts the download to mp3 when it finishes, `profile` picks a
+download tuning profile. Blank lines and lines starting with '#' are ignored.
+Lines are only read once; the daemon remembers how far into the file it got.
+
+Status is served as JSON on http://127.0.0.1:<port>/status and /jobs.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from convert_audio import convert_mp4_to_mp3, preload_moviepy
+from download_playlist import process_url
+from download_profiles import DEFAULT_PROFILE, PROFILES
+
+DB_NAME = "download_queue.db"
+QUEUE_FILE = "urls.txt"
+STATUS_PORT = 5003
+
+# Jobs can share an output folder (every single video lands in downloads/youtube_songs).
+# Each job converts only the files it downloaded itself, and only one job at a time
+# converts into a given folder
+_convert_locks = {}
+_convert_locks_guard = threading.Lock()
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def create_db(db_path):
+    conn = connect(db_path)
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            convert_audio INTEGER NOT NULL DEFAULT 0,
+            profile TEXT NOT NULL DEFAULT 'default',
+            status TEXT NOT NULL DEFAULT 'pending',
+            added_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            output_folder TEXT,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+        CREATE TABLE IF NOT EXISTS queue_files (
+            path TEXT PRIMARY KEY,
+            offset INTEGER NOT NULL
+        );
+    ''')
+    conn.commit()
+    conn.close()
+
+
+def parse_queue_line(line):
+    """Parse one queue file line into (url, convert_audio, profile), or None for blank/comment lines."""
+    parts = line.split()
+    if not parts or parts[0].startswith("#"):
+        return None
+
+    url, convert, profile = parts[0], False, DEFAULT_PROFILE
+    for option in parts[1:]:
+        if option == "audio":
+            convert = True
+        elif option.startswith("profile=") and option[len("profile="):] in PROFILES:
+            profile = option[len("profile="):]
+        else:
+            print(f"Ignoring unknown queue option '{option}' for {url}")
+    return url, convert, profile
+
+
+def add_job(conn, url, convert_audio=False, profile=DEFAULT_PROFILE):
+    with conn:
+        conn.execute("INSERT INTO jobs (url, convert_audio, profile, added_at) VALUES (?, ?, ?, ?)",
+                     (url, int(convert_audio), profile, datetime.now().isoformat()))
+
+
+def ingest_queue_file(conn, queue_file):
+    """Enqueue lines appended to the queue file since the last call. Returns the number of new jobs."""
+    path = os.path.abspath(queue_file)
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return 0
+
+    row = conn.execute("SELECT offset FROM queue_files WHERE path = ?", (path,)).fetchone()
+    offset = row[0] if row else 0
+    if size < offset:
+        offset = 0  # File was truncated or replaced, start over
+    if size == offset:
+        return 0
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    # Only consume complete lines; a line still being written is picked up next time
+    consumed = data.rfind(b"\n") + 1
+    added = 0
+    with conn:
+        for raw_line in data[:consumed].decode("utf-8", errors="replace").splitlines():
+            job = parse_queue_line(raw_line)
+            if job:
+                conn.execute("INSERT INTO jobs (url, convert_audio, profile, added_at) VALUES (?, ?, ?, ?)",
+                             (job[0], int(job[1]), job[2], datetime.now().isoformat()))
+                added += 1
+        conn.execute("INSERT OR REPLACE INTO queue_files (path, offset) VALUES (?, ?)", (path, offset + consumed))
+    return added
+
+
+def claim_job(conn):
+    """Atomically move the oldest pending job to 'running' and return it, or None."""
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute('''
+            SELECT id, url, convert_audio, profile FROM jobs
+            WHERE status = 'pending' ORDER BY id LIMIT 1
+        ''').fetchone()
+        if row:
+            conn.execute("UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?",
+                         (datetime.now().isoformat(), row[0]))
+    return row
+
+
+def finish_job(conn, job_id, output_folder, error=None):
+    with conn:
+        conn.execute('''
+            UPDATE jobs SET status = ?, finished_at = ?, output_folder = ?, error = ?
+            WHERE id = ?
+        ''', ('failed' if error else 'done', datetime.now().isoformat(), output_folder, error, job_id))
+
+
+def convert_lock(folder):
+    key = os.path.normcase(os.path.abspath(folder))
+    with _convert_locks_guard:
+        return _convert_locks.setdefault(key, threading.Lock())
+
+
+def run_job(db_path, job, convert_pool, workers):
+    job_id, url, convert, profile = job
+    conn = connect(db_path)
+    try:
+        print(f"[job {job_id}] Starting {url}")
+        files = []
+        output_folder = process_url(url, profile=profile, files=files)
+        if not output_folder:
+            finish_job(conn, job_id, None, "download failed")
+            return
+        if convert:
+            with convert_lock(output_folder):
+                convert_mp4_to_mp3(output_folder, workers=workers, executor=convert_pool, files=files)
+        finish_job(conn, job_id, output_folder)
+        print(f"[job {job_id}] Done {url}")
+    except Exception as e:
+        finish_job(conn, job_id, None, str(e))
+        print(f"[job {job_id}] Failed {url}: {e}")
+    finally:
+        conn.close()
+
+
+def job_status(db_path, limit=50):
+    conn = connect(db_path)
+    try:
+        counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        columns = ["id", "url", "status", "profile", "added_at", "started_at", "finished_at", "output_folder", "error"]
+        rows = conn.execute(f"SELECT {', '.join(columns)} FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return counts, [dict(zip(columns, row)) for row in rows]
+    finally:
+        conn.close()
+
+
+def start_status_server(db_path, port):
+    started_at = datetime.now().isoformat()
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def do_GET(self):
+            counts, jobs = job_status(db_path)
+            if self.path == "/status":
+                body = {"status": "ok", "started_at": started_at, "counts": counts,
+                        "running": [job for job in jobs if job["status"] == "running"]}
+            elif self.path == "/jobs":
+                body = {"jobs": jobs}
+            else:
+                self.send_error(404)
+                return
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), StatusHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Status endpoint: http://127.0.0.1:{port}/status")
+    return server
+
+
+def preload_modules():
+    """Import the download stack once, so every job's download starts warm."""
+    import yt_dlp  # noqa: F401
+
+
+def run_daemon(db_path, queue_file, concurrency, interval, port, convert_workers=None):
+    preload_modules()
+    convert_workers = convert_workers or os.cpu_count() or 1
+    # Shared by all jobs; with spawn (Windows) a pool per job would re-import moviepy in every worker each time
+    convert_pool = ProcessPoolExecutor(max_workers=convert_workers, initializer=preload_moviepy)
+    create_db(db_path)
+    conn = connect(db_path)
+    # Jobs left 'running' by a crashed daemon go back to the queue
+    with conn:
+        conn.execute("UPDATE jobs SET status = 'pending', started_at = NULL WHERE status = 'running'")
+
+    server = start_status_server(db_path, port)
+    running = set()
+    print(f"Watching {queue_file} with {concurrency} concurrent download(s). Press Ctrl+C to stop.")
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while True:
+                added = ingest_queue_file(conn, queue_file)
+                if added:
+                    print(f"Queued {added} new job(s) from {queue_file}")
+
+                running = {future for future in running if not future.done()}
+                while len(running) < concurrency:
+                    job = claim_job(conn)
+                    if job is None:
+                        break
+                    running.add(executor.submit(run_job, db_path, job, convert_pool, convert_workers))
+
+                time.sleep(interval)
+    finally:
+        server.shutdown()
+        convert_pool.shutdown()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the downloader as a long-lived queue worker.")
+    parser.add_argument("--queue-file", default=QUEUE_FILE, help="Queue file to watch for appended URLs")
+    parser.add_argument("--db", default=DB_NAME, help="SQLite queue database")
+    parser.add_argument("--concurrency", type=int, default=2, help="Jobs downloaded at the same time")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Audio conversion processes shared by all jobs (default: one per CPU core)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between queue polls")
+    parser.add_argument("--port", type=int, default=STATUS_PORT, help="Local port for the status endpoint")
+    parser.add_argument("--add", metavar="URL", help="Add a job to the queue table and exit")
+    parser.add_argument("--audio", action="store_true", help="With --add: also convert the job to mp3")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="With --add: download tuning profile")
+    args = parser.parse_args()
+
+    if args.add:
+        create_db(args.db)
+        conn = connect(args.db)
+        add_job(conn, args.add, args.audio, args.profile)
+        conn.close()
+        print(f"Queued {args.add}")
+        return
+
+    try:
+        run_daemon(args.db, args.queue_file, args.concurrency, args.interval, args.port, args.workers)
+    except KeyboardInterrupt:
+        print("\nDaemon stopped.")
+
+
+if __name__ == "__main__":
+    main()
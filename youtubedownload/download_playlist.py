@@ -1,36 +1,16 @@
-from pytube import Playlist, YouTube
-from moviepy.editor import *
-import re
-
-
-def convert_mp4_to_mp3(input_folder):
-    print(f"Starting audio conversion to mp3 format.")
-    for root, subdirs, files in os.walk(input_folder):
-        audio_folder = os.path.join(root, 'Audio')
-        os.makedirs(audio_folder, exist_ok=True)
-
-        for file in files:
-            try:
-                if file.lower().endswith('.mp4'):
-                    mp4_path = os.path.join(root, file)
-                    print(f"Processing " + mp4_path)
-                    mp3_path = os.path.join(audio_folder, os.path.splitext(file)[0] + '.mp3')
-                    video_clip = VideoFileClip(mp4_path)
-                    audio_clip = video_clip.audio
-                    audio_clip.write_audiofile(mp3_path)
-                    audio_clip.close()
-                    video_clip.close()
-                    print(f"Audio conversion done for " + mp3_path)
-            except Exception as e:
-                print(str(e))
-                pass
-
-    print(f"Audio conversion to mp3 format is complete.")
-
-
-import yt_dlp
+# Heavy dependencies (yt_dlp, moviepy) are imported inside the functions that use
+# them, so a run only pays for the stages it actually reaches.
+import argparse
+import os
+
+from convert_audio import convert_mp4_to_mp3
+from download_profiles import DEFAULT_PROFILE, PROFILES, build_ydl_opts
+from playlist_metadata import resolve_playlist
+
 
 def download_youtube_video(video_url, output_folder):
+    import yt_dlp
+
     ydl_opts = {
         'format': 'best',  # Get the best format available
         'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),  # Define the output template
@@ -60,13 +40,9 @@ def download_youtube_video(video_url, output_folder):
 #         fileName = download_youtube_video(video_url, output_folder)
 #         return fileName
 
-import yt_dlp
-
-import os
-import yt_dlp
 
-
-def download_video(video_url, output_folder):
+def download_video(video_url, output_folder, info=None, profile=DEFAULT_PROFILE, files=None):
+    """Download one video. files, if given, gets the final path of every file written (after merging)."""
     # Variable to store the downloaded file name
     downloaded_file_name = None
 
@@ -79,27 +55,30 @@ def download_video(video_url, output_folder):
             downloaded_file_name = d['filename']
             print(f"Download complete: {downloaded_file_name}")
         elif d['status'] == 'downloading':
+            # Fragmented downloads only report an estimated total, so don't index the keys directly
+            total = d.get('_total_bytes_str') or d.get('_total_bytes_estimate_str', 'N/A')
             print(
-                f"Downloading: {d['_percent_str']} of {d['_total_bytes_str']} at {d['_speed_str']} ETA {d['_eta_str']}")
+                f"Downloading: {d.get('_percent_str', '')} of {total} at {d.get('_speed_str', '')} ETA {d.get('_eta_str', '')}")
 
     try:
-        # Define the options for yt-dlp
-        ydl_opts = {
-            'format': 'bestvideo+bestaudio/best',  # Download best video and audio
-            'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),  # Save with video title as filename
-            'quiet': False,  # Set to True if you don't want output printed to console
-            'progress_hooks': [download_hook],  # Hook to check the status of download
-            'merge_output_format': 'mp4',  # Merge the formats using ffmpeg into mp4
-            'cookies-from-browser': 'chrome',
-        }
+        # Define the options for yt-dlp from the selected tuning profile
+        ydl_opts = build_ydl_opts(output_folder, progress_hooks=[download_hook], profile=profile)
+        if files is not None:
+            # Called once per finished file, after the formats are merged into the final mp4
+            ydl_opts['post_hooks'] = [files.append]
 
         # Ensure the output directory exists
         if not os.path.exists(output_folder):
             os.makedirs(output_folder)
 
         # Use yt-dlp to download the video
+        import yt_dlp
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            ydl.download([video_url])
+            if info:
+                # Metadata was already resolved (e.g. from a playlist listing), don't extract it again
+                ydl.process_ie_result(info, download=True)
+            else:
+                ydl.download([video_url])
 
     except Exception as e:
         print(f"Error Downloading Video: {video_url}")
@@ -151,10 +130,11 @@ def download_video(video_url, output_folder):
 #     # Return the downloaded file name to the caller
 #     return downloaded_file_name
 
-def download_playlist(playlist_url, convert_to_mp3=False):
+def download_playlist(playlist_url, convert_to_mp3=False, profile=DEFAULT_PROFILE, files=None):
     try:
-        playlist = Playlist(playlist_url)
-        playlist_title = playlist.title
+        playlist = resolve_playlist(playlist_url)
+        playlist_title = playlist["title"]
+        entries = playlist["entries"]
         output_folder = os.path.join("downloads", playlist_title.split()[0])
 
         if not os.path.exists(output_folder):
@@ -162,9 +142,9 @@ def download_playlist(playlist_url, convert_to_mp3=False):
 
         print(f"Downloading playlist: {playlist_title}\n")
 
-        for i, video_url in enumerate(playlist.video_urls, start=1):
-            print(f"Starting video download {i}/{len(playlist.video_urls)}")
-            download_video(video_url, output_folder)
+        for i, entry in enumerate(entries, start=1):
+            print(f"Starting video download {i}/{len(entries)}")
+            download_video(entry.get("url"), output_folder, info=entry, profile=profile, files=files)
 
         print("\nPlaylist download completed successfully!")
         return output_folder
@@ -172,7 +152,7 @@ def download_playlist(playlist_url, convert_to_mp3=False):
     except Exception as e:
         print(f"Error downloading playlist: {e}")
 
-def download_video_warpper(url, convert_to_audio):
+def download_video_warpper(url, convert_to_audio, profile=DEFAULT_PROFILE, files=None):
     try:
         output_folder = os.path.join("downloads", "youtube_songs")
 
@@ -180,7 +160,7 @@ def download_video_warpper(url, convert_to_audio):
             os.makedirs(output_folder)
 
         print(f"Downloading Video: {url}")
-        fileName = download_video(url, output_folder)
+        fileName = download_video(url, output_folder, profile=profile, files=files)
 
         print(fileName + ".mp4 download completed successfully!")
 
@@ -190,8 +170,25 @@ def download_video_warpper(url, convert_to_audio):
         output_folder = ""
         return output_folder
 
+def process_url(url, profile=DEFAULT_PROFILE, files=None):
+    """Download a playlist or single video URL and return its output folder ("" / None on failure).
+
+    files, if given, collects the paths of the files this call downloaded.
+    """
+    if "playlist" in url:
+        return download_playlist(url, False, profile=profile, files=files)
+    return download_video_warpper(url, False, profile=profile, files=files)
+
 if __name__ == "__main__":
-    input_file = "urls.txt"  # File containing the YouTube playlist URLs, one per line
+    parser = argparse.ArgumentParser(description="Download YouTube videos and playlists listed in a file.")
+    parser.add_argument("input_file", nargs="?", default="urls.txt",
+                        help="File containing the YouTube playlist URLs, one per line")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default=DEFAULT_PROFILE,
+                        help="Download tuning profile (fragment concurrency, chunking, resume)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Parallel audio conversion processes (default: one per CPU core)")
+    args = parser.parse_args()
+    input_file = args.input_file
 
     with open(input_file, "r") as file:
         urls = [line.strip() for line in file]
@@ -200,11 +197,8 @@ if __name__ == "__main__":
 
     for url in urls:
         if url.strip() != "":
-            if "playlist" in url:
-                output_folder = download_playlist(url, False)
-            else:
-                output_folder = download_video_warpper(url, False)
+            output_folder = process_url(url, profile=args.profile)
 
-    if output_folder != "":
-        convert_mp4_to_mp3(output_folder)
+    if output_folder:
+        convert_mp4_to_mp3(output_folder, workers=args.workers)
 
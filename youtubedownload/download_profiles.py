@@ -0,0 +1,58 @@
+import os
+
+# Tuning profiles for yt-dlp downloads.
+#
+# concurrent_fragment_downloads: number of DASH/HLS fragments fetched in parallel
+# http_chunk_size: download plain HTTP formats in ranged chunks of this many bytes,
+#                  which both dodges per-connection throttling and keeps resumes cheap
+# continuedl / nopart: keep partial data in a .part file and resume it on the next run
+PROFILES = {
+    'default': {
+        'concurrent_fragment_downloads': 4,
+        'http_chunk_size': 10 * 1024 * 1024,
+        'continuedl': True,
+        'nopart': False,
+        'retries': 10,
+        'fragment_retries': 10,
+    },
+    # Long lectures / large files on an unreliable connection: more parallel
+    # fragments, never give up on a fragment, resume whatever is already on disk.
+    'large': {
+        'concurrent_fragment_downloads': 8,
+        'http_chunk_size': 10 * 1024 * 1024,
+        'continuedl': True,
+        'nopart': False,
+        'retries': float('inf'),
+        'fragment_retries': float('inf'),
+        'skip_unavailable_fragments': False,
+        'socket_timeout': 30,
+    },
+    # One connection at a time, for slow or heavily rate limited networks
+    'conservative': {
+        'concurrent_fragment_downloads': 1,
+        'continuedl': True,
+        'nopart': False,
+        'retries': 10,
+        'fragment_retries': 10,
+    },
+}
+
+DEFAULT_PROFILE = 'default'
+
+
+def build_ydl_opts(output_folder, progress_hooks=None, profile=DEFAULT_PROFILE, **overrides):
+    """Return the yt-dlp options for a download using the given tuning profile."""
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown download profile '{profile}'. Use one of: {', '.join(PROFILES)}")
+
+    ydl_opts = {
+        'format': 'bestvideo+bestaudio/best',  # Download best video and audio
+        'outtmpl': os.path.join(output_folder, '%(title)s.%(ext)s'),  # Save with video title as filename
+        'quiet': False,  # Set to True if you don't want output printed to console
+        'progress_hooks': list(progress_hooks or []),  # Hooks to check the status of download
+        'merge_output_format': 'mp4',  # Merge the formats using ffmpeg into mp4
+        'cookies-from-browser': 'chrome',
+    }
+    ydl_opts.update(PROFILES[profile])
+    ydl_opts.update(overrides)
+    return ydl_opts
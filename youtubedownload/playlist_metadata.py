@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+import time
+
+CACHE_DIR = ".metadata_cache"
+CACHE_TTL = 6 * 60 * 60  # Seconds a cached playlist listing stays valid
+
+
+def _cache_path(url, cache_dir):
+    key = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(cache_dir, key + ".json")
+
+
+def _read_cache(url, cache_dir, ttl):
+    path = _cache_path(url, cache_dir)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if time.time() - cached.get("fetched_at", 0) > ttl:
+        return None
+    return cached.get("info")
+
+
+def _write_cache(url, info, cache_dir):
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(url, cache_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "fetched_at": time.time(), "info": info}, f)
+    # Replace in one step so a crashed run never leaves a half written cache file
+    os.replace(tmp_path, path)
+
+
+def resolve_playlist(playlist_url, cache_dir=CACHE_DIR, ttl=CACHE_TTL, refresh=False):
+    """Resolve a playlist once with yt-dlp's flat extraction.
+
+    Returns a dict with the playlist 'title' and its 'entries'. Each entry is a
+    lightweight info dict that can be handed to download_video as-is, so the
+    playlist page is only fetched once and each video is only extracted once.
+    """
+    if not refresh:
+        info = _read_cache(playlist_url, cache_dir, ttl)
+        if info is not None:
+            print(f"Using cached playlist metadata for {playlist_url}")
+            return info
+
+    import yt_dlp
+
+    ydl_opts = {
+        'extract_flat': 'in_playlist',  # List the entries without resolving every video
+        'skip_download': True,
+        'quiet': True,
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        raw_info = ydl.sanitize_info(ydl.extract_info(playlist_url, download=False))
+
+    entries = [entry for entry in raw_info.get("entries") or [] if entry]
+    info = {
+        "id": raw_info.get("id"),
+        "title": raw_info.get("title") or raw_info.get("id") or "playlist",
+        "entries": entries,
+    }
+
+    try:
+        _write_cache(playlist_url, info, cache_dir)
+    except OSError as e:
+        print(f"Could not write playlist cache: {e}")
+
+    return info